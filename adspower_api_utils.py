@@ -1,114 +1,364 @@
+import asyncio
+import functools
 import json
 import math
 import os
 import random
 import time
+from concurrent.futures import ThreadPoolExecutor
 
+import httpx
 import requests
+import requests.adapters
 from loguru import logger
+from patchright.async_api import Locator as AsyncLocator
 from patchright.sync_api import Locator
 
-ADSPOWER_API_URL = "http://172.17.0.1:50325"
+ADSPOWER_API_URL = os.getenv("ADSPOWER_API_URL", "http://172.17.0.1:50325")
 
 
-def start_browser(profile_number: str, headless: bool = False) -> str | None:
-    launch_args = [
-        "--disable-blink-features=AutomationControlled",
-        "--disable-popup-blocking",
-        "--disable-default-apps",
-        "--disable-translate",
-        "--disable-features=TranslateUI",
-    ]
+ADSPOWER_TIMEOUT = 30.0
+ADSPOWER_RETRIES = 3
+ADSPOWER_BACKOFF = 0.5
+HTTP_SERVER_ERROR = 500
+
+BROWSER_LAUNCH_ARGS = [
+    "--disable-blink-features=AutomationControlled",
+    "--disable-popup-blocking",
+    "--disable-default-apps",
+    "--disable-translate",
+    "--disable-features=TranslateUI",
+]
+
 
+class AdsPowerTransientError(Exception):
+    """Ответ локального API AdsPower, который имеет смысл повторить (лимит запросов, 5xx)"""
+
+
+def _start_params(profile_number: str, headless: bool) -> dict:
     params = {
         "serial_number": profile_number,
-        "launch_args": json.dumps(launch_args),
+        "launch_args": json.dumps(BROWSER_LAUNCH_ARGS),
         "open_tabs": 1,
     }
     if headless:
         params["headless"] = 1
+    return params
 
-    try:
-        response = requests.get(
-            f"{ADSPOWER_API_URL}/api/v1/browser/start", params=params
-        )
-        logger.debug(f"[start_browser] Raw response: {response.text}")
-        response.raise_for_status()
-        data = response.json()
-
-        if data.get("code") == 0:
-            puppeteer_ws = data["data"]["ws"]["puppeteer"]
-            logger.success(
-                f"[start_browser] Browser started for profile {profile_number}"
-            )
-            return puppeteer_ws
-        else:
-            logger.error(
-                f"[start_browser] Failed to start browser for profile {profile_number}: {data.get('msg')}"
-            )
-            return None
 
-    except requests.exceptions.RequestException as e:
-        logger.exception(
-            f"[start_browser] Request error for profile {profile_number}: {e}"
-        )
+def _json_or_none(response) -> dict | None:
+    try:
+        return response.json()
+    except ValueError:
         return None
 
 
-def check_browser_status(profile_number: str) -> bool:
-    try:
-        response = requests.get(
-            f"{ADSPOWER_API_URL}/api/v1/browser/active",
-            params={"serial_number": profile_number},
-        )
-        logger.debug(f"[check_browser_status] Raw response: {response.text}")
-        response.raise_for_status()
-        data = response.json()
+def _check_transient(status_code: int, data: dict | None) -> None:
+    if status_code >= HTTP_SERVER_ERROR:
+        raise AdsPowerTransientError(f"HTTP {status_code}")
+    # AdsPower ограничивает частоту запросов и отвечает code=-1 "Too many request per second"
+    if data and data.get("code") != 0 and "too many request" in str(data.get("msg", "")).lower():
+        raise AdsPowerTransientError(data.get("msg"))
+
+
+def _parse_start(data: dict, profile_number: str) -> str | None:
+    if data.get("code") == 0:
+        logger.success(f"[start_browser] Browser started for profile {profile_number}")
+        return data["data"]["ws"]["puppeteer"]
+    logger.error(
+        f"[start_browser] Failed to start browser for profile {profile_number}: {data.get('msg')}"
+    )
+    return None
+
+
+def _parse_status(data: dict, profile_number: str) -> bool:
+    if data.get("code") == 0 and data["data"]["status"] == "Active":
+        logger.info(f"[check_browser_status] Browser is active for profile {profile_number}")
+        return True
+    logger.warning(f"[check_browser_status] Browser is NOT active for profile {profile_number}")
+    return False
+
+
+def _parse_active_ws(data: dict, profile_number: str) -> str | None:
+    if data.get("code") == 0 and data["data"]["status"] == "Active":
+        return data["data"].get("ws", {}).get("puppeteer")
+    return None
+
 
-        if data.get("code") == 0 and data["data"]["status"] == "Active":
-            logger.info(
-                f"[check_browser_status] Browser is active for profile {profile_number}"
+def _parse_stop(data: dict, profile_number: str) -> bool:
+    if data.get("code") == 0:
+        logger.success(f"[close_browser] Browser closed for profile {profile_number}")
+        return True
+    logger.error(
+        f"[close_browser] Failed to close browser for profile {profile_number}: {data.get('msg')}"
+    )
+    return False
+
+
+class AdsPowerClient:
+    """
+    Клиент локального API AdsPower с пулом соединений, таймаутами и повторами.
+
+    Повторяются сетевые ошибки, 5xx и ответы о превышении частоты запросов,
+    с экспоненциальной задержкой backoff * 2**attempt.
+    """
+
+    def __init__(
+        self,
+        base_url: str = ADSPOWER_API_URL,
+        timeout: float = ADSPOWER_TIMEOUT,
+        retries: int = ADSPOWER_RETRIES,
+        backoff: float = ADSPOWER_BACKOFF,
+        pool_size: int = 10,
+    ):
+        self.base_url = base_url.rstrip("/")
+        self.timeout = timeout
+        self.retries = retries
+        self.backoff = backoff
+        self.pool_size = pool_size
+        self.session = requests.Session()
+        adapter = requests.adapters.HTTPAdapter(pool_connections=1, pool_maxsize=pool_size)
+        self.session.mount("http://", adapter)
+        self.session.mount("https://", adapter)
+
+    def __enter__(self) -> "AdsPowerClient":
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        self.close()
+
+    def close(self) -> None:
+        self.session.close()
+
+    def _get(self, path: str, params: dict, caller: str) -> dict:
+        for attempt in range(self.retries + 1):
+            try:
+                response = self.session.get(
+                    f"{self.base_url}{path}", params=params, timeout=self.timeout
+                )
+                logger.debug(f"[{caller}] Raw response: {response.text}")
+                data = _json_or_none(response)
+                _check_transient(response.status_code, data)
+                response.raise_for_status()
+                if data is None:
+                    raise ValueError(f"Non-JSON response: {response.text[:200]}")
+                return data
+            except (
+                requests.exceptions.ConnectionError,
+                requests.exceptions.Timeout,
+                AdsPowerTransientError,
+            ) as e:
+                if attempt == self.retries:
+                    raise
+                delay = self.backoff * 2**attempt
+                logger.warning(f"[{caller}] Transient error ({e}), retry in {delay} sec")
+                time.sleep(delay)
+        raise AssertionError("unreachable")
+
+    def start_browser(self, profile_number: str, headless: bool = False) -> str | None:
+        try:
+            data = self._get(
+                "/api/v1/browser/start", _start_params(profile_number, headless), "start_browser"
             )
-            return True
-        else:
-            logger.warning(
-                f"[check_browser_status] Browser is NOT active for profile {profile_number}"
+            return _parse_start(data, profile_number)
+        except (requests.exceptions.RequestException, AdsPowerTransientError, ValueError) as e:
+            logger.exception(f"[start_browser] Request error for profile {profile_number}: {e}")
+            return None
+
+    def check_browser_status(self, profile_number: str) -> bool:
+        try:
+            data = self._get(
+                "/api/v1/browser/active", {"serial_number": profile_number}, "check_browser_status"
             )
+            return _parse_status(data, profile_number)
+        except (requests.exceptions.RequestException, AdsPowerTransientError, ValueError) as e:
+            logger.exception(
+                f"[check_browser_status] Request error for profile {profile_number}: {e}"
+            )
+            return False
+
+    def active_ws(self, profile_number: str) -> str | None:
+        """puppeteer_ws уже запущенного браузера профиля или None, если браузер не запущен"""
+        try:
+            data = self._get(
+                "/api/v1/browser/active", {"serial_number": profile_number}, "active_ws"
+            )
+            return _parse_active_ws(data, profile_number)
+        except (requests.exceptions.RequestException, AdsPowerTransientError, ValueError) as e:
+            logger.exception(f"[active_ws] Request error for profile {profile_number}: {e}")
+            return None
+
+    def close_browser(self, profile_number: str) -> bool:
+        try:
+            data = self._get(
+                "/api/v1/browser/stop", {"serial_number": profile_number}, "close_browser"
+            )
+            return _parse_stop(data, profile_number)
+        except (requests.exceptions.RequestException, AdsPowerTransientError, ValueError) as e:
+            logger.exception(f"[close_browser] Request error for profile {profile_number}: {e}")
             return False
 
-    except requests.exceptions.RequestException as e:
-        logger.exception(
-            f"[check_browser_status] Request error for profile {profile_number}: {e}"
+    def _many(self, func, profile_numbers: list[str], max_workers: int | None) -> dict:
+        workers = max_workers or min(self.pool_size, len(profile_numbers)) or 1
+        with ThreadPoolExecutor(max_workers=workers) as executor:
+            results = executor.map(func, profile_numbers)
+            return dict(zip(profile_numbers, results, strict=True))
+
+    def start_many(
+        self, profile_numbers: list[str], headless: bool = False, max_workers: int | None = None
+    ) -> dict[str, str | None]:
+        """Параллельно запускает браузеры, возвращает {profile_number: puppeteer_ws или None}"""
+        return self._many(
+            lambda profile_number: self.start_browser(profile_number, headless),
+            profile_numbers,
+            max_workers,
         )
-        return False
 
+    def status_many(
+        self, profile_numbers: list[str], max_workers: int | None = None
+    ) -> dict[str, bool]:
+        return self._many(self.check_browser_status, profile_numbers, max_workers)
 
-def close_browser(profile_number: str) -> bool:
-    try:
-        response = requests.get(
-            f"{ADSPOWER_API_URL}/api/v1/browser/stop",
-            params={"serial_number": profile_number},
+    def stop_many(self, profile_numbers: list[str], max_workers: int | None = None) -> dict[str, bool]:
+        return self._many(self.close_browser, profile_numbers, max_workers)
+
+
+class AsyncAdsPowerClient:
+    """Асинхронный вариант AdsPowerClient на httpx.AsyncClient с тем же поведением повторов"""
+
+    def __init__(
+        self,
+        base_url: str = ADSPOWER_API_URL,
+        timeout: float = ADSPOWER_TIMEOUT,
+        retries: int = ADSPOWER_RETRIES,
+        backoff: float = ADSPOWER_BACKOFF,
+        pool_size: int = 10,
+    ):
+        self.retries = retries
+        self.backoff = backoff
+        self.pool_size = pool_size
+        self.client = httpx.AsyncClient(
+            base_url=base_url.rstrip("/"),
+            timeout=timeout,
+            limits=httpx.Limits(max_connections=pool_size, max_keepalive_connections=pool_size),
         )
-        logger.debug(f"[close_browser] Raw response: {response.text}")
-        response.raise_for_status()
-        data = response.json()
 
-        if data.get("code") == 0:
-            logger.success(
-                f"[close_browser] Browser closed for profile {profile_number}"
+    async def __aenter__(self) -> "AsyncAdsPowerClient":
+        return self
+
+    async def __aexit__(self, *exc_info) -> None:
+        await self.close()
+
+    async def close(self) -> None:
+        await self.client.aclose()
+
+    async def _get(self, path: str, params: dict, caller: str) -> dict:
+        for attempt in range(self.retries + 1):
+            try:
+                response = await self.client.get(path, params=params)
+                logger.debug(f"[{caller}] Raw response: {response.text}")
+                data = _json_or_none(response)
+                _check_transient(response.status_code, data)
+                response.raise_for_status()
+                if data is None:
+                    raise ValueError(f"Non-JSON response: {response.text[:200]}")
+                return data
+            except (httpx.TransportError, AdsPowerTransientError) as e:
+                if attempt == self.retries:
+                    raise
+                delay = self.backoff * 2**attempt
+                logger.warning(f"[{caller}] Transient error ({e}), retry in {delay} sec")
+                await asyncio.sleep(delay)
+        raise AssertionError("unreachable")
+
+    async def start_browser(self, profile_number: str, headless: bool = False) -> str | None:
+        try:
+            data = await self._get(
+                "/api/v1/browser/start", _start_params(profile_number, headless), "start_browser"
+            )
+            return _parse_start(data, profile_number)
+        except (httpx.HTTPError, AdsPowerTransientError, ValueError) as e:
+            logger.exception(f"[start_browser] Request error for profile {profile_number}: {e}")
+            return None
+
+    async def check_browser_status(self, profile_number: str) -> bool:
+        try:
+            data = await self._get(
+                "/api/v1/browser/active", {"serial_number": profile_number}, "check_browser_status"
+            )
+            return _parse_status(data, profile_number)
+        except (httpx.HTTPError, AdsPowerTransientError, ValueError) as e:
+            logger.exception(
+                f"[check_browser_status] Request error for profile {profile_number}: {e}"
+            )
+            return False
+
+    async def active_ws(self, profile_number: str) -> str | None:
+        try:
+            data = await self._get(
+                "/api/v1/browser/active", {"serial_number": profile_number}, "active_ws"
             )
-            return True
-        else:
-            logger.error(
-                f"[close_browser] Failed to close browser for profile {profile_number}: {data.get('msg')}"
+            return _parse_active_ws(data, profile_number)
+        except (httpx.HTTPError, AdsPowerTransientError, ValueError) as e:
+            logger.exception(f"[active_ws] Request error for profile {profile_number}: {e}")
+            return None
+
+    async def close_browser(self, profile_number: str) -> bool:
+        try:
+            data = await self._get(
+                "/api/v1/browser/stop", {"serial_number": profile_number}, "close_browser"
             )
+            return _parse_stop(data, profile_number)
+        except (httpx.HTTPError, AdsPowerTransientError, ValueError) as e:
+            logger.exception(f"[close_browser] Request error for profile {profile_number}: {e}")
             return False
 
-    except requests.exceptions.RequestException as e:
-        logger.exception(
-            f"[close_browser] Request error for profile {profile_number}: {e}"
+    async def _many(self, func, profile_numbers: list[str], max_concurrency: int | None) -> dict:
+        semaphore = asyncio.Semaphore(max_concurrency or self.pool_size)
+
+        async def bounded(profile_number: str):
+            async with semaphore:
+                return await func(profile_number)
+
+        results = await asyncio.gather(*(bounded(profile_number) for profile_number in profile_numbers))
+        return dict(zip(profile_numbers, results, strict=True))
+
+    async def start_many(
+        self, profile_numbers: list[str], headless: bool = False, max_concurrency: int | None = None
+    ) -> dict[str, str | None]:
+        return await self._many(
+            lambda profile_number: self.start_browser(profile_number, headless),
+            profile_numbers,
+            max_concurrency,
         )
-        return False
+
+    async def status_many(
+        self, profile_numbers: list[str], max_concurrency: int | None = None
+    ) -> dict[str, bool]:
+        return await self._many(self.check_browser_status, profile_numbers, max_concurrency)
+
+    async def stop_many(
+        self, profile_numbers: list[str], max_concurrency: int | None = None
+    ) -> dict[str, bool]:
+        return await self._many(self.close_browser, profile_numbers, max_concurrency)
+
+
+@functools.cache
+def get_default_client() -> AdsPowerClient:
+    """Общий для процесса клиент, которым пользуются функции ниже"""
+    return AdsPowerClient()
+
+
+def start_browser(profile_number: str, headless: bool = False) -> str | None:
+    return get_default_client().start_browser(profile_number, headless)
+
+
+def check_browser_status(profile_number: str) -> bool:
+    return get_default_client().check_browser_status(profile_number)
+
+
+def close_browser(profile_number: str) -> bool:
+    return get_default_client().close_browser(profile_number)
 
 
 def load_profiles(file_name: str = "profiles.txt") -> list[str]:
@@ -118,10 +368,7 @@ def load_profiles(file_name: str = "profiles.txt") -> list[str]:
         return [line.strip() for line in f if line.strip()]
 
 
-def click_random(locator: Locator, manual_radius: float | None = None) -> None:
-    time.sleep(random.uniform(1, 2))
-    locator.wait_for(state="visible", timeout=50000)
-    box = locator.bounding_box()
+def _random_point(box: dict | None, manual_radius: float | None) -> dict:
     if box is None:
         raise Exception("Bounding box not found")
     width, height = box["width"], box["height"]
@@ -131,5 +378,18 @@ def click_random(locator: Locator, manual_radius: float | None = None) -> None:
     r = radius * math.sqrt(random.uniform(0, 1))
     rand_x = cx + r * math.cos(angle)
     rand_y = cy + r * math.sin(angle)
+    return {"x": rand_x, "y": rand_y}
+
+
+def click_random(locator: Locator, manual_radius: float | None = None) -> None:
+    time.sleep(random.uniform(1, 2))
+    locator.wait_for(state="visible", timeout=50000)
+    box = locator.bounding_box()
+    locator.click(position=_random_point(box, manual_radius))
+
 
-    locator.click(position={"x": rand_x, "y": rand_y})
+async def click_random_async(locator: AsyncLocator, manual_radius: float | None = None) -> None:
+    await asyncio.sleep(random.uniform(1, 2))
+    await locator.wait_for(state="visible", timeout=50000)
+    box = await locator.bounding_box()
+    await locator.click(position=_random_point(box, manual_radius))
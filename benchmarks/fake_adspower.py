@@ -0,0 +1,176 @@
+"""
+Локальная заглушка API AdsPower (/api/v1/browser/start|active|stop) для офлайн-бенчмарков.
+
+Вместо профиля AdsPower start запускает локальный Chromium с --remote-debugging-port
+и отдаёт его webSocketDebuggerUrl как data.ws.puppeteer, поэтому AdsPowerClient,
+BrowserPool и connect_over_cdp работают без изменений.
+"""
+
+import json
+import shutil
+import socket
+import subprocess
+import tempfile
+import threading
+import time
+import urllib.request
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+
+from loguru import logger
+
+
+CHROMIUM_ARGS = [
+    "--headless=new",
+    "--no-first-run",
+    "--no-default-browser-check",
+    "--disable-gpu",
+    "--no-sandbox",
+]
+
+
+def _free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+class FakeBrowser:
+    def __init__(self, process: subprocess.Popen, user_data_dir: str, puppeteer_ws: str):
+        self.process = process
+        self.user_data_dir = user_data_dir
+        self.puppeteer_ws = puppeteer_ws
+
+
+class FakeAdsPower:
+    """
+    Держит по одному локальному Chromium на номер профиля.
+
+    Args:
+        chromium_path (str): Путь к исполняемому файлу Chromium
+        headless (bool): Запускать Chromium без окна
+        start_timeout (float): Сколько ждать, пока Chromium откроет порт отладки (сек)
+    """
+
+    def __init__(self, chromium_path: str, headless: bool = True, start_timeout: float = 30.0):
+        self.chromium_path = chromium_path
+        self.headless = headless
+        self.start_timeout = start_timeout
+        self._browsers: dict[str, FakeBrowser] = {}
+        self._lock = threading.Lock()
+        self.server: ThreadingHTTPServer | None = None
+
+    def start_browser(self, profile_number: str, launch_args: list[str]) -> str:
+        with self._lock:
+            browser = self._browsers.get(profile_number)
+            if browser is not None and browser.process.poll() is None:
+                return browser.puppeteer_ws
+
+            port = _free_port()
+            user_data_dir = tempfile.mkdtemp(prefix=f"fake_adspower_{profile_number}_")
+            args = [arg for arg in CHROMIUM_ARGS if self.headless or arg != "--headless=new"]
+            process = subprocess.Popen(
+                [
+                    self.chromium_path,
+                    *args,
+                    *launch_args,
+                    f"--remote-debugging-port={port}",
+                    f"--user-data-dir={user_data_dir}",
+                    "about:blank",
+                ],
+                stdout=subprocess.DEVNULL,
+                stderr=subprocess.DEVNULL,
+            )
+            puppeteer_ws = self._wait_for_ws(port, process)
+            self._browsers[profile_number] = FakeBrowser(process, user_data_dir, puppeteer_ws)
+            logger.info(f"[fake_adspower] Chromium для профиля {profile_number} запущен на порту {port}")
+            return puppeteer_ws
+
+    def _wait_for_ws(self, port: int, process: subprocess.Popen) -> str:
+        deadline = time.monotonic() + self.start_timeout
+        while time.monotonic() < deadline:
+            if process.poll() is not None:
+                raise RuntimeError(f"Chromium завершился с кодом {process.returncode}")
+            try:
+                with urllib.request.urlopen(f"http://127.0.0.1:{port}/json/version", timeout=1) as response:
+                    return json.loads(response.read())["webSocketDebuggerUrl"]
+            except OSError:
+                time.sleep(0.1)
+        process.kill()
+        raise TimeoutError(f"Chromium не открыл порт отладки {port} за {self.start_timeout} сек.")
+
+    def active_ws(self, profile_number: str) -> str | None:
+        browser = self._browsers.get(profile_number)
+        if browser is None or browser.process.poll() is not None:
+            return None
+        return browser.puppeteer_ws
+
+    def stop_browser(self, profile_number: str) -> bool:
+        with self._lock:
+            browser = self._browsers.pop(profile_number, None)
+        if browser is None:
+            return False
+        browser.process.terminate()
+        try:
+            browser.process.wait(timeout=10)
+        except subprocess.TimeoutExpired:
+            browser.process.kill()
+        shutil.rmtree(browser.user_data_dir, ignore_errors=True)
+        return True
+
+    def stop_all(self) -> None:
+        for profile_number in list(self._browsers):
+            self.stop_browser(profile_number)
+
+    def serve(self, port: int = 0, host: str = "127.0.0.1") -> ThreadingHTTPServer:
+        """Запускает API в фоновом потоке, фактический порт в server.server_address[1]"""
+        fake = self
+
+        class FakeAdsPowerHandler(BaseHTTPRequestHandler):
+            def _reply(self, payload: dict) -> None:
+                body = json.dumps(payload).encode("utf-8")
+                self.send_response(200)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def do_GET(self):
+                url = urlparse(self.path)
+                query = {key: values[0] for key, values in parse_qs(url.query).items()}
+                profile_number = query.get("serial_number", "")
+
+                if url.path == "/api/v1/browser/start":
+                    try:
+                        launch_args = json.loads(query.get("launch_args", "[]"))
+                        puppeteer_ws = fake.start_browser(profile_number, launch_args)
+                    except Exception as e:
+                        self._reply({"code": -1, "msg": str(e)})
+                        return
+                    self._reply({"code": 0, "msg": "success", "data": {"ws": {"puppeteer": puppeteer_ws}}})
+                elif url.path == "/api/v1/browser/active":
+                    puppeteer_ws = fake.active_ws(profile_number)
+                    if puppeteer_ws is None:
+                        self._reply({"code": 0, "msg": "success", "data": {"status": "Inactive"}})
+                    else:
+                        data = {"status": "Active", "ws": {"puppeteer": puppeteer_ws}}
+                        self._reply({"code": 0, "msg": "success", "data": data})
+                elif url.path == "/api/v1/browser/stop":
+                    if fake.stop_browser(profile_number):
+                        self._reply({"code": 0, "msg": "success"})
+                    else:
+                        self._reply({"code": -1, "msg": "Browser not running"})
+                else:
+                    self.send_error(404)
+
+            def log_message(self, *args):
+                pass
+
+        self.server = ThreadingHTTPServer((host, port), FakeAdsPowerHandler)
+        threading.Thread(target=self.server.serve_forever, name="fake-adspower", daemon=True).start()
+        return self.server
+
+    def shutdown(self) -> None:
+        if self.server is not None:
+            self.server.shutdown()
+        self.stop_all()
@@ -0,0 +1,199 @@
+"""
+Локальная заглушка страницы ноутбука NotebookLM для офлайн-бенчмарков.
+
+Разметка повторяет селекторы, на которые опираются main.py и notebooklm_page.py:
+прокручиваемая панель div.single-source-container с чекбоксами и чекбоксом "выбрать все", textarea.cdk-textarea-autosize
+и кнопка отправки внутри query-box, чат div.chat-panel-content, div.loading-dots, пока ответ
+"генерируется", и button.xap-copy-to-clipboard у готового ответа. Ответ дописывается по блокам
+в течение answer_latency_ms. Если промпт просит секции <<<SOURCE n>>> (батч-режим), в ответе
+по секции answer_chars символов на каждый включённый источник.
+"""
+
+import json
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+
+FAKE_NOTEBOOK_HTML = """<!DOCTYPE html>
+<html>
+<head>
+    <meta charset="UTF-8">
+    <title>Fake NotebookLM</title>
+    <style>
+        body { margin: 0; display: flex; height: 100vh; font-family: Arial, sans-serif; }
+        #sources { width: 360px; height: 100vh; overflow-y: auto; border-right: 1px solid #ccc; }
+        .single-source-container { height: 48px; display: flex; align-items: center; gap: 8px; padding: 0 8px; }
+        .chat { flex: 1; display: flex; flex-direction: column; height: 100vh; }
+        .chat-panel-content { flex: 1; overflow-y: auto; padding: 16px; }
+        .to-user-container { border: 1px solid #ddd; margin: 8px 0; padding: 8px; }
+        query-box { display: block; padding: 8px; border-top: 1px solid #ccc; }
+        textarea { width: 100%; height: 60px; }
+    </style>
+</head>
+<body>
+    <div id="sources"></div>
+    <div class="chat">
+        <div class="chat-panel-content"></div>
+        <query-box><div><div><form onsubmit="return false">
+            <textarea class="cdk-textarea-autosize"></textarea>
+            <div><button type="button" disabled>Send</button></div>
+        </form></div></div></query-box>
+    </div>
+    <script>
+        const CONFIG = __CONFIG__;
+        const WORDS = ['model', 'source', 'latency', 'browser', 'answer', 'summary', 'protocol', 'result',
+                       'evidence', 'theme', 'document', 'analysis', 'question', 'context', 'signal'];
+
+        const sourcesPanel = document.getElementById('sources');
+        // Чекбокс "выбрать все": включает или выключает все источники, при частичном выборе indeterminate
+        const selectAll = document.createElement('input');
+        selectAll.type = 'checkbox';
+        selectAll.id = 'mat-mdc-checkbox-0-input';
+        selectAll.checked = true;
+        sourcesPanel.append(selectAll);
+        const sourceInputs = () => Array.from(document.querySelectorAll('.single-source-container input'));
+        selectAll.addEventListener('change', () => {
+            sourceInputs().forEach((input) => { input.checked = selectAll.checked; });
+        });
+        sourcesPanel.addEventListener('change', (event) => {
+            if (event.target === selectAll) return;
+            const checked = sourceInputs().filter((input) => input.checked).length;
+            selectAll.checked = checked === sourceInputs().length;
+            selectAll.indeterminate = checked > 0 && !selectAll.checked;
+        });
+        CONFIG.titles.forEach((title) => {
+            const container = document.createElement('div');
+            container.className = 'single-source-container';
+            const input = document.createElement('input');
+            input.type = 'checkbox';
+            input.checked = true;
+            const titleElement = document.createElement('div');
+            titleElement.setAttribute('aria-label', 'Название источника');
+            titleElement.textContent = title;
+            container.append(input, titleElement);
+            sourcesPanel.append(container);
+        });
+
+        const textarea = document.querySelector('textarea.cdk-textarea-autosize');
+        const sendButton = document.querySelector('query-box button');
+        const chatPanel = document.querySelector('div.chat-panel-content');
+        textarea.addEventListener('input', () => { sendButton.disabled = !textarea.value.trim(); });
+
+        let wordIndex = 0;
+        const paragraph = (chars) => {
+            const words = [];
+            let length = 0;
+            while (length < chars) {
+                const word = WORDS[wordIndex++ % WORDS.length];
+                words.push(word);
+                length += word.length + 1;
+            }
+            const p = document.createElement('p');
+            p.textContent = words.join(' ') + '.';
+            return p;
+        };
+        const section = (heading, chars) => {
+            const blocks = [];
+            const h = document.createElement('h2');
+            h.textContent = heading;
+            blocks.push(h);
+            for (let written = 0; written < chars; written += CONFIG.paragraphChars) {
+                blocks.push(paragraph(Math.min(CONFIG.paragraphChars, chars - written)));
+            }
+            return blocks;
+        };
+
+        const answerBlocks = (prompt) => {
+            const checked = Array.from(document.querySelectorAll('.single-source-container input:checked'));
+            if (!prompt.includes('<<<SOURCE')) {
+                return section('Executive Summary', CONFIG.answerChars);
+            }
+            return checked.flatMap((_, index) => {
+                const marker = document.createElement('p');
+                const strong = document.createElement('strong');
+                strong.textContent = `<<<SOURCE ${index + 1}>>>`;
+                marker.append(strong);
+                return [marker, ...section('Executive Summary', CONFIG.answerChars)];
+            });
+        };
+
+        sendButton.addEventListener('click', () => {
+            const prompt = textarea.value;
+            textarea.value = '';
+            sendButton.disabled = true;
+
+            const card = document.createElement('div');
+            card.className = 'to-user-container';
+            const content = document.createElement('div');
+            content.className = 'message-text-content';
+            card.append(content);
+            const dots = document.createElement('div');
+            dots.className = 'loading-dots';
+            dots.textContent = '...';
+            chatPanel.append(card, dots);
+
+            const blocks = answerBlocks(prompt);
+            const interval = CONFIG.answerLatencyMs / Math.max(blocks.length, 1);
+            let next = 0;
+            const timer = setInterval(() => {
+                if (next < blocks.length) {
+                    content.append(blocks[next++]);
+                    chatPanel.scrollTop = chatPanel.scrollHeight;
+                    return;
+                }
+                clearInterval(timer);
+                dots.remove();
+                const copyButton = document.createElement('button');
+                copyButton.className = 'xap-copy-to-clipboard';
+                copyButton.textContent = 'copy';
+                copyButton.addEventListener('click', () => navigator.clipboard.writeText(content.innerText));
+                card.append(copyButton);
+            }, interval);
+        });
+    </script>
+</body>
+</html>
+"""
+
+
+def render_fake_notebook(sources: int, answer_latency_ms: int, answer_chars: int, paragraph_chars: int = 600) -> str:
+    config = {
+        "titles": [f"Benchmark source {number:03d}" for number in range(1, sources + 1)],
+        "answerLatencyMs": answer_latency_ms,
+        "answerChars": answer_chars,
+        "paragraphChars": paragraph_chars,
+    }
+    return FAKE_NOTEBOOK_HTML.replace("__CONFIG__", json.dumps(config))
+
+
+def serve_fake_notebooklm(
+    port: int = 0,
+    sources: int = 20,
+    answer_latency_ms: int = 5000,
+    answer_chars: int = 3000,
+    host: str = "127.0.0.1",
+) -> ThreadingHTTPServer:
+    """
+    Запускает в фоновом потоке HTTP-сервер, отдающий заглушку ноутбука на любой путь.
+
+    port=0 — свободный порт, фактический порт в server.server_address[1].
+    """
+    body = render_fake_notebook(sources, answer_latency_ms, answer_chars).encode("utf-8")
+
+    class FakeNotebookHandler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            if self.path == "/favicon.ico":
+                self.send_error(404)
+                return
+            self.send_response(200)
+            self.send_header("Content-Type", "text/html; charset=utf-8")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, *args):
+            pass
+
+    server = ThreadingHTTPServer((host, port), FakeNotebookHandler)
+    threading.Thread(target=server.serve_forever, name="fake-notebooklm", daemon=True).start()
+    return server
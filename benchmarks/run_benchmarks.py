@@ -0,0 +1,222 @@
+"""
+Офлайн-бенчмарк цикла суммаризации: без сети, без AdsPower и без квоты NotebookLM.
+
+Поднимает заглушку ноутбука (fake_notebooklm) и заглушку API AdsPower (fake_adspower),
+которая запускает локальный headless Chromium, направляет на них main.py через переменные
+окружения NOTEBOOKLM_URL и ADSPOWER_API_URL и прогоняет выбранные режимы обработки.
+Каждый режим работает в своём временном каталоге (своя БД, журнал и чекпоинты).
+
+По каждому режиму считаются источники в минуту, вызовы протокола Playwright (каждый —
+минимум один CDP round-trip) на источник и перцентили этапов из metrics.run_metrics.
+
+Запуск из корня репозитория:
+    python -m benchmarks.run_benchmarks --sources 10 --modes sequential,batch
+"""
+
+import asyncio
+import json
+import os
+import tempfile
+import time
+from collections import Counter
+from collections.abc import Callable
+from contextlib import contextmanager
+from pathlib import Path
+
+import click
+from loguru import logger
+
+from benchmarks.fake_adspower import FakeAdsPower
+from benchmarks.fake_notebooklm import serve_fake_notebooklm
+
+
+BENCHMARK_PROFILE = "bench"
+
+
+@contextmanager
+def count_protocol_calls():
+    """
+    Считает сообщения, которые клиент Playwright отправляет драйверу, по имени метода.
+
+    Оборачивает внутренний Connection._send_message_to_server: публичного хука на это нет.
+    """
+    from patchright._impl._connection import Connection
+
+    counter: Counter[str] = Counter()
+    original = Connection._send_message_to_server
+
+    def counting(self, channel_owner, method, params, timeout, no_reply=False):
+        counter[method] += 1
+        return original(self, channel_owner, method, params, timeout, no_reply)
+
+    Connection._send_message_to_server = counting
+    try:
+        yield counter
+    finally:
+        Connection._send_message_to_server = original
+
+
+def chromium_executable() -> str:
+    from patchright.sync_api import sync_playwright
+
+    with sync_playwright() as playwright:
+        return playwright.chromium.executable_path
+
+
+# ----------------------------
+# Режимы обработки. Новый режим — функция (profile_number, options) в MODES
+# ----------------------------
+def run_sequential(profile_number: str, options: dict) -> None:
+    import main
+
+    main.summarise_sources(profile_number, answer_timeout=options["answer_timeout"])
+
+
+def run_batch(profile_number: str, options: dict) -> None:
+    import main
+
+    main.summarise_sources(profile_number, answer_timeout=options["answer_timeout"], batch_size=options["batch_size"])
+
+
+def run_multitab(profile_number: str, options: dict) -> None:
+    import main_async
+
+    asyncio.run(
+        main_async.summarise_sources_multitab(
+            profile_number, tabs=options["tabs"], answer_timeout=options["answer_timeout"]
+        )
+    )
+
+
+MODES: dict[str, Callable[[str, dict], None]] = {
+    "sequential": run_sequential,
+    "batch": run_batch,
+    "multitab": run_multitab,
+}
+
+
+def count_stored_summaries() -> int:
+    from database import DatabaseManager
+    from models import Video
+    from sqlalchemy import func, select
+
+    db_manager = DatabaseManager()
+    with db_manager.session_scope() as session:
+        return session.execute(select(func.count()).select_from(Video).where(Video.summary_hash.isnot(None))).scalar()
+
+
+def run_mode(mode: str, options: dict) -> dict:
+    """Прогоняет один режим в чистом временном каталоге и возвращает его метрики"""
+    from metrics import run_metrics
+
+    workdir = Path(tempfile.mkdtemp(prefix=f"bench_{mode}_"))
+    previous_cwd = Path.cwd()
+    os.chdir(workdir)
+    run_metrics.reset()
+    try:
+        with count_protocol_calls() as calls:
+            started = time.monotonic()
+            MODES[mode](BENCHMARK_PROFILE, options)
+            elapsed = time.monotonic() - started
+        sources = count_stored_summaries()
+    finally:
+        os.chdir(previous_cwd)
+
+    total_calls = sum(calls.values())
+    return {
+        "mode": mode,
+        "elapsed": round(elapsed, 1),
+        "sources": sources,
+        "sources_per_minute": round(sources / elapsed * 60, 2) if elapsed > 0 else 0.0,
+        "protocol_calls": total_calls,
+        "protocol_calls_per_source": round(total_calls / sources, 1) if sources else None,
+        "top_protocol_calls": dict(calls.most_common(10)),
+        "stages": run_metrics.summary()["stages"],
+        "workdir": str(workdir),
+    }
+
+
+def print_report(results: list[dict]) -> None:
+    click.echo(f"\n{'mode':<12} {'sources':>7} {'elapsed,s':>10} {'src/min':>8} {'calls/src':>10}")
+    for result in results:
+        click.echo(
+            f"{result['mode']:<12} {result['sources']:>7} {result['elapsed']:>10} "
+            f"{result['sources_per_minute']:>8} {result['protocol_calls_per_source'] or '-':>10}"
+        )
+    for result in results:
+        click.echo(f"\n[{result['mode']}] stage latencies, s")
+        click.echo(f"  {'stage':<13} {'n':>5} {'p50':>8} {'p95':>8} {'max':>8}")
+        for stage, stats in result["stages"].items():
+            click.echo(f"  {stage:<13} {stats['count']:>5} {stats['p50']:>8} {stats['p95']:>8} {stats['max']:>8}")
+
+
+@click.command()
+@click.option("--modes", default="sequential,batch", help=f"Comma-separated modes: {', '.join(MODES)}")
+@click.option("--sources", default=10, help="Number of sources in the fake notebook")
+@click.option("--answer_latency_ms", default=5000, help="How long the fake model streams one answer")
+@click.option("--answer_chars", default=3000, help="Answer size per source, characters")
+@click.option("--answer_timeout", default=120.0, help="Max seconds to wait for one answer")
+@click.option("--batch_size", default=5, help="Sources per prompt in batch mode")
+@click.option("--tabs", default=3, help="Tabs in multitab mode")
+@click.option("--chromium", default=None, help="Chromium executable (default: the one bundled with patchright)")
+@click.option("--headed", is_flag=True, help="Show the Chromium window")
+@click.option("--output", default="benchmark_report.json", help="Where to write the JSON report")
+def main(
+    modes: str,
+    sources: int,
+    answer_latency_ms: int,
+    answer_chars: int,
+    answer_timeout: float,
+    batch_size: int,
+    tabs: int,
+    chromium: str | None,
+    headed: bool,
+    output: str,
+) -> None:
+    """
+    Benchmark the summarisation loop offline against a fake NotebookLM page and a fake AdsPower API.
+    """
+    selected_modes = [mode.strip() for mode in modes.split(",") if mode.strip()]
+    unknown = [mode for mode in selected_modes if mode not in MODES]
+    if unknown:
+        raise click.BadParameter(f"Unknown modes: {', '.join(unknown)}", param_hint="--modes")
+
+    notebook_server = serve_fake_notebooklm(
+        sources=sources, answer_latency_ms=answer_latency_ms, answer_chars=answer_chars
+    )
+    fake_adspower = FakeAdsPower(chromium or chromium_executable(), headless=not headed)
+    adspower_server = fake_adspower.serve()
+
+    # main.py и adspower_api_utils читают адреса при импорте, поэтому они импортируются
+    # только внутри режимов, после того как окружение указывает на заглушки
+    os.environ["NOTEBOOKLM_URL"] = f"http://127.0.0.1:{notebook_server.server_address[1]}"
+    os.environ["ADSPOWER_API_URL"] = f"http://127.0.0.1:{adspower_server.server_address[1]}"
+
+    options = {"answer_timeout": answer_timeout, "batch_size": batch_size, "tabs": tabs}
+    results = []
+    try:
+        for mode in selected_modes:
+            logger.info(
+                f"[bench] Режим {mode}: {sources} источников, ответ {answer_latency_ms} мс / {answer_chars} символов"
+            )
+            results.append(run_mode(mode, options))
+    finally:
+        fake_adspower.shutdown()
+        notebook_server.shutdown()
+
+    print_report(results)
+    report = {
+        "config": {
+            "sources": sources,
+            "answer_latency_ms": answer_latency_ms,
+            "answer_chars": answer_chars,
+            **options,
+        },
+        "results": results,
+    }
+    Path(output).write_text(json.dumps(report, ensure_ascii=False, indent=2), encoding="utf-8")
+    click.echo(f"\nReport written to {output}")
+
+
+if __name__ == "__main__":
+    main()
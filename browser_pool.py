@@ -0,0 +1,205 @@
+import random
+import threading
+import time
+from contextlib import contextmanager
+from pathlib import Path
+
+from adspower_api_utils import AdsPowerClient, get_default_client
+from json_state import locked_json_state
+from loguru import logger
+from metrics import run_metrics
+from patchright.sync_api import Browser, BrowserContext, Page, Playwright
+
+
+BROWSER_POOL_STATE_FILE = Path("browser_pool.json")
+BROWSER_IDLE_TTL = 15 * 60  # сек
+
+STEALTH_INIT_JS = """
+    Object.defineProperty(window, 'navigator', {
+        value: new Proxy(navigator, {
+            has: (target, key) => key === 'webdriver' ? false : key in target,
+            get: (target, key) =>
+                key === 'webdriver' ? undefined : typeof target[key] === 'function' ? target[key].bind(target) : target[key]
+        })
+    });
+"""
+
+
+class PooledBrowser:
+    """Подключённый по CDP браузер профиля AdsPower"""
+
+    def __init__(self, profile_number: str, puppeteer_ws: str, browser: Browser, context: BrowserContext):
+        self.profile_number = profile_number
+        self.puppeteer_ws = puppeteer_ws
+        self.browser = browser
+        self.context = context
+        self.last_used = time.time()
+
+
+class BrowserPool:
+    """
+    Долгоживущий пул браузеров AdsPower, ключ — номер профиля.
+
+    Браузер и его puppeteer_ws переиспользуются между вызовами acquire_page, а если
+    close_all(stop_browsers=False) оставил браузер запущенным, следующий процесс
+    подключится к нему через /api/v1/browser/active вместо холодного старта.
+    Перед выдачей браузер проверяется через check_browser_status, а браузеры,
+    простаивающие дольше idle_ttl, закрываются (время последнего использования
+    хранится в state_file, поэтому TTL действует и между запусками).
+
+    state_file общий для всех процессов (main_parallel, шарды), поэтому меняется только под
+    блокировкой, а пока браузер подключён к пулу, время его использования обновляется
+    фоновым потоком: другой процесс не закроет браузер посреди долгого запуска.
+    """
+
+    def __init__(
+        self,
+        playwright: Playwright,
+        client: AdsPowerClient | None = None,
+        idle_ttl: float = BROWSER_IDLE_TTL,
+        state_file: Path = BROWSER_POOL_STATE_FILE,
+    ):
+        self.playwright = playwright
+        self.client = client or get_default_client()
+        self.idle_ttl = idle_ttl
+        self.state_file = state_file
+        self._browsers: dict[str, PooledBrowser] = {}
+        self._refresher_stop = threading.Event()
+        self._refresher: threading.Thread | None = None
+        self._stop_expired_from_previous_runs()
+
+    def _touch(self, profile_number: str, keep: bool = True) -> None:
+        with locked_json_state(self.state_file) as state:
+            if keep:
+                state[profile_number] = time.time()
+            else:
+                state.pop(profile_number, None)
+
+    def _stop_expired_from_previous_runs(self) -> None:
+        with locked_json_state(self.state_file) as state:
+            now = time.time()
+            for profile_number, last_used in list(state.items()):
+                if now - last_used > self.idle_ttl:
+                    logger.info(f"[browser_pool] Профиль {profile_number} простаивал дольше TTL, закрываю браузер")
+                    self.client.close_browser(profile_number)
+                    state.pop(profile_number)
+
+    def _start_refresher(self) -> None:
+        if self._refresher is None:
+            self._refresher_stop.clear()
+            self._refresher = threading.Thread(target=self._refresh_periodically, name="browser-pool", daemon=True)
+            self._refresher.start()
+
+    def _refresh_periodically(self) -> None:
+        """Фоновый поток: отмечает в state_file, что подключённые браузеры используются"""
+        while not self._refresher_stop.wait(max(self.idle_ttl / 3, 1.0)):
+            for profile_number in list(self._browsers):
+                self._touch(profile_number)
+
+    def _is_healthy(self, pooled: PooledBrowser) -> bool:
+        return pooled.browser.is_connected() and self.client.check_browser_status(pooled.profile_number)
+
+    def _connect(self, profile_number: str) -> PooledBrowser | None:
+        with run_metrics.stage("browser_start"):
+            puppeteer_ws = self.client.active_ws(profile_number)
+            if puppeteer_ws:
+                logger.info(f"[browser_pool] Подключаюсь к уже запущенному браузеру профиля {profile_number}")
+            else:
+                puppeteer_ws = self.client.start_browser(profile_number)
+        if not puppeteer_ws:
+            return None
+
+        with run_metrics.stage("cdp_connect"):
+            browser = self.playwright.chromium.connect_over_cdp(puppeteer_ws, slow_mo=random.randint(2000, 3000))
+            context = browser.contexts[0] if browser.contexts else browser.new_context()
+            context.add_init_script(STEALTH_INIT_JS)
+        return PooledBrowser(profile_number, puppeteer_ws, browser, context)
+
+    def get(self, profile_number: str) -> PooledBrowser | None:
+        """Возвращает живой браузер профиля, при необходимости запуская или переподключая его"""
+        self.evict_idle()
+
+        pooled = self._browsers.get(profile_number)
+        if pooled is not None and not self._is_healthy(pooled):
+            logger.warning(f"[browser_pool] Браузер профиля {profile_number} не отвечает, переподключаюсь")
+            self._disconnect(pooled)
+            pooled = None
+
+        if pooled is None:
+            pooled = self._connect(profile_number)
+            if pooled is None:
+                return None
+            self._browsers[profile_number] = pooled
+
+        pooled.last_used = time.time()
+        self._touch(profile_number)
+        self._start_refresher()
+        return pooled
+
+    def acquire_page(self, profile_number: str, url: str, ready_selector: str | None = None) -> Page | None:
+        """
+        Выдаёт страницу с уже открытым url: сначала ищет открытую вкладку с этим адресом,
+        и только если её нет — открывает новую и загружает url.
+        Если задан ready_selector, дожидается его появления (замеряется как этап page_load).
+        """
+        pooled = self.get(profile_number)
+        if pooled is None:
+            return None
+
+        with run_metrics.stage("page_load"):
+            page = next(
+                (page for page in pooled.context.pages if not page.is_closed() and page.url.startswith(url)),
+                None,
+            )
+            if page is None:
+                page = pooled.context.new_page()
+                page.goto(url)
+            if ready_selector is not None:
+                page.locator(ready_selector).first.wait_for(state="visible", timeout=60_000)
+        return page
+
+    @contextmanager
+    def lease(self, profile_number: str, url: str, ready_selector: str | None = None):
+        """Контекстный менеджер вокруг acquire_page, обновляющий время использования по выходу"""
+        page = self.acquire_page(profile_number, url, ready_selector)
+        try:
+            yield page
+        finally:
+            if profile_number in self._browsers:
+                self._browsers[profile_number].last_used = time.time()
+                self._touch(profile_number)
+
+    def _disconnect(self, pooled: PooledBrowser) -> None:
+        try:
+            pooled.browser.close()  # для CDP-подключения закрывает только соединение
+        except Exception as e:
+            logger.warning(f"[browser_pool] Ошибка отключения от профиля {pooled.profile_number}: {e}")
+        self._browsers.pop(pooled.profile_number, None)
+
+    def release(self, profile_number: str, stop_browser: bool = True) -> None:
+        """Отключается от браузера профиля и, если stop_browser, закрывает его в AdsPower"""
+        pooled = self._browsers.get(profile_number)
+        if pooled is not None:
+            self._disconnect(pooled)
+        if stop_browser:
+            self.client.close_browser(profile_number)
+            self._touch(profile_number, keep=False)
+
+    def evict_idle(self) -> None:
+        now = time.time()
+        for profile_number, pooled in list(self._browsers.items()):
+            if now - pooled.last_used > self.idle_ttl:
+                logger.info(f"[browser_pool] Профиль {profile_number} простаивал дольше TTL, закрываю браузер")
+                self.release(profile_number)
+
+    def close_all(self, stop_browsers: bool = True) -> None:
+        """
+        Отключается от всех браузеров. С stop_browsers=False браузеры остаются запущенными
+        в AdsPower и будут переиспользованы следующим запуском (пока не истечёт TTL).
+        """
+        self._refresher_stop.set()
+        if self._refresher is not None:
+            self._refresher.join()
+            self._refresher = None
+        for profile_number in list(self._browsers):
+            self.release(profile_number, stop_browser=stop_browsers)
@@ -0,0 +1,253 @@
+import functools
+import inspect
+import sys
+import threading
+import time
+from pathlib import Path
+
+from loguru import logger
+from patchright.sync_api import (
+    BrowserContext,
+    BrowserType,
+    ElementHandle,
+    Frame,
+    Keyboard,
+    Locator,
+    LocatorAssertions,
+    Mouse,
+    Page,
+    PageAssertions,
+)
+
+
+# Классы sync API, вызовы которых уходят в браузер (каждый — минимум один CDP round-trip)
+PROFILED_CLASSES = (
+    Page,
+    Frame,
+    Locator,
+    ElementHandle,
+    Mouse,
+    Keyboard,
+    BrowserContext,
+    LocatorAssertions,
+    PageAssertions,
+)
+# Методы, которые только строят объекты на стороне Python и в браузер не ходят
+LOCAL_METHODS = {
+    "locator",
+    "frame_locator",
+    "get_by_alt_text",
+    "get_by_label",
+    "get_by_placeholder",
+    "get_by_role",
+    "get_by_test_id",
+    "get_by_text",
+    "get_by_title",
+    "nth",
+    "filter",
+    "and_",
+    "or_",
+    "describe",
+    "is_closed",
+    "on",
+    "once",
+    "remove_listener",
+    "set_default_timeout",
+    "set_default_navigation_timeout",
+}
+# Намеренные паузы: учитываются отдельно от задержки протокола
+SLEEP_METHODS = {"wait_for_timeout"}
+# Действия, перед которыми драйвер выдерживает slow_mo браузера (команды протокола с флагом slowMo):
+# эта пауза вычитается из времени вызова и показывается отдельной колонкой
+SLOW_MO_METHODS = {
+    "blur",
+    "check",
+    "clear",
+    "click",
+    "dblclick",
+    "dispatch_event",
+    "down",
+    "drag_and_drop",
+    "drag_to",
+    "fill",
+    "focus",
+    "go_back",
+    "go_forward",
+    "goto",
+    "hover",
+    "insert_text",
+    "move",
+    "press",
+    "press_sequentially",
+    "reload",
+    "scroll_into_view_if_needed",
+    "select_option",
+    "select_text",
+    "set_checked",
+    "set_input_files",
+    "tap",
+    "type",
+    "uncheck",
+    "up",
+    "wheel",
+}
+# Способы подключения к браузеру, у которых профилировщик запоминает slow_mo
+CONNECT_METHODS = ("connect_over_cdp", "connect", "launch")
+
+PROFILER_FILE = Path(__file__).resolve()
+PROJECT_DIR = PROFILER_FILE.parent
+CALL_SITE_DEPTH = 2  # сколько кадров кода проекта показывать в месте вызова
+
+
+@functools.lru_cache(maxsize=512)
+def _is_project_frame(filename: str) -> bool:
+    path = Path(filename).resolve()
+    return path.is_relative_to(PROJECT_DIR) and "site-packages" not in path.parts and path != PROFILER_FILE
+
+
+def call_site(depth: int = CALL_SITE_DEPTH) -> str:
+    """Ближайшие depth кадров кода проекта, от внешнего к внутреннему: "main.py:170 send_prompt > ..." """
+    frames = []
+    frame = sys._getframe(1)
+    while frame is not None and len(frames) < depth:
+        filename = frame.f_code.co_filename
+        if _is_project_frame(filename):
+            frames.append(f"{Path(filename).name}:{frame.f_lineno} {frame.f_code.co_name}")
+        frame = frame.f_back
+    return " > ".join(reversed(frames)) or "<external>"
+
+
+class CdpProfiler:
+    """
+    Счётчик обращений к браузеру по месту вызова.
+
+    enable() оборачивает методы классов PROFILED_CLASSES и time.sleep, disable() возвращает
+    оригиналы. Каждый вызов учитывается под ключом (место вызова, метод, вид), где вид —
+    "protocol" для обращений к браузеру и "sleep" для намеренных пауз (time.sleep, wait_for_timeout).
+    Задержка slow_mo последнего подключённого браузера вычитается из времени действий
+    SLOW_MO_METHODS и учитывается отдельно. Вложенные вызовы внутри уже замеряемого не считаются.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._local = threading.local()
+        self._originals: list[tuple[object, str, object]] = []
+        # (место вызова, метод, вид) -> [число вызовов, суммарное время без slow_mo, суммарный slow_mo]
+        self.stats: dict[tuple[str, str, str], list] = {}
+        # slow_mo браузера в секундах, запоминается при подключении (см. CONNECT_METHODS)
+        self.slow_mo = 0.0
+
+    @property
+    def enabled(self) -> bool:
+        return bool(self._originals)
+
+    def record(self, site: str, method: str, kind: str, seconds: float, slow_mo: float = 0.0) -> None:
+        with self._lock:
+            entry = self.stats.setdefault((site, method, kind), [0, 0.0, 0.0])
+            entry[0] += 1
+            entry[1] += seconds
+            entry[2] += slow_mo
+
+    def _timed(self, func, method: str, kind: str, slowed: bool = False):
+        profiler = self
+
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            if getattr(profiler._local, "active", False):
+                return func(*args, **kwargs)
+            site = call_site()
+            profiler._local.active = True
+            started = time.perf_counter()
+            try:
+                return func(*args, **kwargs)
+            finally:
+                profiler._local.active = False
+                elapsed = time.perf_counter() - started
+                slow_mo = min(profiler.slow_mo, elapsed) if slowed else 0.0
+                profiler.record(site, method, kind, elapsed - slow_mo, slow_mo)
+
+        return wrapper
+
+    def _remembering_slow_mo(self, func):
+        profiler = self
+
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            browser = func(*args, **kwargs)
+            profiler.slow_mo = (kwargs.get("slow_mo") or 0) / 1000
+            return browser
+
+        return wrapper
+
+    def _patch(self, owner, name: str, replacement) -> None:
+        self._originals.append((owner, name, getattr(owner, name)))
+        setattr(owner, name, replacement)
+
+    def enable(self) -> None:
+        if self.enabled:
+            return
+        for cls in PROFILED_CLASSES:
+            for name, func in vars(cls).items():
+                if name.startswith("_") or name.startswith("expect_") or name in LOCAL_METHODS:
+                    continue
+                if not inspect.isfunction(func):
+                    continue
+                kind = "sleep" if name in SLEEP_METHODS else "protocol"
+                self._patch(cls, name, self._timed(func, f"{cls.__name__}.{name}", kind, name in SLOW_MO_METHODS))
+        for name in CONNECT_METHODS:
+            self._patch(BrowserType, name, self._remembering_slow_mo(getattr(BrowserType, name)))
+        self._patch(time, "sleep", self._timed(time.sleep, "time.sleep", "sleep"))
+        logger.info("[cdp_profiler] Профилирование обращений к браузеру включено")
+
+    def disable(self) -> None:
+        for owner, name, original in reversed(self._originals):
+            setattr(owner, name, original)
+        self._originals = []
+
+    def reset(self) -> None:
+        with self._lock:
+            self.stats = {}
+
+    def report(self, limit: int = 30, sources: int = 0) -> str:
+        """
+        Таблица горячих точек, отсортированная по суммарному времени без slow_mo.
+
+        total,s и mean,ms — время вызова без паузы slow_mo, которая показана в колонке slow_mo,s;
+        share — доля total,s от суммарного времени всех вызовов вместе с slow_mo.
+        """
+        with self._lock:
+            rows = sorted(self.stats.items(), key=lambda item: item[1][1], reverse=True)
+        totals = {"protocol": [0, 0.0], "sleep": [0, 0.0], "slow_mo": [0, 0.0]}
+        for (_, _, kind), (count, seconds, slow_mo) in rows:
+            totals[kind][0] += count
+            totals[kind][1] += seconds
+            if slow_mo:
+                totals["slow_mo"][0] += count
+                totals["slow_mo"][1] += slow_mo
+        grand_total = sum(seconds for _, seconds in totals.values()) or 1.0
+
+        site_width = max([len(site) for (site, _, _), _ in rows[:limit]] + [9])
+        lines = [
+            f"{'call site':<{site_width}}  {'method':<32} {'kind':<8} {'calls':>6} {'total,s':>9} {'mean,ms':>9} "
+            f"{'slow_mo,s':>9} {'share':>6}"
+        ]
+        for (site, method, kind), (count, seconds, slow_mo) in rows[:limit]:
+            lines.append(
+                f"{site:<{site_width}}  {method:<32} {kind:<8} {count:>6} {seconds:>9.2f} "
+                f"{seconds / count * 1000:>9.1f} {slow_mo:>9.2f} {seconds / grand_total:>6.1%}"
+            )
+        if len(rows) > limit:
+            lines.append(f"... ещё {len(rows) - limit} мест вызова")
+        for kind, (count, seconds) in totals.items():
+            per_source = (
+                f", на источник: {count / sources:.1f} вызовов, {seconds / sources:.2f} сек." if sources else ""
+            )
+            lines.append(f"{kind}: {count} вызовов, {seconds:.2f} сек.{per_source}")
+        return "\n".join(lines)
+
+    def log_report(self, limit: int = 30, sources: int = 0) -> None:
+        logger.info(f"[cdp_profiler] Горячие точки обращений к браузеру:\n{self.report(limit, sources)}")
+
+
+# Профилировщик текущего процесса, включается явно (см. main --profile_cdp)
+cdp_profiler = CdpProfiler()
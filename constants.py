@@ -26,3 +26,14 @@ Answer 3 key questions about practical impications of the source article:
 
 Write all sources in summary and source link to original article
 """
+
+# Добавляется к PROMPT, когда в одном запросе включено несколько источников.
+# {sources} — нумерованный список заголовков, {marker_example} — пример разделителя секции.
+BATCH_PROMPT_SUFFIX = """
+The sources are listed below with their numbers:
+{sources}
+
+Write a separate, self-contained briefing for EACH source listed above, following all of the instructions above for every one of them.
+Start each briefing with its delimiter on its own line, exactly like {marker_example}, using the number of the source from the list.
+Do not mix information from different sources within one briefing and do not skip any source.
+"""
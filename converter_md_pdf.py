@@ -1,16 +1,25 @@
+import functools
+import hashlib
+import html
+import json
+import os
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, as_completed, wait
+from pathlib import Path
+
+import click
 import markdown
 import pdfkit
+from database import db_manager
+from job_queue import JobQueue
+from models import JobKind
 
 
-def md_to_pdf_pdfkit(md_file, pdf_file):
-    # Конвертируем MD в HTML
-    with open(md_file, "r", encoding="utf-8") as f:
-        md_content = f.read()
+PDF_EXPORT_DIR = Path("pdf_exports")
+HTML_CACHE_DIR = PDF_EXPORT_DIR / ".html_cache"
+MANIFEST_FILE = "manifest.json"
 
-    html_content = markdown.markdown(md_content)
-
-    # Добавляем базовый CSS для улучшения внешнего вида
-    styled_html = f"""
+# Добавляем базовый CSS для улучшения внешнего вида
+HTML_TEMPLATE = """
     <!DOCTYPE html>
     <html>
     <head>
@@ -20,6 +29,7 @@ def md_to_pdf_pdfkit(md_file, pdf_file):
             h1, h2, h3 {{ color: #333; }}
             code {{ background: #f4f4f4; padding: 2px 5px; }}
             pre {{ background: #f4f4f4; padding: 10px; overflow: auto; }}
+            .summary {{ page-break-after: always; }}
         </style>
     </head>
     <body>
@@ -27,6 +37,47 @@ def md_to_pdf_pdfkit(md_file, pdf_file):
     </body>
     </html>
     """
+# Меняется вместе с HTML_TEMPLATE, чтобы после правки стилей все PDF перерендерились
+TEMPLATE_VERSION = hashlib.sha256(HTML_TEMPLATE.encode("utf-8")).hexdigest()[:8]
+
+
+def content_hash(*parts: str) -> str:
+    digest = hashlib.sha256(TEMPLATE_VERSION.encode("utf-8"))
+    for part in parts:
+        digest.update(b"\0")
+        digest.update(part.encode("utf-8"))
+    return digest.hexdigest()
+
+
+@functools.lru_cache(maxsize=1024)
+def markdown_to_html(md_content: str) -> str:
+    return markdown.markdown(md_content, extensions=["tables", "fenced_code"])
+
+
+def summary_html_file(title: str, summary: str) -> Path:
+    """
+    Возвращает путь к HTML-документу summary, рендеря его только если его ещё нет в кеше.
+
+    Кеш лежит на диске и адресуется хешем содержимого, поэтому переживает перезапуски
+    и общий для процессов пула.
+    """
+    HTML_CACHE_DIR.mkdir(parents=True, exist_ok=True)
+    html_file = HTML_CACHE_DIR / f"{content_hash(title, summary)}.html"
+    if not html_file.exists():
+        body = f'<div class="summary"><h1>{html.escape(title)}</h1>{markdown_to_html(summary)}</div>'
+        tmp_file = html_file.with_suffix(f".{os.getpid()}.tmp")
+        tmp_file.write_text(HTML_TEMPLATE.format(html_content=body), encoding="utf-8")
+        tmp_file.replace(html_file)
+    return html_file
+
+
+def md_to_pdf_pdfkit(md_file, pdf_file):
+    # Конвертируем MD в HTML
+    with open(md_file, "r", encoding="utf-8") as f:
+        md_content = f.read()
+
+    html_content = markdown_to_html(md_content)
+    styled_html = HTML_TEMPLATE.format(html_content=html_content)
 
     # Конвертируем HTML в PDF
     pdfkit.from_string(styled_html, pdf_file)
@@ -34,5 +85,213 @@ def md_to_pdf_pdfkit(md_file, pdf_file):
     print(f"Конвертировано: {md_file} -> {pdf_file}")
 
 
+def _render_summary(video_id: int, title: str, summary: str, pdf_file: str) -> int:
+    """Задача для пула процессов: рендерит один summary в PDF"""
+    pdfkit.from_file(str(summary_html_file(title, summary)), pdf_file)
+    return video_id
+
+
+def _load_manifest(output_dir: Path) -> dict[str, str]:
+    manifest_file = output_dir / MANIFEST_FILE
+    if not manifest_file.exists():
+        return {}
+    return json.loads(manifest_file.read_text(encoding="utf-8"))
+
+
+def _save_manifest(output_dir: Path, manifest: dict[str, str]) -> None:
+    tmp_file = output_dir / f"{MANIFEST_FILE}.tmp"
+    tmp_file.write_text(json.dumps(manifest), encoding="utf-8")
+    tmp_file.replace(output_dir / MANIFEST_FILE)
+
+
+def export_summaries(output_dir: Path = PDF_EXPORT_DIR, workers: int | None = None) -> dict[str, int]:
+    """
+    Рендерит каждый summary из таблицы videos в отдельный PDF пулом процессов.
+
+    Документы, хеш содержимого которых не изменился с прошлого рендера (manifest.json),
+    пропускаются. В работе одновременно не больше 2 * workers задач, поэтому память
+    не растёт с размером таблицы. Возвращает счётчики rendered/skipped/failed.
+    """
+    output_dir.mkdir(parents=True, exist_ok=True)
+    manifest = _load_manifest(output_dir)
+    workers = workers or os.cpu_count() or 1
+    counts = {"rendered": 0, "skipped": 0, "failed": 0}
+
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        in_flight: dict = {}
+
+        def collect(done) -> None:
+            for future in done:
+                video_id, document_hash = in_flight.pop(future)
+                try:
+                    future.result()
+                    manifest[str(video_id)] = document_hash
+                    counts["rendered"] += 1
+                except Exception as e:
+                    counts["failed"] += 1
+                    print(f"❌ Не удалось отрендерить summary {video_id}: {e}")
+
+        for video_id, title, summary in db_manager.iter_summaries():
+            document_hash = content_hash(title, summary)
+            pdf_file = output_dir / f"{video_id}.pdf"
+            if manifest.get(str(video_id)) == document_hash and pdf_file.exists():
+                counts["skipped"] += 1
+                continue
+
+            if len(in_flight) >= 2 * workers:
+                done, _ = wait(in_flight, return_when=FIRST_COMPLETED)
+                collect(done)
+                _save_manifest(output_dir, manifest)
+
+            future = executor.submit(_render_summary, video_id, title, summary, str(pdf_file))
+            in_flight[future] = (video_id, document_hash)
+
+        collect(wait(in_flight).done)
+
+    _save_manifest(output_dir, manifest)
+    print(f"✅ Отрендерено: {counts['rendered']}, без изменений: {counts['skipped']}, ошибок: {counts['failed']}")
+    return counts
+
+
+def export_queued(
+    output_dir: Path = PDF_EXPORT_DIR, workers: int | None = None, claim_size: int = 50
+) -> dict[str, int]:
+    """
+    Рендерит summary по задачам PDF из общей очереди, пока она не опустеет.
+
+    Можно запускать несколько копий одновременно, в том числе на разных машинах: каждая
+    задача арендуется одним воркером (см. job_queue.JobQueue). Манифест у каждой копии
+    свой в памяти, поэтому при общей output_dir запись одной копии может затереть запись
+    другой — это приведёт только к лишнему перерендеру в export_summaries.
+    Возвращает счётчики rendered/skipped/failed.
+    """
+    output_dir.mkdir(parents=True, exist_ok=True)
+    manifest = _load_manifest(output_dir)
+    workers = workers or os.cpu_count() or 1
+    counts = {"rendered": 0, "skipped": 0, "failed": 0}
+    queue = JobQueue(db_manager)
+    queue.start_heartbeat()
+
+    try:
+        with ProcessPoolExecutor(max_workers=workers) as executor:
+            while jobs := queue.claim(JobKind.PDF, limit=claim_size):
+                job_ids = {job["video_id"]: job["id"] for job in jobs}
+                futures = {}
+                for video_id, title, summary in db_manager.iter_summaries(list(job_ids)):
+                    document_hash = content_hash(title, summary)
+                    pdf_file = output_dir / f"{video_id}.pdf"
+                    if manifest.get(str(video_id)) == document_hash and pdf_file.exists():
+                        counts["skipped"] += 1
+                        queue.complete(job_ids.pop(video_id))
+                        continue
+                    future = executor.submit(_render_summary, video_id, title, summary, str(pdf_file))
+                    futures[future] = (video_id, document_hash)
+
+                for future in as_completed(futures):
+                    video_id, document_hash = futures[future]
+                    try:
+                        future.result()
+                        manifest[str(video_id)] = document_hash
+                        counts["rendered"] += 1
+                        queue.complete(job_ids.pop(video_id))
+                    except Exception as e:
+                        counts["failed"] += 1
+                        queue.fail(job_ids.pop(video_id), str(e))
+                        print(f"❌ Не удалось отрендерить summary {video_id}: {e}")
+
+                # Осталось только то, для чего в БД нет summary
+                for job_id in job_ids.values():
+                    counts["failed"] += 1
+                    queue.fail(job_id, "summary не найден")
+                _save_manifest(output_dir, manifest)
+    finally:
+        queue.close()
+
+    print(f"✅ Отрендерено: {counts['rendered']}, без изменений: {counts['skipped']}, ошибок: {counts['failed']}")
+    return counts
+
+
+def export_collection(
+    name: str,
+    output_dir: Path = PDF_EXPORT_DIR,
+    video_ids: list[int] | None = None,
+    volume_size: int = 200,
+) -> list[Path]:
+    """
+    Собирает много summary в один PDF на коллекцию (с разбивкой на тома по volume_size).
+
+    Каждый summary рендерится в HTML-файл из кеша, а wkhtmltopdf получает список файлов
+    и склеивает их сам, так что в памяти Python не собирается общий документ.
+    Том пропускается, если его состав и содержимое не изменились с прошлого раза.
+    """
+    output_dir.mkdir(parents=True, exist_ok=True)
+    manifest = _load_manifest(output_dir)
+    volumes: list[Path] = []
+
+    def render_volume(html_files: list[str], hashes: list[str]) -> None:
+        volume_file = output_dir / f"{name}_{len(volumes) + 1:03d}.pdf"
+        volume_hash = content_hash(*hashes)
+        key = f"collection:{volume_file.name}"
+        if manifest.get(key) != volume_hash or not volume_file.exists():
+            pdfkit.from_file(html_files, str(volume_file))
+            manifest[key] = volume_hash
+            _save_manifest(output_dir, manifest)
+            print(f"📚 Собран том {volume_file} ({len(html_files)} summary)")
+        volumes.append(volume_file)
+
+    html_files: list[str] = []
+    hashes: list[str] = []
+    for _, title, summary in db_manager.iter_summaries(video_ids):
+        html_files.append(str(summary_html_file(title, summary)))
+        hashes.append(content_hash(title, summary))
+        if len(html_files) >= volume_size:
+            render_volume(html_files, hashes)
+            html_files, hashes = [], []
+    if html_files:
+        render_volume(html_files, hashes)
+
+    return volumes
+
+
+@click.group()
+def cli() -> None:
+    """Convert Markdown summaries to PDF."""
+
+
+@cli.command("file")
+@click.argument("md_file", default="input.md")
+@click.argument("pdf_file", default="output.pdf")
+def convert_file(md_file: str, pdf_file: str) -> None:
+    """Convert a single Markdown file to PDF."""
+    md_to_pdf_pdfkit(md_file, pdf_file)
+
+
+@cli.command("export")
+@click.option("--output_dir", default=str(PDF_EXPORT_DIR), help="Directory for the PDFs")
+@click.option("--workers", default=None, type=int, help="Render processes (default: CPU count)")
+def export_command(output_dir: str, workers: int | None) -> None:
+    """Render every summary from the videos table into its own PDF, skipping unchanged ones."""
+    export_summaries(Path(output_dir), workers)
+
+
+@cli.command("queue")
+@click.option("--output_dir", default=str(PDF_EXPORT_DIR), help="Directory for the PDFs")
+@click.option("--workers", default=None, type=int, help="Render processes (default: CPU count)")
+@click.option("--claim_size", default=50, help="Jobs taken from the queue at a time")
+def queue_command(output_dir: str, workers: int | None, claim_size: int) -> None:
+    """Render summaries for pdf jobs from the shared job queue (safe to run several copies)."""
+    export_queued(Path(output_dir), workers, claim_size)
+
+
+@cli.command("collection")
+@click.argument("name", default="youtube_summaries")
+@click.option("--output_dir", default=str(PDF_EXPORT_DIR), help="Directory for the PDFs")
+@click.option("--volume_size", default=200, help="Summaries per PDF volume")
+def collection_command(name: str, output_dir: str, volume_size: int) -> None:
+    """Merge all summaries into one PDF per collection, split into volumes."""
+    export_collection(name, Path(output_dir), volume_size=volume_size)
+
+
 # Использование
-md_to_pdf_pdfkit("input.md", "output.pdf")
+if __name__ == "__main__":
+    cli()
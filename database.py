@@ -1,22 +1,332 @@
+import atexit
+import hashlib
+import signal
+import threading
+import time
+import zlib
+from collections.abc import Callable, Iterator
 from contextlib import contextmanager
+from datetime import datetime, timedelta
+from itertools import islice
 
+import click
 from loguru import logger
-from models import Base, Video
-from sqlalchemy import create_engine, inspect, select
-from sqlalchemy.exc import IntegrityError
+from metrics import run_metrics
+from models import (
+    Base,
+    Job,
+    JobKind,
+    JobStatus,
+    Notebook,
+    ProcessingStatus,
+    Prompt,
+    SourceJournal,
+    SourceState,
+    SourceSummary,
+    SummaryBlob,
+    Video,
+)
+from sqlalchemy import create_engine, event, func, inspect, or_, select, text, update
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+from sqlalchemy.exc import IntegrityError, OperationalError
 from sqlalchemy.orm import sessionmaker
 
 
+def normalize_title(title: str) -> str:
+    """Нормализует заголовок для сравнения: схлопывает пробельные символы и приводит к одному регистру"""
+    return " ".join(title.split()).casefold()
+
+
+SUMMARY_COMPRESSION_LEVEL = 6
+
+
+def compress_summary(summary: str) -> tuple[str, bytes, int]:
+    """Возвращает (sha256 текста, сжатые zlib данные, размер несжатого текста) для SummaryBlob"""
+    raw = summary.encode("utf-8")
+    return hashlib.sha256(raw).hexdigest(), zlib.compress(raw, SUMMARY_COMPRESSION_LEVEL), len(raw)
+
+
+def decompress_summary(data: bytes) -> str:
+    return zlib.decompress(data).decode("utf-8")
+
+
+def _sql_decompress_summary(data: bytes | None) -> str | None:
+    return decompress_summary(data) if data is not None else None
+
+
+def prompt_hash(prompt: str) -> str:
+    """Версия промпта — sha256 его текста без пробельных символов по краям"""
+    return hashlib.sha256(prompt.strip().encode("utf-8")).hexdigest()
+
+
+def source_key(youtube_id: str | None, url: str | None, title: str) -> str:
+    """Идентичность источника в кэше summary: YouTube ID, иначе URL, иначе нормализованный заголовок"""
+    if youtube_id:
+        return f"youtube:{youtube_id}"
+    if url:
+        return f"url:{url}"
+    return f"title:{normalize_title(title)}"
+
+
+SQLITE_BUSY_TIMEOUT_MS = 30_000
+
+# Полнотекстовый индекс по title и summary. Тексты в нём не дублируются (external content):
+# для snippet FTS5 читает их из представления, которое распаковывает summary_blobs на лету
+SUMMARY_DOCUMENTS_VIEW_SQL = """
+    CREATE VIEW IF NOT EXISTS summary_documents AS
+    SELECT videos.id AS id, videos.title AS title, decompress_summary(summary_blobs.data) AS summary
+    FROM videos JOIN summary_blobs ON summary_blobs.hash = videos.summary_hash
+"""
+SUMMARY_FTS_SQL = """
+    CREATE VIRTUAL TABLE IF NOT EXISTS summary_fts USING fts5(
+        title, summary, content='summary_documents', content_rowid='id', tokenize='unicode61 remove_diacritics 2'
+    )
+"""
+SUMMARY_FTS_TITLE_WEIGHT = 10.0
+
+
+def _configure_sqlite_connection(dbapi_connection, connection_record):
+    """
+    Настраивает SQLite под конкурентную запись из нескольких процессов:
+    WAL позволяет читать во время записи, busy_timeout ждёт блокировку вместо "database is locked".
+    """
+    cursor = dbapi_connection.cursor()
+    cursor.execute("PRAGMA journal_mode=WAL")
+    cursor.execute("PRAGMA synchronous=NORMAL")
+    cursor.execute(f"PRAGMA busy_timeout={SQLITE_BUSY_TIMEOUT_MS}")
+    cursor.close()
+    dbapi_connection.create_function("decompress_summary", 1, _sql_decompress_summary, deterministic=True)
+
+
+def add_missing_columns(connection) -> None:
+    """create_all не меняет существующие таблицы, поэтому новые nullable-колонки и индексы добавляются здесь"""
+    inspector = inspect(connection)
+    for table in Base.metadata.sorted_tables:
+        existing = {column["name"] for column in inspector.get_columns(table.name)}
+        for column in table.columns:
+            if column.name in existing:
+                continue
+            column_type = column.type.compile(dialect=connection.dialect)
+            connection.execute(text(f"ALTER TABLE {table.name} ADD COLUMN {column.name} {column_type}"))
+            logger.info(f"Добавлена колонка {table.name}.{column.name}")
+
+        existing_indexes = {index["name"] for index in inspector.get_indexes(table.name)}
+        for index in table.indexes:
+            if index.name in existing_indexes:
+                continue
+            if index.unique and _has_duplicates(connection, table, index):
+                columns = ", ".join(column.name for column in index.columns)
+                logger.warning(
+                    f"Индекс {index.name} не создан: в {table.name} есть повторяющиеся ({columns}). "
+                    "Удалите дубли и перезапустите"
+                )
+                continue
+            index.create(connection)
+            logger.info(f"Добавлен индекс {index.name}")
+
+
+def _has_duplicates(connection, table, index) -> bool:
+    """Есть ли в таблице строки, которые нарушили бы уникальный индекс (строки с NULL не в счёт)"""
+    columns = list(index.columns)
+    stmt = (
+        select(*columns)
+        .where(*(column.isnot(None) for column in columns))
+        .group_by(*columns)
+        .having(func.count() > 1)
+        .limit(1)
+    )
+    return connection.execute(stmt).first() is not None
+
+
+# ----------------------------
+# Кэш summary по редакциям промпта. Функции принимают синхронную сессию: AsyncDatabaseManager
+# вызывает их через AsyncSession.run_sync
+# ----------------------------
+def register_prompt(session, prompt: str) -> str:
+    """Сохраняет редакцию промпта, если её ещё нет, и возвращает её хэш"""
+    digest = prompt_hash(prompt)
+    if session.get_bind().dialect.name == "sqlite":
+        session.execute(
+            sqlite_insert(Prompt)
+            .values(hash=digest, text=prompt.strip(), created_at=datetime.now())
+            .on_conflict_do_nothing()
+        )
+    elif session.get(Prompt, digest) is None:
+        session.add(Prompt(hash=digest, text=prompt.strip()))
+        session.flush()
+    return digest
+
+
+def load_title_keys(session) -> dict[str, str]:
+    """Нормализованный заголовок → source_key для видео, у которых известен YouTube ID или URL"""
+    rows = session.execute(
+        select(Video.title, Video.youtube_id, Video.url)
+        .where(or_(Video.youtube_id.isnot(None), Video.url.isnot(None)))
+        .order_by(Video.id)
+    )
+    title_keys: dict[str, str] = {}
+    for title, youtube_id, url in rows:
+        title_keys.setdefault(normalize_title(title), source_key(youtube_id, url, title))
+    return title_keys
+
+
+def resolve_source_key(
+    session, title: str, youtube_id: str | None = None, url: str | None = None, title_keys: dict | None = None
+) -> str:
+    """
+    source_key источника. Ответ NotebookLM приходит только с заголовком, поэтому YouTube ID
+    или URL берутся у видео с тем же заголовком: из title_keys (load_title_keys), если он
+    передан, иначе запросом к videos.
+    """
+    if youtube_id or url:
+        return source_key(youtube_id, url, title)
+    if title_keys is not None:
+        return title_keys.get(normalize_title(title), source_key(None, None, title))
+    row = session.execute(
+        select(Video.youtube_id, Video.url)
+        .where(Video.title == title, or_(Video.youtube_id.isnot(None), Video.url.isnot(None)))
+        .order_by(Video.id)
+        .limit(1)
+    ).first()
+    return source_key(row.youtube_id, row.url, title) if row else source_key(None, None, title)
+
+
+def record_source_summary(session, key: str, prompt_digest: str, summary_hash: str, video_id: int | None) -> None:
+    """Записывает summary источника для редакции промпта; новый ответ той же редакцией заменяет прежний"""
+    values = {
+        "source_key": key,
+        "prompt_hash": prompt_digest,
+        "summary_hash": summary_hash,
+        "video_id": video_id,
+        "created_at": datetime.now(),
+    }
+    if session.get_bind().dialect.name == "sqlite":
+        stmt = sqlite_insert(SourceSummary).values(**values)
+        session.execute(
+            stmt.on_conflict_do_update(
+                index_elements=["source_key", "prompt_hash"],
+                set_={"summary_hash": stmt.excluded.summary_hash, "video_id": stmt.excluded.video_id},
+            )
+        )
+        return
+    cached = session.execute(
+        select(SourceSummary).where(SourceSummary.source_key == key, SourceSummary.prompt_hash == prompt_digest)
+    ).scalar_one_or_none()
+    if cached is None:
+        session.add(SourceSummary(**values))
+    else:
+        cached.summary_hash, cached.video_id = summary_hash, video_id
+    session.flush()
+
+
+def cached_source_keys(session, *prompt_digests: str) -> set[str]:
+    """source_key всех источников, у которых есть summary от какой-либо из редакций промпта prompt_digests"""
+    return set(
+        session.execute(
+            select(SourceSummary.source_key).where(SourceSummary.prompt_hash.in_(prompt_digests)).distinct()
+        ).scalars()
+    )
+
+
+def adopt_source_summaries(session, prompt_digest: str) -> int:
+    """
+    Записывает в кэш summary, полученные до его появления, как ответы редакции prompt_digest.
+    Источники, у которых уже есть summary этой редакции, не трогаются. Возвращает количество записанных источников.
+    """
+    cached = cached_source_keys(session, prompt_digest)
+    title_keys = load_title_keys(session)
+    versioned = select(SourceSummary.video_id).where(SourceSummary.video_id.isnot(None))
+    rows = session.execute(
+        select(Video.id, Video.title, Video.url, Video.youtube_id, Video.summary_hash)
+        .where(Video.summary_hash.isnot(None), Video.id.notin_(versioned))
+        .order_by(Video.id.desc())
+    )
+    adopted: dict[str, SourceSummary] = {}
+    for video_id, title, url, youtube_id, summary_hash in rows:
+        key = resolve_source_key(None, title, youtube_id, url, title_keys)
+        # Строки идут от новых к старым: для источника берётся последний summary
+        if key not in cached and key not in adopted:
+            adopted[key] = SourceSummary(
+                source_key=key, prompt_hash=prompt_digest, summary_hash=summary_hash, video_id=video_id
+            )
+    session.add_all(adopted.values())
+    return len(adopted)
+
+
+def adopt_into_empty_cache(session, prompt_digest: str) -> int:
+    """
+    Пустой кэш при наличии summary значит, что база обновлена со старой версии: её summary
+    засчитываются редакции prompt_digest (adopt_source_summaries), иначе первый запуск после
+    обновления заново обработал бы все источники. Возвращает количество записанных источников.
+    """
+    if session.execute(select(SourceSummary.id).limit(1)).first() is not None:
+        return 0
+    return adopt_source_summaries(session, prompt_digest)
+
+
 class DatabaseManager:
     def __init__(self, db_url="sqlite:///youtube_videos.db"):
         self.engine = create_engine(db_url, echo=False)
+        if self.engine.dialect.name == "sqlite":
+            event.listen(self.engine, "connect", _configure_sqlite_connection)
         self.SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=self.engine)
+        # Нормализованные заголовки видео с summary; None, пока индекс не загружен
+        self._summarised_titles: set[str] | None = None
+        # Есть ли в БД таблица summary_fts; None, пока не проверено
+        self._fts_available: bool | None = None
+
+        # Текущая редакция промпта (см. use_prompt); None — проверка наличия summary без учёта промпта
+        self._prompt_hash: str | None = None
+        # Текущая редакция и её варианты (например, батч-промпт): их summary считаются актуальными
+        self._prompt_hashes: tuple[str, ...] = ()
+        # source_key с summary от текущей редакции и заголовки с известным source_key; None, пока не загружены
+        self._cached_keys: set[str] | None = None
+        self._title_keys: dict[str, str] | None = None
+
+        # Отложенная пакетная запись (см. enable_write_behind)
+        self._write_behind = False
+        self._pending_videos: list[dict] = []
+        self._pending_lock = threading.RLock()
+        self._batch_size = 20
+        self._flush_interval = 30.0
+        self._flusher_stop = threading.Event()
+        self._flusher: threading.Thread | None = None
+        # Вызываются со списком записанных строк после каждого успешного коммита insert_video/flush
+        self._flush_listeners: list[Callable[[list[dict]], None]] = []
 
     def create_tables(self):
-        """Создает все таблицы"""
+        """
+        Создает все таблицы, досоздаёт колонки, добавленные в модели после создания таблиц,
+        и переносит summary из старой колонки videos.summary (см. migrate_summaries): проверки
+        наличия summary смотрят только на summary_hash.
+        """
         Base.metadata.create_all(bind=self.engine)
+        self._add_missing_columns()
+        self._create_search_index()
+        self.migrate_summaries()
         logger.info("Таблицы созданы успешно")
 
+    def _create_search_index(self) -> None:
+        """Создаёт FTS5-индекс summary_fts и заполняет его, если он создан впервые (только SQLite)"""
+        if self.engine.dialect.name != "sqlite":
+            return
+        created = not self.table_exists("summary_fts")
+        try:
+            with self.engine.begin() as connection:
+                connection.execute(text(SUMMARY_DOCUMENTS_VIEW_SQL))
+                connection.execute(text(SUMMARY_FTS_SQL))
+        except OperationalError as e:
+            logger.warning(f"Полнотекстовый поиск недоступен (SQLite без FTS5?): {e}")
+            self._fts_available = False
+            return
+        self._fts_available = True
+        if created:
+            self.rebuild_search_index()
+
+    def _add_missing_columns(self) -> None:
+        with self.engine.begin() as connection:
+            add_missing_columns(connection)
+
     def drop_tables(self):
         """Удаляет все таблицы"""
         Base.metadata.drop_all(bind=self.engine)
@@ -41,21 +351,71 @@ class DatabaseManager:
         inspector = inspect(self.engine)
         return table_name in inspector.get_table_names()
 
+    def use_prompt(self, prompt: str, *variants: str) -> str:
+        """
+        Задаёт редакцию промпта, которой получаются summary, и сохраняет её текст в prompts.
+
+        После этого video_exists_by_title считает источник обработанным, только если у него
+        есть summary от этой редакции или одного из variants — других промптов того же запуска
+        (например, prompts.batch_prompt_template). insert_video записывает summary в кэш
+        source_summaries под prompt_digest строки, по умолчанию — под этой редакцией.
+        Если кэш ещё пуст, существующие summary засчитываются этой редакции (adopt_into_empty_cache).
+        Возвращает хэш редакции.
+        """
+        with self.session_scope() as session:
+            # Вставка в prompts берёт блокировку записи SQLite, поэтому параллельные воркеры
+            # проверяют пустой кэш по очереди и засчитывает summary только первый
+            self._prompt_hash = register_prompt(session, prompt)
+            self._prompt_hashes = (self._prompt_hash, *(register_prompt(session, variant) for variant in variants))
+            adopted = adopt_into_empty_cache(session, self._prompt_hash)
+        self._cached_keys = None
+        logger.info(f"Редакция промпта: {self._prompt_hash[:12]}")
+        if adopted:
+            logger.info(f"Кэш summary был пуст: засчитано {adopted} источников с summary")
+        return self._prompt_hash
+
+    def load_summarised_titles(self) -> int:
+        """
+        Загружает одним запросом заголовки всех видео с summary в память.
+
+        После загрузки video_exists_by_title отвечает по множеству без обращения к БД,
+        а insert_video дополняет множество новыми записями. Если задана редакция промпта
+        (use_prompt), вместо заголовков загружаются source_key с summary от неё или её вариантов.
+        Возвращает количество загруженных заголовков или источников.
+        """
+        with self.session_scope() as session:
+            if self._prompt_hash is not None:
+                self._title_keys = load_title_keys(session)
+                self._cached_keys = cached_source_keys(session, *self._prompt_hashes)
+                logger.info(f"Загружено {len(self._cached_keys)} источников с summary текущей редакции промпта")
+                return len(self._cached_keys)
+            titles = session.execute(select(Video.title).where(Video.summary_hash.isnot(None))).scalars()
+            self._summarised_titles = {normalize_title(title) for title in titles}
+
+        logger.info(f"Загружено {len(self._summarised_titles)} заголовков с summary")
+        return len(self._summarised_titles)
+
     def video_exists_by_title(self, title: str) -> bool:
         """
         Проверяет, существует ли в базе данных запись с данным title.
+
+        Если индекс загружен через load_summarised_titles, проверка идёт в памяти.
+        При заданной редакции промпта проверяется кэш summary (см. summary_cached).
         """
+        if self._prompt_hash is not None:
+            return self.summary_cached(title)
+        if self._summarised_titles is not None:
+            return normalize_title(title) in self._summarised_titles
+
         logger.info(f"Проверка существования видео с заголовком: '{title[:30]}...'")
         try:
             with self.session_scope() as session:
-                # Используем statement API (SELECT) для более чистого кода
-                stmt = select(Video).where(Video.title == title, Video.summary.isnot(None))
-
-                # Используем .one_or_none() для эффективной проверки существования
-                video = session.execute(stmt).scalars().first()
+                # Выбираем только id: для проверки существования строка видео целиком не нужна
+                stmt = select(Video.id).where(Video.title == title, Video.summary_hash.isnot(None)).limit(1)
+                video_id = session.execute(stmt).scalar()
 
-                if video:
-                    logger.warning(f"⚠️ Видео с заголовком '{title[:30]}...' уже существует (ID: {video.id}).")
+                if video_id is not None:
+                    logger.warning(f"⚠️ Видео с заголовком '{title[:30]}...' уже существует (ID: {video_id}).")
                     return True
                 return False
 
@@ -64,29 +424,759 @@ class DatabaseManager:
             logger.error(f"❌ Ошибка при проверке существования видео по title: {e}")
             return False
 
+    def summary_cached(self, title: str, youtube_id: str | None = None, url: str | None = None) -> bool:
+        """Есть ли у источника summary от текущей редакции промпта (источник — см. resolve_source_key)"""
+        if self._cached_keys is not None:
+            return resolve_source_key(None, title, youtube_id, url, self._title_keys) in self._cached_keys
+        with self.session_scope() as session:
+            key = resolve_source_key(session, title, youtube_id, url)
+            cached = session.execute(
+                select(SourceSummary.id)
+                .where(SourceSummary.source_key == key, SourceSummary.prompt_hash.in_(self._prompt_hashes))
+                .limit(1)
+            ).scalar()
+        if cached is not None:
+            logger.warning(f"⚠️ Для '{title[:30]}...' уже есть summary текущей редакции промпта.")
+        return cached is not None
+
+    def enable_write_behind(self, batch_size: int = 20, flush_interval: float = 30.0) -> None:
+        """
+        Включает отложенную запись: insert_video только ставит строку в очередь,
+        а очередь коммитится одной транзакцией при накоплении batch_size строк,
+        раз в flush_interval секунд и при выходе из процесса, в том числе по SIGTERM/SIGINT.
+        """
+        self._write_behind = True
+        self._batch_size = batch_size
+        self._flush_interval = flush_interval
+
+        if self._flusher is None:
+            self._flusher_stop.clear()
+            self._flusher = threading.Thread(target=self._flush_periodically, name="video-write-behind", daemon=True)
+            self._flusher.start()
+            atexit.register(self.close)
+            self._install_signal_handlers()
+
+        logger.info(f"Отложенная запись включена: пакет {batch_size} строк, интервал {flush_interval} сек.")
+
+    def add_flush_listener(self, listener: Callable[[list[dict]], None]) -> None:
+        """
+        Регистрирует обработчик, который вызывается с аргументами insert_video
+        записанных строк, как только они реально закоммичены в БД.
+        """
+        self._flush_listeners.append(listener)
+
+    def _notify_flushed(self, rows: list[dict]) -> None:
+        for listener in self._flush_listeners:
+            try:
+                listener(rows)
+            except Exception as e:
+                logger.error(f"❌ Ошибка в обработчике записи: {e}")
+
+    def _flush_periodically(self) -> None:
+        """Фоновый поток: сбрасывает очередь раз в flush_interval секунд"""
+        while not self._flusher_stop.wait(self._flush_interval):
+            self.flush()
+
+    def _install_signal_handlers(self) -> None:
+        """
+        Превращает SIGTERM/SIGINT в исключение в основном потоке, чтобы очередь сбросил close (atexit).
+
+        Писать из самого обработчика нельзя: основной поток может быть внутри сессии, держащей
+        блокировку записи SQLite, и flush ждал бы сам себя до busy_timeout. Исключение сначала
+        раскручивает стек (session_scope откатывает транзакцию), а затем atexit пишет очередь.
+        """
+        if threading.current_thread() is not threading.main_thread():
+            return
+
+        for signum in (signal.SIGTERM, signal.SIGINT):
+            previous = signal.getsignal(signum)
+
+            def handler(sig, frame, previous=previous):
+                if callable(previous):
+                    previous(sig, frame)  # для SIGINT это KeyboardInterrupt
+                elif previous == signal.SIG_DFL:
+                    raise SystemExit(128 + sig)
+
+            signal.signal(signum, handler)
+
+    def flush(self) -> int:
+        """
+        Коммитит накопленные строки одной транзакцией.
+
+        Если пакет нарушает ограничение целостности, строки вставляются по одной,
+        чтобы одна плохая строка не потеряла весь пакет.
+        Возвращает количество записанных строк.
+        """
+        with self._pending_lock:
+            batch, self._pending_videos = self._pending_videos, []
+        if not batch:
+            return 0
+
+        started = time.monotonic()
+        try:
+            with run_metrics.stage("db_write", f"batch of {len(batch)}"), self.session_scope() as session:
+                videos = [self._build_video(session, kwargs) for kwargs in batch]
+                session.add_all(videos)
+                session.flush()
+                for video, kwargs in zip(videos, batch, strict=True):
+                    self._index_summary(session, video.id, video.title, kwargs.get("summary"))
+                    self._cache_summary(session, video, kwargs.get("prompt_digest"))
+        except IntegrityError:
+            logger.warning("Пакет нарушает ограничение целостности, вставляю строки по одной")
+            inserted = [kwargs for kwargs in batch if self._insert_now(**kwargs)]
+            self._notify_flushed(inserted)
+            return len(inserted)
+        except Exception as e:
+            logger.error(f"❌ Не удалось записать пакет из {len(batch)} видео: {e}")
+            with self._pending_lock:
+                self._pending_videos = batch + self._pending_videos
+            return 0
+        except BaseException:
+            # Прерван сигналом (SystemExit/KeyboardInterrupt): пакет вернётся в очередь и запишется в close
+            with self._pending_lock:
+                self._pending_videos = batch + self._pending_videos
+            raise
+
+        logger.info(f"✅ Записано {len(batch)} видео за {time.monotonic() - started:.3f} сек.")
+        self._notify_flushed(batch)
+        return len(batch)
+
+    def close(self) -> None:
+        """Останавливает фоновый сброс и записывает всё, что осталось в очереди"""
+        self._flusher_stop.set()
+        if self._flusher is not None and self._flusher is not threading.current_thread():
+            self._flusher.join(timeout=self._flush_interval)
+        self._flusher = None
+        self.flush()
+
     def insert_video(self, **kwargs) -> None:
         """
         Создает и вставляет новый объект Video в базу данных.
 
-        Принимает аргументы, соответствующие полям класса Video.
-        Возвращает объект Video или None в случае ошибки.
+        Принимает аргументы, соответствующие полям класса Video, и необязательный prompt_digest —
+        хэш промпта, ответом на который получен summary (по умолчанию текущая редакция, см. use_prompt).
+        При включённой отложенной записи только ставит строку в очередь (см. enable_write_behind).
         """
-        try:
+        if self._write_behind:
+            with self._pending_lock:
+                self._pending_videos.append(kwargs)
+                pending = len(self._pending_videos)
+            self._remember_summarised_title(kwargs)
+            if pending >= self._batch_size:
+                self.flush()
+            return None
+
+        if self._insert_now(**kwargs):
+            self._remember_summarised_title(kwargs)
+            self._notify_flushed([kwargs])
+        return None
+
+    def _remember_summarised_title(self, kwargs: dict) -> None:
+        """Добавляет заголовок (или source_key) в индекс load_summarised_titles, если он загружен"""
+        if kwargs.get("summary") is None:
+            return
+        if self._summarised_titles is not None:
+            self._summarised_titles.add(normalize_title(kwargs["title"]))
+        if self._cached_keys is not None:
+            self._cached_keys.add(
+                resolve_source_key(None, kwargs["title"], kwargs.get("youtube_id"), kwargs.get("url"), self._title_keys)
+            )
+
+    def _cache_summary(self, session, video: Video, prompt_digest: str | None = None) -> None:
+        """Записывает summary только что вставленного видео в кэш редакции prompt_digest (по умолчанию текущей)"""
+        if self._prompt_hash is None or video.summary_hash is None:
+            return
+        key = resolve_source_key(session, video.title, video.youtube_id, video.url, self._title_keys)
+        record_source_summary(session, key, prompt_digest or self._prompt_hash, video.summary_hash, video.id)
+
+    def _store_summary(self, session, summary: str) -> str:
+        """Сохраняет сжатый текст в summary_blobs (если такого текста ещё нет) и возвращает его ключ"""
+        digest, data, size = compress_summary(summary)
+        if self.engine.dialect.name == "sqlite":
+            session.execute(
+                sqlite_insert(SummaryBlob).values(hash=digest, data=data, size=size).on_conflict_do_nothing()
+            )
+        elif session.get(SummaryBlob, digest) is None:
+            session.add(SummaryBlob(hash=digest, data=data, size=size))
+            session.flush()
+        return digest
+
+    def _build_video(self, session, kwargs: dict) -> Video:
+        """Создаёт Video из аргументов insert_video, перекладывая summary в summary_blobs"""
+        kwargs = dict(kwargs)
+        kwargs.pop("prompt_digest", None)
+        summary = kwargs.pop("summary", None)
+        if summary is not None:
+            kwargs["summary_hash"] = self._store_summary(session, summary)
+        return Video(**kwargs)
+
+    def get_summary(self, video_id: int) -> str | None:
+        """Читает и распаковывает summary одного видео"""
+        with self.session_scope() as session:
+            data = session.execute(
+                select(SummaryBlob.data).join(Video, Video.summary_hash == SummaryBlob.hash).where(Video.id == video_id)
+            ).scalar()
+        return decompress_summary(data) if data is not None else None
+
+    def iter_summaries(self, video_ids: list[int] | None = None, chunk_size: int = 200) -> Iterator[tuple]:
+        """
+        Потоком отдаёт (id, title, summary) видео с summary, читая строки пачками по chunk_size
+        (yield_per), так что вся таблица никогда не лежит в памяти.
+        """
+        with self.session_scope() as session:
+            stmt = (
+                select(Video.id, Video.title, SummaryBlob.data)
+                .join(SummaryBlob, Video.summary_hash == SummaryBlob.hash)
+                .order_by(Video.id)
+                .execution_options(yield_per=chunk_size)
+            )
+            if video_ids is not None:
+                stmt = stmt.where(Video.id.in_(video_ids))
+            for video_id, title, data in session.execute(stmt):
+                yield video_id, title, decompress_summary(data)
+
+    def migrate_summaries(self, batch_size: int = 500) -> int:
+        """
+        Переносит тексты из старой колонки videos.summary в summary_blobs и обнуляет её.
+
+        Идёт пачками по batch_size строк, каждая пачка — своя транзакция, поэтому
+        прерванную миграцию можно просто запустить заново. Строку переносит только тот процесс,
+        который первым её обнулил, так что параллельные воркеры могут запускать миграцию
+        одновременно (её вызывает create_tables). Возвращает число перенесённых summary.
+        """
+        migrated = 0
+        while True:
+            moved = 0
             with self.session_scope() as session:
+                rows = session.execute(
+                    select(Video.id, Video.title, Video.legacy_summary)
+                    .where(Video.legacy_summary.isnot(None))
+                    .limit(batch_size)
+                ).all()
+                for video_id, title, summary in rows:
+                    summary_hash = self._store_summary(session, summary)
+                    updated = (
+                        session.query(Video)
+                        .filter(Video.id == video_id, Video.legacy_summary.isnot(None))
+                        .update({Video.summary_hash: summary_hash, Video.legacy_summary: None})
+                    )
+                    if updated:
+                        self._index_summary(session, video_id, title, summary)
+                        moved += 1
+            if not rows:
+                break
+            migrated += moved
+            logger.info(f"Перенесено summary: {migrated}")
+        return migrated
+
+    # ----------------------------
+    # Полнотекстовый поиск
+    # ----------------------------
+    def _search_index_ready(self) -> bool:
+        if self._fts_available is None:
+            self._fts_available = self.engine.dialect.name == "sqlite" and self.table_exists("summary_fts")
+        return self._fts_available
+
+    def _index_summary(self, session, video_id: int, title: str, summary: str | None) -> None:
+        """Добавляет summary в summary_fts в той же транзакции, что и саму строку видео"""
+        if summary is None or not self._search_index_ready():
+            return
+        session.execute(
+            text("INSERT INTO summary_fts(rowid, title, summary) VALUES (:id, :title, :summary)"),
+            {"id": video_id, "title": title, "summary": summary},
+        )
+
+    def rebuild_search_index(self) -> None:
+        """Перестраивает summary_fts целиком по текущему содержимому videos и summary_blobs"""
+        if not self._search_index_ready():
+            logger.warning("Индекс summary_fts не создан, сначала вызовите create_tables")
+            return
+        started = time.monotonic()
+        with self.engine.begin() as connection:
+            connection.execute(text("INSERT INTO summary_fts(summary_fts) VALUES ('rebuild')"))
+            connection.execute(text("INSERT INTO summary_fts(summary_fts) VALUES ('optimize')"))
+        logger.info(f"Индекс summary_fts перестроен за {time.monotonic() - started:.2f} сек.")
+
+    def search_summaries(self, query: str, limit: int = 20, raw: bool = False) -> list[dict]:
+        """
+        Ищет по title и summary, возвращает лучшие limit совпадений по bm25 (совпадение в заголовке
+        весит больше) со сниппетом. Без raw каждое слово запроса ищется как отдельная фраза,
+        с raw запрос передаётся в FTS5 как есть (AND/OR/NEAR, префиксы "слово*").
+
+        Словари с ключами id, title, snippet, rank.
+        """
+        if not self._search_index_ready():
+            return []
+        if not raw:
+            query = " ".join('"' + word.replace('"', '""') + '"' for word in query.split())
+        if not query:
+            return []
+
+        # ORDER BY rank с "rank MATCH" сортирует внутри FTS5, поэтому snippet
+        # (и распаковка summary) считается только для limit строк результата
+        stmt = text(
+            """
+            SELECT rowid AS id, title, snippet(summary_fts, 1, '[', ']', '…', 16) AS snippet, rank
+            FROM summary_fts
+            WHERE summary_fts MATCH :query AND rank MATCH :ranking
+            ORDER BY rank
+            LIMIT :limit
+            """
+        )
+        with self.engine.connect() as connection:
+            rows = connection.execute(
+                stmt, {"query": query, "ranking": f"bm25({SUMMARY_FTS_TITLE_WEIGHT}, 1.0)", "limit": limit}
+            )
+            return [dict(row._mapping) for row in rows]
+
+    def vacuum(self) -> None:
+        """Возвращает ОС место, освобождённое после миграции (только SQLite)"""
+        if self.engine.dialect.name != "sqlite":
+            return
+        with self.engine.connect().execution_options(isolation_level="AUTOCOMMIT") as connection:
+            connection.exec_driver_sql("VACUUM")
+        logger.info("VACUUM выполнен")
+
+    def _insert_now(self, **kwargs) -> bool:
+        """Вставляет одно видео отдельной транзакцией. Возвращает True при успехе."""
+        try:
+            with run_metrics.stage("db_write", kwargs.get("title")), self.session_scope() as session:
                 # Создание экземпляра Video
-                new_video = Video(**kwargs)
+                new_video = self._build_video(session, kwargs)
 
                 # Добавление и фиксация (commit происходит в session_scope)
                 session.add(new_video)
                 session.flush()  # Принудительно вставляет, чтобы получить ID
                 session.refresh(new_video)  # Обновляет объект с ID
+                self._index_summary(session, new_video.id, new_video.title, kwargs.get("summary"))
+                self._cache_summary(session, new_video, kwargs.get("prompt_digest"))
 
                 logger.info(f"✅ Видео '{new_video.title[:30]}...' (ID: {new_video.id}) успешно добавлено.")
-                return None
+            return True
         except IntegrityError as e:
             logger.error(f"❌ Ошибка целостности данных: URL уже существует или нарушено другое ограничение. {e}")
-            return None
+            return False
         except Exception as e:
             # Ошибки, не связанные с целостностью, обрабатываются в session_scope и перебрасываются
             logger.error(f"❌ Непредвиденная ошибка при вставке видео: {e}")
-            return None
+            return False
+
+    # ----------------------------
+    # Загрузка источников в ноутбуки
+    # ----------------------------
+    def _ingestion_candidates_filter(self) -> tuple:
+        return (
+            Video.status == ProcessingStatus.DOWNLOADED,
+            Video.notebooklm_document_id.is_(None),
+            Video.url.isnot(None),
+        )
+
+    def load_ingestion_candidates(self, limit: int | None = None, shard: int | None = None) -> list[dict]:
+        """
+        Видео в статусе DOWNLOADED, ещё не привязанные к ноутбуку, в порядке добавления.
+
+        Если задан shard — только видео, назначенные в этот шард (см. assign_shards).
+        Словари с ключами video_id, title, url, youtube_id.
+        """
+        with self.session_scope() as session:
+            stmt = (
+                select(Video.id, Video.title, Video.url, Video.youtube_id)
+                .where(*self._ingestion_candidates_filter())
+                .order_by(Video.id)
+                .limit(limit)
+            )
+            if shard is not None:
+                stmt = stmt.where(Video.notebook_shard == shard)
+            return [
+                {"video_id": video_id, "title": title, "url": url, "youtube_id": youtube_id}
+                for video_id, title, url, youtube_id in session.execute(stmt)
+            ]
+
+    def notebook_source_urls(self, notebook_id: str) -> set[str]:
+        """Ссылки видео, уже записанных как источники ноутбука notebook_id"""
+        with self.session_scope() as session:
+            urls = session.execute(
+                select(Video.url).where(Video.notebooklm_document_id == notebook_id, Video.url.isnot(None))
+            ).scalars()
+            return set(urls)
+
+    def record_notebook_sources(self, notebook_id: str, sources: list[dict]) -> int:
+        """
+        Записывает, что источники появились в ноутбуке: notebooklm_document_id и статус SENT_TO_NOTEBOOKLM.
+
+        sources — словари с ключами title, url, youtube_id и video_id; строки с video_id
+        обновляются одним executemany, для ссылок без строки в videos (CSV) строки создаются.
+        Возвращает количество записанных источников.
+        """
+        existing = [source for source in sources if source.get("video_id") is not None]
+        new = [source for source in sources if source.get("video_id") is None]
+        with self.session_scope() as session:
+            if existing:
+                session.execute(
+                    update(Video),
+                    [
+                        {
+                            "id": source["video_id"],
+                            "notebooklm_document_id": notebook_id,
+                            "status": ProcessingStatus.SENT_TO_NOTEBOOKLM,
+                        }
+                        for source in existing
+                    ],
+                )
+            new_rows = [
+                {
+                    "title": source["title"],
+                    "url": source["url"],
+                    "youtube_id": source.get("youtube_id"),
+                    "status": ProcessingStatus.SENT_TO_NOTEBOOKLM,
+                    "notebooklm_document_id": notebook_id,
+                }
+                for source in new
+            ]
+            if new_rows and self.engine.dialect.name == "sqlite":
+                # Ссылка из CSV может уже быть в videos (uq_videos_url): тогда обновляется её строка
+                stmt = sqlite_insert(Video)
+                session.execute(
+                    stmt.on_conflict_do_update(
+                        index_elements=["url"],
+                        set_={
+                            "status": stmt.excluded.status,
+                            "notebooklm_document_id": stmt.excluded.notebooklm_document_id,
+                        },
+                    ),
+                    new_rows,
+                )
+            else:
+                session.add_all(Video(**row) for row in new_rows)
+        logger.info(f"Привязано к ноутбуку {notebook_id}: {len(existing)} видео, новых строк: {len(new)}")
+        return len(sources)
+
+    # ----------------------------
+    # Шарды ноутбуков
+    # ----------------------------
+    def assign_shards(self, shard_size: int, limit: int | None = None) -> dict[int, int]:
+        """
+        Назначает видео, ожидающие загрузки в NotebookLM, в шарды не больше shard_size видео.
+
+        Сначала добираются шарды, в которых ещё есть место, затем создаются новые.
+        Всё назначение — одна транзакция, поэтому два одновременных вызова не превысят ёмкость.
+        Возвращает {шард: сколько видео в него назначено}.
+        """
+        assigned: dict[int, int] = {}
+        with self.session_scope() as session:
+            video_ids = list(
+                session.execute(
+                    select(Video.id)
+                    .where(*self._ingestion_candidates_filter(), Video.notebook_shard.is_(None))
+                    .order_by(Video.id)
+                    .limit(limit)
+                ).scalars()
+            )
+            if not video_ids:
+                return assigned
+
+            used = dict(
+                session.execute(
+                    select(Notebook.shard, func.count(Video.id))
+                    .outerjoin(Video, Video.notebook_shard == Notebook.shard)
+                    .group_by(Notebook.shard)
+                ).all()
+            )
+            free = [
+                (notebook.shard, notebook.capacity - used.get(notebook.shard, 0))
+                for notebook in session.execute(select(Notebook).order_by(Notebook.shard)).scalars()
+            ]
+            next_shard = max(used, default=-1) + 1
+
+            assignments = []
+            pending = iter(video_ids)
+            for shard, room in free:
+                for video_id in islice(pending, max(room, 0)):
+                    assignments.append({"id": video_id, "notebook_shard": shard})
+                    assigned[shard] = assigned.get(shard, 0) + 1
+            while chunk := list(islice(pending, shard_size)):
+                session.add(Notebook(shard=next_shard, capacity=shard_size))
+                assignments.extend({"id": video_id, "notebook_shard": next_shard} for video_id in chunk)
+                assigned[next_shard] = len(chunk)
+                next_shard += 1
+            session.flush()
+            session.execute(update(Video), assignments)
+
+        logger.info(f"Назначено {len(video_ids)} видео в шарды: {assigned}")
+        return assigned
+
+    def set_shard_notebook(self, shard: int, notebook_id: str) -> None:
+        """Запоминает ноутбук, созданный для шарда"""
+        with self.session_scope() as session:
+            session.execute(update(Notebook).where(Notebook.shard == shard).values(notebook_id=notebook_id))
+
+    def shard_notebook(self, shard: int) -> str | None:
+        """Путь ноутбука шарда или None, если ноутбук ещё не создан"""
+        with self.session_scope() as session:
+            return session.execute(select(Notebook.notebook_id).where(Notebook.shard == shard)).scalar()
+
+    def shard_status(self) -> list[dict]:
+        """
+        Состояние всех шардов по назначенным им видео: shard, notebook_id, capacity,
+        assigned (назначено видео), ingested (уже в ноутбуке), stored (для заголовка видео
+        есть summary), dead (попытки исчерпаны: FAILED в журнале ноутбука шарда или DEAD-задача
+        очереди) и finished (stored или dead — больше обрабатываться не будет).
+
+        Summary записывается отдельной строкой videos с тем же заголовком (см. main.store_summary),
+        поэтому видео шарда сопоставляются с summary по нормализованному заголовку.
+        """
+        with self.session_scope() as session:
+            notebooks = session.execute(
+                select(Notebook.shard, Notebook.notebook_id, Notebook.capacity).order_by(Notebook.shard)
+            ).all()
+            summarised = {
+                normalize_title(title)
+                for title in session.execute(select(Video.title).where(Video.summary_hash.isnot(None))).scalars()
+            }
+            failed = {
+                (notebook_id, normalize_title(title))
+                for notebook_id, title in session.execute(
+                    select(SourceJournal.notebook_id, SourceJournal.title)
+                    .join(Notebook, Notebook.notebook_id == SourceJournal.notebook_id)
+                    .where(SourceJournal.state == SourceState.FAILED)
+                )
+            }
+            dead_jobs = set(
+                session.execute(
+                    select(Job.video_id)
+                    .join(Video, Video.id == Job.video_id)
+                    .where(
+                        Job.kind == JobKind.NOTEBOOKLM,
+                        Job.status == JobStatus.DEAD,
+                        Video.notebook_shard.isnot(None),
+                    )
+                ).scalars()
+            )
+            shard_videos = session.execute(
+                select(Video.id, Video.notebook_shard, Video.title, Video.notebooklm_document_id).where(
+                    Video.notebook_shard.isnot(None)
+                )
+            ).all()
+
+        notebook_ids = {shard: notebook_id for shard, notebook_id, _ in notebooks}
+        counts = {
+            shard: dict.fromkeys(("assigned", "ingested", "stored", "dead", "finished"), 0) for shard in notebook_ids
+        }
+        for video_id, shard, title, document_id in shard_videos:
+            shard_counts = counts[shard]
+            normalized = normalize_title(title)
+            stored = normalized in summarised
+            dead = not stored and (video_id in dead_jobs or (notebook_ids[shard], normalized) in failed)
+            shard_counts["assigned"] += 1
+            shard_counts["ingested"] += document_id is not None
+            shard_counts["stored"] += stored
+            shard_counts["dead"] += dead
+            shard_counts["finished"] += stored or dead
+        return [
+            {"shard": shard, "notebook_id": notebook_id, "capacity": capacity, **counts[shard]}
+            for shard, notebook_id, capacity in notebooks
+        ]
+
+    # ----------------------------
+    # Кэш summary по редакциям промпта
+    # ----------------------------
+    def stale_sources(self, prompt_digest: str | None = None, limit: int | None = None) -> list[dict]:
+        """
+        Источники без summary от редакции промпта prompt_digest (по умолчанию текущей или её вариантов, см. use_prompt).
+
+        Источник — строки videos с одним source_key; его представляет строка с URL, если такая есть.
+        stale=True — summary есть, но получен другой редакцией промпта (или до появления кэша),
+        stale=False — summary нет совсем. Порядок — по id видео.
+        """
+        prompt_digests = (prompt_digest,) if prompt_digest else self._prompt_hashes
+        if not prompt_digests:
+            raise ValueError("Редакция промпта не задана: передайте prompt_digest или вызовите use_prompt")
+
+        with self.session_scope() as session:
+            current = cached_source_keys(session, *prompt_digests)
+            summarised = set(session.execute(select(SourceSummary.source_key).distinct()).scalars())
+            title_keys = load_title_keys(session)
+            rows = session.execute(
+                select(Video.id, Video.title, Video.url, Video.youtube_id, Video.summary_hash).order_by(
+                    Video.url.is_(None), Video.id
+                )
+            ).all()
+
+        sources: dict[str, dict] = {}
+        for video_id, title, url, youtube_id, summary_hash in rows:
+            key = resolve_source_key(None, title, youtube_id, url, title_keys)
+            if summary_hash is not None:
+                summarised.add(key)
+            if key not in current and key not in sources:
+                sources[key] = {
+                    "source_key": key,
+                    "video_id": video_id,
+                    "title": title,
+                    "url": url,
+                    "youtube_id": youtube_id,
+                }
+
+        stale = sorted(sources.values(), key=lambda source: source["video_id"])[:limit]
+        for source in stale:
+            source["stale"] = source["source_key"] in summarised
+        return stale
+
+    def adopt_summaries(self, prompt_digest: str | None = None) -> int:
+        """
+        Записывает в кэш summary, полученные до его появления, как ответы редакции prompt_digest
+        (по умолчанию текущей). Источники, у которых уже есть summary этой редакции, не трогаются.
+        Возвращает количество записанных источников.
+        """
+        prompt_digest = prompt_digest or self._prompt_hash
+        if prompt_digest is None:
+            raise ValueError("Редакция промпта не задана: передайте prompt_digest или вызовите use_prompt")
+
+        with self.session_scope() as session:
+            adopted = adopt_source_summaries(session, prompt_digest)
+
+        logger.info(f"Записано в кэш summary: {adopted} источников (редакция {prompt_digest[:12]})")
+        return adopted
+
+    def prompt_versions(self) -> list[dict]:
+        """Редакции промпта от старых к новым с количеством источников, у которых есть их summary"""
+        with self.session_scope() as session:
+            rows = session.execute(
+                select(Prompt.hash, Prompt.created_at, func.count(SourceSummary.id))
+                .outerjoin(SourceSummary, SourceSummary.prompt_hash == Prompt.hash)
+                .group_by(Prompt.hash, Prompt.created_at)
+                .order_by(Prompt.created_at)
+            )
+            return [
+                {"hash": digest, "created_at": created_at, "sources": count, "current": digest in self._prompt_hashes}
+                for digest, created_at, count in rows
+            ]
+
+    # ----------------------------
+    # Журнал обработки источников
+    # ----------------------------
+    def journal_entry(self, notebook_id: str, title: str) -> dict:
+        """
+        Возвращает запись журнала для источника, создавая её в состоянии QUEUED.
+
+        Словарь с ключами state, attempts, summary, prompt_digest, next_attempt_at, last_error.
+        """
+        with self.session_scope() as session:
+            entry = session.execute(
+                select(SourceJournal).where(SourceJournal.notebook_id == notebook_id, SourceJournal.title == title)
+            ).scalar_one_or_none()
+            if entry is None:
+                entry = SourceJournal(notebook_id=notebook_id, title=title, state=SourceState.QUEUED, attempts=0)
+                session.add(entry)
+                session.flush()
+            return {
+                "state": entry.state,
+                "attempts": entry.attempts,
+                "summary": entry.summary,
+                "prompt_digest": entry.prompt_hash,
+                "next_attempt_at": entry.next_attempt_at,
+                "last_error": entry.last_error,
+            }
+
+    def journal_advance(
+        self,
+        notebook_id: str,
+        title: str,
+        state: SourceState,
+        summary: str | None = None,
+        prompt_digest: str | None = None,
+    ) -> None:
+        """
+        Переводит источник в следующее состояние; summary сохраняется на этапе EXTRACTED
+        вместе с хешем промпта, которым он получен (None — основной промпт).
+        """
+        values: dict = {"state": state, "updated_at": datetime.now()}
+        if summary is not None:
+            values["summary"] = summary
+            values["prompt_hash"] = prompt_digest
+        if state == SourceState.STORED:
+            values["summary"] = None  # текст уже в videos, дублировать его в журнале незачем
+            values["prompt_hash"] = None
+            values["last_error"] = None
+        with self.session_scope() as session:
+            session.query(SourceJournal).filter_by(notebook_id=notebook_id, title=title).update(values)
+
+    def journal_fail(
+        self,
+        notebook_id: str,
+        title: str,
+        error: str,
+        max_attempts: int = 3,
+        backoff: float = 60.0,
+    ) -> bool:
+        """
+        Фиксирует неудачную попытку: увеличивает attempts и откладывает следующую попытку
+        на backoff * 2**(attempts - 1) секунд. После max_attempts источник помечается FAILED.
+        Возвращает True, если источник ещё можно повторить.
+        """
+        with self.session_scope() as session:
+            entry = session.execute(
+                select(SourceJournal).where(SourceJournal.notebook_id == notebook_id, SourceJournal.title == title)
+            ).scalar_one()
+            entry.attempts += 1
+            entry.last_error = error[:2000]
+            retryable = entry.attempts < max_attempts
+            if retryable:
+                entry.next_attempt_at = datetime.now() + timedelta(seconds=backoff * 2 ** (entry.attempts - 1))
+            else:
+                entry.state = SourceState.FAILED
+                entry.next_attempt_at = None
+            return retryable
+
+    def journal_counts(self, notebook_id: str) -> dict[str, int]:
+        """Количество источников ноутбука в каждом состоянии"""
+        with self.session_scope() as session:
+            rows = session.execute(
+                select(SourceJournal.state, func.count())
+                .where(SourceJournal.notebook_id == notebook_id)
+                .group_by(SourceJournal.state)
+            )
+            return {state.value: count for state, count in rows}
+
+
+db_manager = DatabaseManager()
+
+
+@click.group()
+def cli() -> None:
+    """Database maintenance commands."""
+
+
+@cli.command("migrate")
+@click.option("--batch_size", default=500, help="Rows moved per transaction")
+@click.option("--vacuum/--no_vacuum", default=True, help="Run VACUUM afterwards to shrink the database file")
+def migrate_command(batch_size: int, vacuum: bool) -> None:
+    """Add new columns and move inline summaries into compressed, deduplicated storage."""
+    db_manager.create_tables()
+    migrated = db_manager.migrate_summaries(batch_size)
+    logger.success(f"Перенесено summary: {migrated}")
+    if vacuum and migrated:
+        db_manager.vacuum()
+
+
+@cli.command("reindex")
+def reindex_command() -> None:
+    """Rebuild the full-text search index over video titles and summaries."""
+    db_manager.create_tables()
+    db_manager.rebuild_search_index()
+
+
+@cli.command("search")
+@click.argument("query")
+@click.option("--limit", default=20, help="Maximum number of results")
+@click.option("--raw", is_flag=True, help="Pass the query to FTS5 as is (AND/OR/NEAR, prefix*)")
+def search_command(query: str, limit: int, raw: bool) -> None:
+    """Full-text search over video titles and summaries, best matches first."""
+    started = time.monotonic()
+    results = db_manager.search_summaries(query, limit, raw)
+    for result in results:
+        click.echo(f"[{result['id']}] {result['title']}\n    {result['snippet']}\n")
+    click.echo(f"{len(results)} results in {(time.monotonic() - started) * 1000:.1f} ms")
+
+
+if __name__ == "__main__":
+    cli()
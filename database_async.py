@@ -0,0 +1,289 @@
+from collections.abc import AsyncIterator
+from contextlib import asynccontextmanager
+
+from database import (
+    SUMMARY_DOCUMENTS_VIEW_SQL,
+    SUMMARY_FTS_SQL,
+    _configure_sqlite_connection,
+    add_missing_columns,
+    adopt_into_empty_cache,
+    cached_source_keys,
+    compress_summary,
+    load_title_keys,
+    normalize_title,
+    record_source_summary,
+    register_prompt,
+    resolve_source_key,
+)
+from loguru import logger
+from metrics import run_metrics
+from models import Base, SummaryBlob, Video
+from sqlalchemy import event, inspect, select, text, update
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+from sqlalchemy.exc import IntegrityError, OperationalError
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker, create_async_engine
+
+
+class AsyncDatabaseManager:
+    """
+    Асинхронный вариант DatabaseManager на aiosqlite для корутин, которые параллельно ждут страницу.
+
+    Запросы уходят в поток aiosqlite, поэтому цикл событий не блокируется на записи в БД и
+    вкладки браузера продолжают работать. Схема и формат хранения те же, что у DatabaseManager:
+    summary сжимается в summary_blobs и попадает в summary_fts в той же транзакции.
+    """
+
+    def __init__(self, db_url="sqlite+aiosqlite:///youtube_videos.db"):
+        self.engine = create_async_engine(db_url, echo=False)
+        if self.engine.dialect.name == "sqlite":
+            event.listen(self.engine.sync_engine, "connect", _configure_sqlite_connection)
+        self.SessionLocal = async_sessionmaker(self.engine, autoflush=False, expire_on_commit=False)
+        # Нормализованные заголовки видео с summary; None, пока индекс не загружен
+        self._summarised_titles: set[str] | None = None
+        # Есть ли в БД таблица summary_fts; None, пока не проверено
+        self._fts_available: bool | None = None
+        # Текущая редакция промпта и индекс кэша summary (см. DatabaseManager.use_prompt)
+        self._prompt_hash: str | None = None
+        self._prompt_hashes: tuple[str, ...] = ()
+        self._cached_keys: set[str] | None = None
+        self._title_keys: dict[str, str] | None = None
+
+    async def create_tables(self) -> None:
+        """Создает все таблицы, досоздаёт новые колонки и индекс summary_fts (см. DatabaseManager.create_tables)"""
+        async with self.engine.begin() as connection:
+            await connection.run_sync(Base.metadata.create_all)
+            await connection.run_sync(add_missing_columns)
+        await self._create_search_index()
+        await self.migrate_summaries()
+        logger.info("Таблицы созданы успешно")
+
+    async def _create_search_index(self) -> None:
+        if self.engine.dialect.name != "sqlite":
+            return
+        created = not await self.table_exists("summary_fts")
+        try:
+            async with self.engine.begin() as connection:
+                await connection.execute(text(SUMMARY_DOCUMENTS_VIEW_SQL))
+                await connection.execute(text(SUMMARY_FTS_SQL))
+                if created:
+                    await connection.execute(text("INSERT INTO summary_fts(summary_fts) VALUES ('rebuild')"))
+        except OperationalError as e:
+            logger.warning(f"Полнотекстовый поиск недоступен (SQLite без FTS5?): {e}")
+            self._fts_available = False
+            return
+        self._fts_available = True
+
+    async def migrate_summaries(self, batch_size: int = 500) -> int:
+        """Переносит тексты из старой колонки videos.summary в summary_blobs (см. DatabaseManager.migrate_summaries)"""
+        migrated = 0
+        while True:
+            moved = 0
+            async with self.session_scope() as session:
+                rows = (
+                    await session.execute(
+                        select(Video.id, Video.title, Video.legacy_summary)
+                        .where(Video.legacy_summary.isnot(None))
+                        .limit(batch_size)
+                    )
+                ).all()
+                for video_id, title, summary in rows:
+                    summary_hash = await self._store_summary(session, summary)
+                    result = await session.execute(
+                        update(Video)
+                        .where(Video.id == video_id, Video.legacy_summary.isnot(None))
+                        .values(summary_hash=summary_hash, legacy_summary=None)
+                    )
+                    if result.rowcount:
+                        await self._index_summary(session, video_id, title, summary)
+                        moved += 1
+            if not rows:
+                break
+            migrated += moved
+            logger.info(f"Перенесено summary: {migrated}")
+        return migrated
+
+    async def close(self) -> None:
+        """Закрывает соединения пула (поток aiosqlite на каждое соединение)"""
+        await self.engine.dispose()
+
+    @asynccontextmanager
+    async def session_scope(self) -> AsyncIterator[AsyncSession]:
+        """Контекстный менеджер для сессий"""
+        async with self.SessionLocal() as session:
+            try:
+                yield session
+                await session.commit()
+            except Exception as e:
+                await session.rollback()
+                logger.error(f"Ошибка в сессии: {e}")
+                raise
+
+    async def table_exists(self, table_name: str) -> bool:
+        """Проверяет существование таблицы"""
+        async with self.engine.connect() as connection:
+            return await connection.run_sync(lambda sync_connection: inspect(sync_connection).has_table(table_name))
+
+    async def use_prompt(self, prompt: str, *variants: str) -> str:
+        """
+        Задаёт редакцию промпта для кэша summary и её variants — другие промпты того же запуска
+        (см. DatabaseManager.use_prompt). Возвращает хэш редакции
+        """
+        async with self.session_scope() as session:
+            self._prompt_hash = await session.run_sync(register_prompt, prompt)
+            self._prompt_hashes = (
+                self._prompt_hash,
+                *[await session.run_sync(register_prompt, variant) for variant in variants],
+            )
+            adopted = await session.run_sync(adopt_into_empty_cache, self._prompt_hash)
+        self._cached_keys = None
+        logger.info(f"Редакция промпта: {self._prompt_hash[:12]}")
+        if adopted:
+            logger.info(f"Кэш summary был пуст: засчитано {adopted} источников с summary")
+        return self._prompt_hash
+
+    async def load_summarised_titles(self) -> int:
+        """
+        Загружает одним запросом заголовки всех видео с summary в память, а при заданной
+        редакции промпта — source_key с summary от неё.
+
+        После загрузки video_exists_by_title и titles_exist отвечают по множеству без обращения к БД.
+        Возвращает количество загруженных заголовков или источников.
+        """
+        async with self.session_scope() as session:
+            if self._prompt_hash is not None:
+                self._title_keys = await session.run_sync(load_title_keys)
+                self._cached_keys = await session.run_sync(cached_source_keys, *self._prompt_hashes)
+                logger.info(f"Загружено {len(self._cached_keys)} источников с summary текущей редакции промпта")
+                return len(self._cached_keys)
+            titles = await session.scalars(select(Video.title).where(Video.summary_hash.isnot(None)))
+            self._summarised_titles = {normalize_title(title) for title in titles}
+
+        logger.info(f"Загружено {len(self._summarised_titles)} заголовков с summary")
+        return len(self._summarised_titles)
+
+    async def video_exists_by_title(self, title: str) -> bool:
+        """Проверяет, есть ли в базе видео с данным title и summary"""
+        return title in await self.titles_exist([title])
+
+    async def titles_exist(self, titles: list[str]) -> set[str]:
+        """
+        Возвращает те из titles, для которых в базе уже есть видео с summary.
+
+        Заголовки сравниваются нормализованными (normalize_title) по индексу в памяти, который
+        загружается одним запросом при первом вызове (см. load_summarised_titles). При заданной
+        редакции промпта проверяется кэш summary.
+        """
+        if self._prompt_hash is not None:
+            if self._cached_keys is None:
+                await self.load_summarised_titles()
+            return {
+                title
+                for title in titles
+                if resolve_source_key(None, title, title_keys=self._title_keys) in self._cached_keys
+            }
+        if self._summarised_titles is None:
+            await self.load_summarised_titles()
+        return {title for title in titles if normalize_title(title) in self._summarised_titles}
+
+    async def _store_summary(self, session: AsyncSession, summary: str) -> str:
+        """Сохраняет сжатый текст в summary_blobs (если такого текста ещё нет) и возвращает его ключ"""
+        digest, data, size = compress_summary(summary)
+        if self.engine.dialect.name == "sqlite":
+            await session.execute(
+                sqlite_insert(SummaryBlob).values(hash=digest, data=data, size=size).on_conflict_do_nothing()
+            )
+        elif await session.get(SummaryBlob, digest) is None:
+            session.add(SummaryBlob(hash=digest, data=data, size=size))
+            await session.flush()
+        return digest
+
+    async def _build_video(self, session: AsyncSession, kwargs: dict) -> Video:
+        kwargs = dict(kwargs)
+        kwargs.pop("prompt_digest", None)
+        summary = kwargs.pop("summary", None)
+        if summary is not None:
+            kwargs["summary_hash"] = await self._store_summary(session, summary)
+        return Video(**kwargs)
+
+    async def _index_summary(self, session: AsyncSession, video_id: int, title: str, summary: str | None) -> None:
+        if summary is None:
+            return
+        if self._fts_available is None:
+            self._fts_available = self.engine.dialect.name == "sqlite" and await self.table_exists("summary_fts")
+        if self._fts_available:
+            await session.execute(
+                text("INSERT INTO summary_fts(rowid, title, summary) VALUES (:id, :title, :summary)"),
+                {"id": video_id, "title": title, "summary": summary},
+            )
+
+    async def _add_videos(self, session: AsyncSession, rows: list[dict]) -> None:
+        videos = [await self._build_video(session, kwargs) for kwargs in rows]
+        session.add_all(videos)
+        await session.flush()
+        for video, kwargs in zip(videos, rows, strict=True):
+            await self._index_summary(session, video.id, video.title, kwargs.get("summary"))
+        if self._prompt_hash is not None:
+            await session.run_sync(self._cache_summaries, videos, rows)
+
+    def _cache_summaries(self, session, videos: list[Video], rows: list[dict]) -> None:
+        """
+        Записывает summary вставленных видео в кэш редакции prompt_digest строки, по умолчанию
+        текущей (синхронная сессия run_sync)
+        """
+        for video, kwargs in zip(videos, rows, strict=True):
+            if video.summary_hash is not None:
+                key = resolve_source_key(session, video.title, video.youtube_id, video.url, self._title_keys)
+                prompt_digest = kwargs.get("prompt_digest") or self._prompt_hash
+                record_source_summary(session, key, prompt_digest, video.summary_hash, video.id)
+
+    def _remember_summarised_titles(self, rows: list[dict]) -> None:
+        rows = [row for row in rows if row.get("summary")]
+        if self._summarised_titles is not None:
+            self._summarised_titles.update(normalize_title(row["title"]) for row in rows)
+        if self._cached_keys is not None:
+            self._cached_keys.update(
+                resolve_source_key(None, row["title"], row.get("youtube_id"), row.get("url"), self._title_keys)
+                for row in rows
+            )
+
+    async def insert_video(self, **kwargs) -> bool:
+        """
+        Создает и вставляет новый объект Video отдельной транзакцией.
+
+        Принимает аргументы, соответствующие полям класса Video. Возвращает True при успехе.
+        """
+        try:
+            with run_metrics.stage("db_write", kwargs.get("title")):
+                async with self.session_scope() as session:
+                    await self._add_videos(session, [kwargs])
+        except IntegrityError as e:
+            logger.error(f"❌ Ошибка целостности данных: URL уже существует или нарушено другое ограничение. {e}")
+            return False
+        except Exception as e:
+            logger.error(f"❌ Непредвиденная ошибка при вставке видео: {e}")
+            return False
+
+        self._remember_summarised_titles([kwargs])
+        logger.info(f"✅ Видео '{kwargs['title'][:30]}...' успешно добавлено.")
+        return True
+
+    async def insert_videos(self, rows: list[dict]) -> int:
+        """
+        Вставляет несколько видео одной транзакцией (аргументы каждой строки — как у insert_video).
+
+        Если пакет нарушает ограничение целостности, строки вставляются по одной,
+        чтобы одна плохая строка не потеряла весь пакет. Возвращает количество записанных строк.
+        """
+        if not rows:
+            return 0
+        try:
+            with run_metrics.stage("db_write", f"batch of {len(rows)}"):
+                async with self.session_scope() as session:
+                    await self._add_videos(session, rows)
+        except IntegrityError:
+            logger.warning("Пакет нарушает ограничение целостности, вставляю строки по одной")
+            return sum([await self.insert_video(**kwargs) for kwargs in rows])
+
+        self._remember_summarised_titles(rows)
+        logger.info(f"✅ Записано {len(rows)} видео")
+        return len(rows)
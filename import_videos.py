@@ -1,7 +1,10 @@
 import re
+from collections.abc import Iterable, Iterator
 
 from database import db_manager
 from models import ProcessingStatus, Video
+from sqlalchemy import select
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
 
 
 def extract_youtube_id(url: str) -> str | None:
@@ -42,50 +45,96 @@ def parse_line2(line: str) -> tuple[str, str] | None:
         url = splitted[-1]
         title = splitted[-2]
     except IndexError:
-        import ipdb
-
-        ipdb.set_trace()
+        return None
     return title, url
 
 
-def import_videos_from_file(filename="videos.txt"):
-    """Импортирует данные из текстового файла в БД"""
-    db_manager.create_tables()
+def iter_parsed_lines(lines: Iterable[str], counts: dict[str, int]) -> Iterator[tuple[str, str]]:
+    """
+    Лениво разбирает строки файла в (title, url).
 
-    with open(filename, "r", encoding="utf-8") as f:
-        lines = f.readlines()
+    Служебные строки yt-dlp (WARNING/ERROR) и пустые строки пропускаются молча,
+    строки без заголовка или ссылки учитываются в counts["malformed"].
+    """
+    for line in lines:
+        if line.startswith(("WARNING", "ERROR")) or not line.strip():
+            continue
+        # parsed = parse_line(line)
+        parsed = parse_line2(line)
+
+        if not parsed or not parsed[0].strip() or not parsed[1].startswith(("http://", "https://")):
+            counts["malformed"] += 1
+            continue
+        yield parsed
+
+
+def _insert_chunk(rows: list[dict]) -> int:
+    """
+    Вставляет пачку строк одним executemany, возвращает число вставленных.
+
+    Ссылки, которые уже есть в БД (уникальный индекс uq_videos_url), пропускаются, поэтому
+    параллельный или повторный импорт не создаёт дублей, даже если множества в памяти устарели.
+    """
+    with db_manager.engine.begin() as connection:
+        result = connection.execute(sqlite_insert(Video).on_conflict_do_nothing(index_elements=["url"]), rows)
+    return result.rowcount
+
+
+def import_videos_from_file(filename="videos.txt", chunk_size: int = 1000) -> dict[str, int]:
+    """
+    Импортирует данные из текстового файла в БД.
 
-    added, skipped = 0, 0
+    Файл читается построчно, дубликаты (по url и youtube_id, как уже лежащие в БД,
+    так и повторяющиеся внутри файла) отсекаются по множествам в памяти,
+    а запись идёт пачками по chunk_size строк; ссылки, добавленные в БД после загрузки
+    множеств (параллельный импорт), отсекает уникальный индекс по url.
+    Возвращает счётчики added/skipped/malformed.
+    """
+    db_manager.create_tables()
 
     with db_manager.session_scope() as session:
-        for line in lines:
-            if line.startswith(("WARNING", "ERROR")):
-                continue
-            # parsed = parse_line(line)
-            parsed = parse_line2(line)
+        known_urls = set(session.execute(select(Video.url).where(Video.url.isnot(None))).scalars())
+        known_youtube_ids = set(session.execute(select(Video.youtube_id).where(Video.youtube_id.isnot(None))).scalars())
 
-            if not parsed:
-                continue
+    counts = {"added": 0, "skipped": 0, "malformed": 0}
+    chunk: list[dict] = []
 
-            title, url = parsed
+    with open(filename, "r", encoding="utf-8") as f:
+        for title, url in iter_parsed_lines(f, counts):
             youtube_id = extract_youtube_id(url)
 
             # Проверяем, есть ли уже такое видео
-            exists = session.query(Video).filter_by(url=url).first()
-            if exists:
-                skipped += 1
+            if url in known_urls or (youtube_id and youtube_id in known_youtube_ids):
+                counts["skipped"] += 1
                 continue
-
-            video = Video(
-                title=title,
-                url=url,
-                youtube_id=youtube_id,
-                status=ProcessingStatus.DOWNLOADED,
+            known_urls.add(url)
+            if youtube_id:
+                known_youtube_ids.add(youtube_id)
+
+            chunk.append(
+                {
+                    "title": title,
+                    "url": url,
+                    "youtube_id": youtube_id,
+                    "status": ProcessingStatus.DOWNLOADED,
+                }
             )
-            session.add(video)
-            added += 1
-
-    print(f"✅ Добавлено: {added}, пропущено (уже в БД): {skipped}")
+            if len(chunk) >= chunk_size:
+                added = _insert_chunk(chunk)
+                counts["added"] += added
+                counts["skipped"] += len(chunk) - added
+                chunk = []
+
+    if chunk:
+        added = _insert_chunk(chunk)
+        counts["added"] += added
+        counts["skipped"] += len(chunk) - added
+
+    print(
+        f"✅ Добавлено: {counts['added']}, пропущено (уже в БД): {counts['skipped']}, "
+        f"некорректных строк: {counts['malformed']}"
+    )
+    return counts
 
 
 if __name__ == "__main__":
@@ -0,0 +1,253 @@
+import time
+from itertools import islice
+
+import click
+from adspower_api_utils import close_browser
+from browser_pool import BROWSER_IDLE_TTL, BrowserPool
+from database import DatabaseManager, normalize_title
+from import_videos import extract_youtube_id
+from loguru import logger
+from main import NOTEBOOK_ID, NOTEBOOKLM_URL, create_source_list
+from metrics import run_metrics
+from notebooklm_page import (
+    MAX_NOTEBOOK_SOURCES,
+    URLS_PER_DIALOG,
+    add_sources,
+    wait_for_sources,
+)
+from patchright.sync_api import Page, sync_playwright
+
+
+def load_csv_sources(source_type: str) -> list[dict]:
+    """Ссылки из sources/{source_type}_links.csv (см. main.create_source_list)"""
+    return [
+        {"video_id": None, "title": None, "url": url, "youtube_id": extract_youtube_id(url), "source_type": source_type}
+        for url in create_source_list(source_type)
+    ]
+
+
+def load_downloaded_sources(
+    db_manager: DatabaseManager, limit: int | None = None, shard: int | None = None
+) -> list[dict]:
+    """Видео в статусе DOWNLOADED, ещё не привязанные к ноутбуку (только шарда shard, если он задан)"""
+    return [
+        {**video, "source_type": "youtube" if video["youtube_id"] else "website"}
+        for video in db_manager.load_ingestion_candidates(limit, shard)
+    ]
+
+
+def insert_in_dialogs(page: Page, sources: list[dict], urls_per_dialog: int) -> list[dict]:
+    """
+    Вставляет источники пачками: по одному окну "Добавить источник" на пачку ссылок одного типа.
+
+    Ошибка в одном окне не прерывает загрузку: окно закрывается, его ссылки пропускаются.
+    Возвращает источники, вставка которых прошла, в порядке вставки.
+    """
+    inserted: list[dict] = []
+    for source_type in URLS_PER_DIALOG:
+        typed = iter([source for source in sources if source["source_type"] == source_type])
+        chunk_size = max(min(urls_per_dialog, URLS_PER_DIALOG[source_type]), 1)
+        while chunk := list(islice(typed, chunk_size)):
+            label = f"{source_type} [{len(inserted) + 1}-{len(inserted) + len(chunk)}]"
+            try:
+                with run_metrics.stage("source_insert", label):
+                    add_sources(page, source_type, [source["url"] for source in chunk])
+            except Exception as e:
+                logger.error(f"Не удалось вставить {label}: {e}")
+                page.keyboard.press("Escape")
+                continue
+            inserted.extend(chunk)
+            logger.info(f"Вставлено {label}")
+    return inserted
+
+
+def match_new_sources(
+    inserted: list[dict], before_titles: set[str], snapshot: list[dict]
+) -> tuple[list[dict], list[dict]]:
+    """
+    Сопоставляет вставленные ссылки с источниками, появившимися в ноутбуке.
+
+    Видео из БД сопоставляются по заголовку. Ссылкам без известного заголовка (CSV) новые
+    источники назначаются по порядку вставки, но только если их число совпало — иначе
+    сопоставление было бы угадыванием. Возвращает (сопоставленные с заголовком из
+    ноутбука, не найденные в ноутбуке).
+    """
+    new_titles = {
+        normalize_title(source["title"]): source["title"]
+        for source in snapshot
+        if source["title"] and normalize_title(source["title"]) not in before_titles
+    }
+    matched: list[dict] = []
+    unmatched: list[dict] = []
+    for source in inserted:
+        key = normalize_title(source["title"]) if source["title"] else None
+        if key in new_titles:
+            matched.append({**source, "title": new_titles.pop(key)})
+        else:
+            unmatched.append(source)
+
+    if unmatched and len(unmatched) == len(new_titles):
+        matched.extend({**source, "title": title} for source, title in zip(unmatched, new_titles.values(), strict=True))
+        unmatched = []
+    return matched, unmatched
+
+
+def ingest_into_page(
+    page: Page,
+    db_manager: DatabaseManager,
+    sources: list[dict],
+    notebook_id: str,
+    urls_per_dialog: int = URLS_PER_DIALOG["website"],
+    confirm_timeout: float = 300.0,
+) -> int:
+    """
+    Загружает ссылки в ноутбук, уже открытый на page, и записывает привязку в Video.notebooklm_document_id.
+
+    Уже привязанные к ноутбуку и уже присутствующие в нём источники пропускаются, лишние сверх
+    MAX_NOTEBOOK_SOURCES отбрасываются. Появление источников подтверждается одним снимком
+    списка после всех вставок (wait_for_sources), а не проверкой после каждой ссылки.
+    Возвращает количество источников, записанных в БД как добавленные в ноутбук.
+    """
+    known_urls = db_manager.notebook_source_urls(notebook_id)
+    sources = [source for source in sources if source["url"] not in known_urls]
+
+    # Снимок после того, как список источников дорисуется (в пустом ноутбуке — пустой)
+    before = wait_for_sources(page, 0, timeout=confirm_timeout)["sources"]
+    before_titles = {normalize_title(source["title"]) for source in before if source["title"]}
+
+    # Видео, которые уже есть в ноутбуке, только привязываю, без повторной вставки
+    present = [source for source in sources if source["title"] and normalize_title(source["title"]) in before_titles]
+    recorded = db_manager.record_notebook_sources(notebook_id, present) if present else 0
+    sources = [source for source in sources if source not in present]
+
+    capacity = MAX_NOTEBOOK_SOURCES - len(before)
+    if len(sources) > capacity:
+        logger.warning(f"В ноутбуке {len(before)} источников, помещается ещё {capacity} из {len(sources)}")
+        sources = sources[: max(capacity, 0)]
+    if not sources:
+        logger.info("Новых источников для загрузки нет")
+        return recorded
+
+    logger.info(f"Загружаю {len(sources)} источников в {notebook_id} (уже в ноутбуке: {len(before)})")
+    inserted = insert_in_dialogs(page, sources, urls_per_dialog)
+
+    with run_metrics.stage("source_confirm", f"{len(inserted)} sources"):
+        result = wait_for_sources(page, len(before) + len(inserted), timeout=confirm_timeout)
+    if not result["done"]:
+        logger.warning(f"За {confirm_timeout} сек. обработаны не все источники, сопоставляю то, что появилось")
+
+    matched, unmatched = match_new_sources(inserted, before_titles, result["sources"])
+    recorded += db_manager.record_notebook_sources(notebook_id, matched)
+    for source in unmatched:
+        logger.error(f"Источник не появился в ноутбуке: {source['url']}")
+    return recorded
+
+
+def ingest_sources(
+    profile_number: str,
+    sources: list[dict],
+    notebook_id: str = NOTEBOOK_ID,
+    urls_per_dialog: int = URLS_PER_DIALOG["website"],
+    confirm_timeout: float = 300.0,
+    keep_browser: bool = False,
+    browser_ttl: float = BROWSER_IDLE_TTL,
+) -> int:
+    """
+    Загружает ссылки в ноутбук NotebookLM в браузере профиля AdsPower (см. ingest_into_page).
+
+    Args:
+        profile_number (str): Номер профиля AdsPower
+        sources (list[dict]): Источники из load_csv_sources или load_downloaded_sources
+        notebook_id (str): Путь ноутбука вида "/notebook/<uuid>"
+        urls_per_dialog (int): Сколько ссылок вставлять в одно окно (не больше, чем позволяет UI)
+        confirm_timeout (float): Сколько ждать, пока NotebookLM обработает вставленные источники (сек)
+        keep_browser (bool): Оставить браузер запущенным для следующего запуска (см. BrowserPool)
+        browser_ttl (float): Через сколько секунд простоя закрывать оставленный браузер
+
+    Returns:
+        int: Количество источников, записанных в БД как добавленные в ноутбук
+    """
+    started = time.monotonic()
+    run_metrics.reset()
+    db_manager = DatabaseManager()
+    db_manager.create_tables()
+
+    recorded = 0
+    try:
+        with sync_playwright() as playwright:
+            pool = BrowserPool(playwright, idle_ttl=browser_ttl)
+            page = pool.acquire_page(profile_number, NOTEBOOKLM_URL + notebook_id)
+            if page is None:
+                logger.error(f"Failed to launch browser for profile {profile_number}.")
+                return 0
+            recorded = ingest_into_page(page, db_manager, sources, notebook_id, urls_per_dialog, confirm_timeout)
+            pool.close_all(stop_browsers=not keep_browser)
+    finally:
+        if not keep_browser:
+            close_browser(profile_number)
+        run_metrics.log_summary()
+
+    logger.success(f"Записано {recorded} источников за {round(time.monotonic() - started)} сек.")
+    return recorded
+
+
+@click.command()
+@click.option("--profile_number", default="1", help="Profile number for the browser instance")
+@click.option(
+    "--source",
+    type=click.Choice(["csv", "downloaded"]),
+    default="downloaded",
+    help="Where to take links from: sources/{type}_links.csv or videos in status DOWNLOADED",
+)
+@click.option(
+    "--source_type",
+    type=click.Choice(["website", "youtube"]),
+    default="youtube",
+    help="Which CSV file to read with --source csv",
+)
+@click.option("--notebook_id", default=NOTEBOOK_ID, help='Notebook path, "/notebook/<uuid>"')
+@click.option(
+    "--urls_per_dialog",
+    default=URLS_PER_DIALOG["website"],
+    help="Links pasted into one Add source dialog where the UI accepts several",
+)
+@click.option("--limit", default=None, type=int, help="Take at most this many DOWNLOADED videos")
+@click.option("--confirm_timeout", default=300.0, help="Max seconds to wait for inserted sources to appear")
+@click.option("--keep_browser", is_flag=True, help="Leave the AdsPower browser running so the next run reuses it")
+@click.option(
+    "--browser_ttl", default=BROWSER_IDLE_TTL, help="Seconds a kept browser may stay idle before it is closed"
+)
+def main(
+    profile_number: str,
+    source: str,
+    source_type: str,
+    notebook_id: str,
+    urls_per_dialog: int,
+    limit: int | None,
+    confirm_timeout: float,
+    keep_browser: bool,
+    browser_ttl: float,
+) -> None:
+    """
+    Add links to a NotebookLM notebook in bulk and record which videos landed in it.
+    """
+    if source == "csv":
+        sources = load_csv_sources(source_type)
+    else:
+        db_manager = DatabaseManager()
+        db_manager.create_tables()
+        sources = load_downloaded_sources(db_manager, limit)
+    logger.info(f"Источников к загрузке: {len(sources)}")
+    ingest_sources(
+        profile_number,
+        sources,
+        notebook_id=notebook_id,
+        urls_per_dialog=urls_per_dialog,
+        confirm_timeout=confirm_timeout,
+        keep_browser=keep_browser,
+        browser_ttl=browser_ttl,
+    )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,361 @@
+import os
+import socket
+import threading
+from datetime import datetime, timedelta
+
+import click
+from database import DatabaseManager, normalize_title
+from loguru import logger
+from models import Job, JobKind, JobStatus, ProcessingStatus, Video
+from sqlalchemy import and_, func, select, update
+from sqlalchemy.dialects.postgresql import insert as postgresql_insert
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+
+
+DEFAULT_LEASE_SECONDS = 15 * 60
+RETRY_BACKOFF = 60.0  # сек, удваивается с каждой попыткой
+ENQUEUE_CHUNK_SIZE = 500
+
+
+def default_worker_id() -> str:
+    return f"{socket.gethostname()}:{os.getpid()}"
+
+
+class JobQueue:
+    """
+    Очередь задач в таблице jobs, общая для всех воркеров на всех машинах с доступом к БД.
+
+    claim атомарно переводит до limit задач из PENDING в LEASED одним UPDATE ... RETURNING
+    (в PostgreSQL выборка кандидатов идёт с FOR UPDATE SKIP LOCKED, поэтому воркеры не
+    ждут друг друга), так что одну задачу не получат два воркера. Аренда истекает через
+    lease_seconds; пока задача в работе, фоновый heartbeat продлевает аренду. Задачи с
+    истёкшей арендой (воркер упал) возвращаются в очередь при следующем claim. Каждый
+    claim — попытка; после max_attempts неудачных попыток задача становится DEAD.
+
+    complete/fail/heartbeat действуют только на задачи, арендованные этим воркером:
+    воркер, потерявший аренду, не перезапишет результат того, кто задачу перехватил.
+    """
+
+    def __init__(
+        self,
+        db_manager: DatabaseManager,
+        worker_id: str | None = None,
+        lease_seconds: float = DEFAULT_LEASE_SECONDS,
+    ):
+        self.db_manager = db_manager
+        self.worker_id = worker_id or default_worker_id()
+        self.lease_seconds = lease_seconds
+        # Задачи, аренду которых продлевает heartbeat
+        self._held: set[int] = set()
+        self._held_lock = threading.Lock()
+        self._heartbeat_stop = threading.Event()
+        self._heartbeat: threading.Thread | None = None
+
+    # ----------------------------
+    # Постановка в очередь
+    # ----------------------------
+    def enqueue(self, kind: JobKind, video_ids: list[int], scope: str = "", max_attempts: int = 3) -> int:
+        """Ставит задачи kind для видео; уже существующие задачи (kind, video) не трогает. Возвращает число новых"""
+        dialect = self.db_manager.engine.dialect.name
+        now = datetime.now()
+        added = 0
+        with self.db_manager.session_scope() as session:
+            if dialect not in ("sqlite", "postgresql"):
+                existing = set(session.execute(select(Job.video_id).where(Job.kind == kind)).scalars())
+                video_ids = [video_id for video_id in video_ids if video_id not in existing]
+            for start in range(0, len(video_ids), ENQUEUE_CHUNK_SIZE):
+                rows = [
+                    {
+                        "kind": kind,
+                        "video_id": video_id,
+                        "scope": scope,
+                        "status": JobStatus.PENDING,
+                        "attempts": 0,
+                        "max_attempts": max_attempts,
+                        "available_at": now,
+                        "created_at": now,
+                        "updated_at": now,
+                    }
+                    for video_id in video_ids[start : start + ENQUEUE_CHUNK_SIZE]
+                ]
+                # Через Core-соединение сессии: ORM-результат пакетной вставки не отдаёт rowcount
+                connection = session.connection()
+                if dialect == "sqlite":
+                    result = connection.execute(sqlite_insert(Job).on_conflict_do_nothing(), rows)
+                elif dialect == "postgresql":
+                    result = connection.execute(postgresql_insert(Job).on_conflict_do_nothing(), rows)
+                else:
+                    result = connection.execute(Job.__table__.insert(), rows)
+                added += max(result.rowcount, 0)
+        return added
+
+    # ----------------------------
+    # Аренда
+    # ----------------------------
+    def _reclaim_expired(self, session, now: datetime) -> None:
+        """Возвращает в очередь задачи, аренда которых истекла; последняя попытка уходит в DEAD"""
+        expired = and_(Job.status == JobStatus.LEASED, Job.lease_expires_at < now)
+        released = {"lease_owner": None, "lease_expires_at": None, "last_error": "lease expired", "updated_at": now}
+        session.execute(
+            update(Job).where(expired, Job.attempts >= Job.max_attempts).values(status=JobStatus.DEAD, **released)
+        )
+        session.execute(update(Job).where(expired).values(status=JobStatus.PENDING, available_at=now, **released))
+
+    def claim(self, kind: JobKind, limit: int = 1, scope: str = "") -> list[dict]:
+        """
+        Берёт в аренду до limit готовых задач kind (в порядке available_at).
+
+        Словари с ключами id, video_id, attempts, title, url.
+        """
+        now = datetime.now()
+        values = {
+            "status": JobStatus.LEASED,
+            "lease_owner": self.worker_id,
+            "lease_expires_at": now + timedelta(seconds=self.lease_seconds),
+            "heartbeat_at": now,
+            "attempts": Job.attempts + 1,
+            "updated_at": now,
+        }
+        candidates = (
+            select(Job.id)
+            .where(Job.kind == kind, Job.scope == scope, Job.status == JobStatus.PENDING, Job.available_at <= now)
+            .order_by(Job.available_at, Job.id)
+            .limit(limit)
+        )
+        dialect = self.db_manager.engine.dialect.name
+
+        with self.db_manager.session_scope() as session:
+            self._reclaim_expired(session, now)
+            if dialect in ("sqlite", "postgresql"):
+                if dialect == "postgresql":
+                    candidates = candidates.with_for_update(skip_locked=True)
+                job_ids = list(
+                    session.execute(
+                        update(Job)
+                        .where(Job.id.in_(candidates.scalar_subquery()))
+                        .values(**values)
+                        .returning(Job.id)
+                        .execution_options(synchronize_session=False)
+                    ).scalars()
+                )
+            else:
+                job_ids = list(session.execute(candidates.with_for_update(skip_locked=True)).scalars())
+                session.execute(
+                    update(Job).where(Job.id.in_(job_ids)).values(**values).execution_options(synchronize_session=False)
+                )
+            if not job_ids:
+                return []
+            rows = session.execute(
+                select(Job.id, Job.video_id, Job.attempts, Video.title, Video.url)
+                .join(Video, Video.id == Job.video_id)
+                .where(Job.id.in_(job_ids))
+                .order_by(Job.available_at, Job.id)
+            )
+            jobs = [dict(row._mapping) for row in rows]
+
+        with self._held_lock:
+            self._held.update(job_ids)
+        return jobs
+
+    def _owned(self, job_ids) -> tuple:
+        return (Job.id.in_(job_ids), Job.status == JobStatus.LEASED, Job.lease_owner == self.worker_id)
+
+    def heartbeat(self, job_ids: list[int] | None = None) -> set[int]:
+        """Продлевает аренду задач (по умолчанию всех удерживаемых), возвращает те, что ещё за этим воркером"""
+        if job_ids is None:
+            with self._held_lock:
+                job_ids = list(self._held)
+        if not job_ids:
+            return set()
+        now = datetime.now()
+        with self.db_manager.session_scope() as session:
+            session.execute(
+                update(Job)
+                .where(*self._owned(job_ids))
+                .values(lease_expires_at=now + timedelta(seconds=self.lease_seconds), heartbeat_at=now)
+                .execution_options(synchronize_session=False)
+            )
+            owned = set(session.execute(select(Job.id).where(*self._owned(job_ids))).scalars())
+        lost = set(job_ids) - owned
+        if lost:
+            logger.warning(f"[job_queue] Аренда потеряна для задач {sorted(lost)}")
+            with self._held_lock:
+                self._held -= lost
+        return owned
+
+    def _finish(self, job_id: int, values: dict) -> bool:
+        with self._held_lock:
+            self._held.discard(job_id)
+        with self.db_manager.session_scope() as session:
+            result = session.execute(
+                update(Job)
+                .where(*self._owned([job_id]))
+                .values(lease_owner=None, lease_expires_at=None, updated_at=datetime.now(), **values)
+                .execution_options(synchronize_session=False)
+            )
+        if result.rowcount == 0:
+            logger.warning(f"[job_queue] Задача {job_id} уже не арендована этим воркером, результат не записан")
+        return result.rowcount > 0
+
+    def complete(self, job_id: int) -> bool:
+        """Помечает задачу выполненной. False, если аренда была потеряна"""
+        return self._finish(job_id, {"status": JobStatus.DONE, "last_error": None})
+
+    def fail(self, job_id: int, error: str, backoff: float = RETRY_BACKOFF) -> bool:
+        """
+        Фиксирует неудачную попытку: задача вернётся в очередь через backoff * 2**(attempts - 1)
+        секунд или станет DEAD, если попытки исчерпаны. Возвращает True, если задачу ещё повторят.
+        """
+        with self.db_manager.session_scope() as session:
+            attempts, max_attempts = session.execute(
+                select(Job.attempts, Job.max_attempts).where(Job.id == job_id)
+            ).one()
+        retryable = attempts < max_attempts
+        if retryable:
+            values = {
+                "status": JobStatus.PENDING,
+                "available_at": datetime.now() + timedelta(seconds=backoff * 2 ** (attempts - 1)),
+            }
+        else:
+            values = {"status": JobStatus.DEAD}
+        self._finish(job_id, {**values, "last_error": error[:2000]})
+        return retryable
+
+    def release(self, job_ids: list[int]) -> None:
+        """Возвращает взятые, но не начатые задачи в очередь без траты попытки"""
+        if not job_ids:
+            return
+        with self._held_lock:
+            self._held -= set(job_ids)
+        with self.db_manager.session_scope() as session:
+            session.execute(
+                update(Job)
+                .where(*self._owned(job_ids))
+                .values(
+                    status=JobStatus.PENDING,
+                    attempts=Job.attempts - 1,
+                    lease_owner=None,
+                    lease_expires_at=None,
+                    updated_at=datetime.now(),
+                )
+                .execution_options(synchronize_session=False)
+            )
+
+    # ----------------------------
+    # Heartbeat
+    # ----------------------------
+    def start_heartbeat(self, interval: float | None = None) -> None:
+        """Запускает фоновый поток, продлевающий аренду удерживаемых задач (по умолчанию каждую треть аренды)"""
+        if self._heartbeat is not None:
+            return
+        interval = interval or self.lease_seconds / 3
+        self._heartbeat_stop.clear()
+
+        def beat() -> None:
+            while not self._heartbeat_stop.wait(interval):
+                try:
+                    self.heartbeat()
+                except Exception as e:
+                    logger.error(f"[job_queue] Ошибка heartbeat: {e}")
+
+        self._heartbeat = threading.Thread(target=beat, name="job-queue-heartbeat", daemon=True)
+        self._heartbeat.start()
+
+    def close(self) -> None:
+        """Останавливает heartbeat и возвращает в очередь всё, что осталось удерживаемым"""
+        self._heartbeat_stop.set()
+        if self._heartbeat is not None:
+            self._heartbeat.join(timeout=5)
+        self._heartbeat = None
+        with self._held_lock:
+            held = list(self._held)
+        self.release(held)
+
+    # ----------------------------
+    # Обслуживание
+    # ----------------------------
+    def counts(self) -> dict[tuple[str, str], int]:
+        """Количество задач по (этап, состояние)"""
+        with self.db_manager.session_scope() as session:
+            rows = session.execute(select(Job.kind, Job.status, func.count()).group_by(Job.kind, Job.status))
+            return {(kind.value, status.value): count for kind, status, count in rows}
+
+    def requeue_dead(self, kind: JobKind) -> int:
+        """Возвращает DEAD-задачи этапа в очередь с чистым счётчиком попыток"""
+        with self.db_manager.session_scope() as session:
+            result = session.execute(
+                update(Job)
+                .where(Job.kind == kind, Job.status == JobStatus.DEAD)
+                .values(status=JobStatus.PENDING, attempts=0, available_at=datetime.now(), updated_at=datetime.now())
+                .execution_options(synchronize_session=False)
+            )
+            return result.rowcount
+
+
+# ----------------------------
+# Какие видео нуждаются в задачах этапа
+# ----------------------------
+def pending_video_ids(db_manager: DatabaseManager, kind: JobKind) -> dict[str, list[int]]:
+    """Видео, для которых этап kind ещё не выполнен, сгруппированные по scope задачи"""
+    with db_manager.session_scope() as session:
+        if kind == JobKind.NOTEBOOKLM:
+            # Источники, загруженные в ноутбук: scope — ноутбук, в котором их нужно суммаризировать
+            summarised = {
+                normalize_title(title)
+                for title in session.execute(select(Video.title).where(Video.summary_hash.isnot(None))).scalars()
+            }
+            rows = session.execute(
+                select(Video.id, Video.title, Video.notebooklm_document_id).where(
+                    Video.notebooklm_document_id.isnot(None), Video.summary_hash.is_(None)
+                )
+            )
+            by_scope: dict[str, list[int]] = {}
+            for video_id, title, notebook_id in rows:
+                if normalize_title(title) not in summarised:
+                    by_scope.setdefault(notebook_id, []).append(video_id)
+            return by_scope
+        stmt = select(Video.id).where(Video.summary_hash.isnot(None))
+        if kind == JobKind.ZOTERO:
+            stmt = stmt.where(Video.status.notin_([ProcessingStatus.SENT_TO_ZOTERO, ProcessingStatus.COMPLETED]))
+        return {"": list(session.execute(stmt.order_by(Video.id)).scalars())}
+
+
+@click.group()
+def cli() -> None:
+    """Shared job queue for the NotebookLM, Zotero and PDF stages."""
+
+
+@cli.command("enqueue")
+@click.argument("kind", type=click.Choice([kind.value for kind in JobKind]))
+@click.option("--max_attempts", default=3, help="Attempts before a job is dead-lettered")
+def enqueue_command(kind: str, max_attempts: int) -> None:
+    """Create jobs for every video that still needs the KIND stage."""
+    db_manager = DatabaseManager()
+    db_manager.create_tables()
+    queue = JobQueue(db_manager)
+    job_kind = JobKind(kind)
+    for scope, video_ids in pending_video_ids(db_manager, job_kind).items():
+        added = queue.enqueue(job_kind, video_ids, scope=scope, max_attempts=max_attempts)
+        click.echo(f"{kind} {scope or '-'}: {added} new jobs ({len(video_ids)} videos pending)")
+
+
+@cli.command("stats")
+def stats_command() -> None:
+    """Show job counts per stage and status."""
+    db_manager = DatabaseManager()
+    db_manager.create_tables()
+    for (kind, status), count in sorted(JobQueue(db_manager).counts().items()):
+        click.echo(f"{kind:<11} {status:<8} {count}")
+
+
+@cli.command("requeue")
+@click.argument("kind", type=click.Choice([kind.value for kind in JobKind]))
+def requeue_command(kind: str) -> None:
+    """Put dead-lettered KIND jobs back into the queue."""
+    db_manager = DatabaseManager()
+    db_manager.create_tables()
+    click.echo(f"Requeued: {JobQueue(db_manager).requeue_dead(JobKind(kind))}")
+
+
+if __name__ == "__main__":
+    cli()
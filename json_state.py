@@ -0,0 +1,43 @@
+import fcntl
+import json
+import os
+from contextlib import contextmanager
+from pathlib import Path
+
+from loguru import logger
+
+
+def read_json_state(path: Path) -> dict:
+    """Читает JSON-файл состояния; отсутствующий или повреждённый файл — пустое состояние"""
+    if not path.exists():
+        return {}
+    try:
+        return json.loads(path.read_text(encoding="utf-8"))
+    except (OSError, ValueError) as e:
+        logger.warning(f"Не удалось прочитать {path}: {e}")
+        return {}
+
+
+def write_json_state(path: Path, state: dict) -> None:
+    """Записывает состояние атомарно: во временный файл рядом и os.replace поверх старого"""
+    tmp_path = path.with_name(f".{path.name}.{os.getpid()}.tmp")
+    tmp_path.write_text(json.dumps(state), encoding="utf-8")
+    os.replace(tmp_path, path)
+
+
+@contextmanager
+def locked_json_state(path: Path):
+    """
+    Чтение-изменение-запись JSON-файла состояния, общего для нескольких процессов и потоков.
+
+    Отдаёт состояние как dict под эксклюзивной блокировкой flock на файле {path}.lock;
+    изменённый dict записывается атомарно при выходе из блока без исключения.
+    """
+    with open(path.with_name(path.name + ".lock"), "a") as lock_file:
+        fcntl.flock(lock_file, fcntl.LOCK_EX)
+        try:
+            state = read_json_state(path)
+            yield state
+            write_json_state(path, state)
+        finally:
+            fcntl.flock(lock_file, fcntl.LOCK_UN)
@@ -1,18 +1,40 @@
+import os
 import random
 import sys
 import time
+import zlib
+from collections import deque
+from collections.abc import Iterable, Iterator
+from datetime import datetime
+from itertools import islice
 from pathlib import Path as p
 
 import click
-from adspower_api_utils import click_random, close_browser, start_browser
+from adspower_api_utils import click_random, close_browser
+from browser_pool import BROWSER_IDLE_TTL, BrowserPool
+from cdp_profiler import cdp_profiler
 from constants import PROMPT
-from database import DatabaseManager
+from database import DatabaseManager, prompt_hash
+from job_queue import JobQueue
 from loguru import logger
-from models import ProcessingStatus
+from metrics import REPORTS_DIR, run_metrics
+from models import JobKind, ProcessingStatus, SourceState
+from notebooklm_page import (
+    count_answers,
+    extract_last_answer,
+    iter_sources,
+    save_scroll_checkpoint,
+    select_sources,
+    wait_for_answer,
+)
 from patchright.sync_api import Locator, Page, expect, sync_playwright
+from prompts import batch_prompt_template, build_batch_prompt, split_batch_answer
 
 
 T = 5
+# Переопределяется переменной окружения, например для бенчмарков на локальной заглушке
+NOTEBOOKLM_URL = os.getenv("NOTEBOOKLM_URL", "https://notebooklm.google.com")
+NOTEBOOK_ID = "/notebook/d71669e3-88d4-41fd-8a4b-98806b35d29f"
 
 # Configure loguru logger for better output formatting
 logger.remove()  # Remove default handler
@@ -83,6 +105,32 @@ def read_clipboard_content(page: Page) -> str:
         return ""
 
 
+def copy_answer_via_clipboard(page: Page) -> str | None:
+    """
+    Копирует последний ответ кнопкой копирования и читает его из буфера обмена.
+
+    Запасной путь для extract_last_answer: требует разрешения clipboard-read и фокуса на вкладке.
+    :return: текст ответа или None, если кнопка копирования не найдена в видимой области
+    """
+    page.context.grant_permissions(["clipboard-read"])
+
+    element = page.locator("div.chat-panel-content")
+    element.evaluate("element => element.scrollTop = element.scrollHeight")
+
+    copy_button_list = page.locator("button.xap-copy-to-clipboard").all()
+
+    for element in copy_button_list:
+        is_in_view = element.evaluate(CHECK_VIEPORT_ELEMENT_JS)
+        if is_in_view:
+            copy_button = element
+            break
+    else:
+        return None
+
+    click_random(copy_button)
+    return read_clipboard_content(page)
+
+
 def create_source_list(source_type: str) -> list:
     """
     Create a list of URLs from a CSV file containing source links.
@@ -127,120 +175,428 @@ def create_source_list(source_type: str) -> list:
     return urls
 
 
-@click.command()
-@click.option(
-    "--profile_number",
-    default="1",
-    help="Profile number for the browser instance",
-)
-def main(profile_number: str) -> None:
+def send_prompt(page: Page, prompt: str) -> int:
+    """Вводит промпт и отправляет его, возвращает число ответов в чате до отправки"""
+    page.locator("textarea.cdk-textarea-autosize").fill(prompt)
+
+    previous_answers = count_answers(page)
+    send_prompt_button = page.locator("query-box > div > div > form > div > button")
+    expect(send_prompt_button).to_be_enabled()
+    click_random(send_prompt_button)
+    return previous_answers
+
+
+def read_answer(page: Page, extraction: str) -> str | None:
+    """Достаёт последний ответ из DOM (extraction='dom') с fallback на буфер обмена"""
+    summary_text = extract_last_answer(page) if extraction == "dom" else ""
+    if not summary_text:
+        if extraction == "dom":
+            logger.warning("Не удалось достать ответ из DOM, пробую через буфер обмена")
+        summary_text = copy_answer_via_clipboard(page)
+    return summary_text
+
+
+def summarise_in_batches(
+    page: Page,
+    db_manager: DatabaseManager,
+    notebook_id: str,
+    titles: Iterable[str],
+    batch_size: int,
+    answer_timeout: float,
+    extraction: str,
+    answer_latencies: dict[str, float],
+) -> list[str]:
     """
-    Automate adding multiple sources to Google NotebookLM.
+    Обрабатывает источники пачками по batch_size: включает их все разом, отправляет
+    промпт с просьбой о секции на каждый источник и делит ответ обратно по заголовкам.
 
-    This script reads URLs from a CSV file and automatically adds them
-    as sources to a new NotebookLM notebook using browser automation.
+    titles может быть потоком (см. iter_pending_titles): пачка собирается, как только
+    набралось batch_size заголовков.
+    Возвращает заголовки, для которых не нашлось валидной секции: их нужно обработать по одному.
+    """
+    requeued: list[str] = []
+    # Ответы на пачки кэшируются под редакцией батч-промпта, а не PROMPT (см. use_prompt в summarise_sources)
+    batch_prompt_digest = prompt_hash(batch_prompt_template())
+    title_stream = iter(titles)
+    processed = 0
+    while batch := list(islice(title_stream, batch_size)):
+        batch_label = f"[{processed + 1}-{processed + len(batch)}]"
+        processed += len(batch)
+
+        with run_metrics.stage("selection", batch_label):
+            selected = select_sources(page, batch)
+        requeued.extend(title for title in batch if title not in selected)
+        if not selected:
+            logger.error(f"Не удалось включить ни один источник пачки {batch_label}")
+            continue
+
+        logger.info(f"Batch {batch_label} of {len(selected)} sources summarising...")
+        with run_metrics.stage("prompt", batch_label):
+            previous_answers = send_prompt(page, build_batch_prompt(selected))
+
+        with run_metrics.stage("answer_wait", batch_label):
+            answer_latency = wait_for_answer(page, previous_answers, timeout=answer_timeout * len(selected))
+        answer_text = None
+        if answer_latency is not None:
+            with run_metrics.stage("extraction", batch_label):
+                answer_text = read_answer(page, extraction)
+        if not answer_text:
+            logger.error(f"Ответ на пачку не получен, источники будут обработаны по одному: {selected}")
+            requeued.extend(selected)
+            continue
+
+        summaries, missing = split_batch_answer(answer_text, selected)
+        for title, summary_text in summaries.items():
+            answer_latencies[title] = round(answer_latency / len(selected), 2)
+            db_manager.journal_advance(
+                notebook_id, title, SourceState.EXTRACTED, summary=summary_text, prompt_digest=batch_prompt_digest
+            )
+            store_summary(db_manager, title, summary_text, batch_prompt_digest)
+        run_metrics.source_done(len(summaries))
+        if missing:
+            logger.warning(f"В ответе на пачку нет секций для {len(missing)} источников, верну их в очередь: {missing}")
+            requeued.extend(missing)
+        logger.success(f"Batch {batch_label}: {len(summaries)} summaries sent to database.")
+
+    # Перед поштучной обработкой выключаю всё, что осталось включённым
+    select_sources(page, [])
+    return requeued
+
+
+def iter_pending_titles(
+    page: Page,
+    db_manager: DatabaseManager,
+    notebook_id: str,
+    worker_index: int,
+    worker_count: int,
+    checkpoint_lag: int = 1,
+) -> Iterator[str]:
+    """
+    Потоком отдаёт заголовки источников, которые должен обработать этот воркер:
+    источник из его шарда, ещё без summary в БД и с активным чекбоксом.
 
-    Args:
-        source_type (str): Type of sources to add ('website' or 'youtube')
-        notebook_name (str): Name for the new notebook
+    У каждого воркера свой чекпоинт обхода (ноутбук + номер воркера). Позиция сохраняется,
+    только когда потребитель закончил с отданными до неё заголовками: заголовок считается
+    обработанным, когда запрошено ещё checkpoint_lag заголовков (1 — обработка по одному,
+    batch_size — пачками). После падения обход продолжится не дальше первого необработанного.
     """
-    logger.info("Starting NotebookLM automation script...")
+    checkpoint_key = f"{notebook_id}#worker-{worker_index}-of-{worker_count}"
+    # Позиции прокрутки отданных заголовков, которые потребитель, возможно, ещё обрабатывает
+    positions: deque[float] = deque()
+    saved_position = None
+    for source in iter_sources(page, checkpoint_key=checkpoint_key):
+        title = source["title"]
+
+        if not source_belongs_to_worker(title, worker_index, worker_count):
+            continue
+
+        if db_manager.video_exists_by_title(title):
+            logger.warning(f"Source [{source['index'] + 1}] ({title}) already exists in the database. Skipping.")
+            continue
+
+        if not (source["visible"] and source["enabled"]):
+            logger.error(f"Не активна кнопка включить источник, пропускаю ({title})")
+            continue
+
+        journal_entry = db_manager.journal_entry(notebook_id, title)
+        if journal_entry["state"] == SourceState.FAILED:
+            logger.warning(f"Source ({title}) failed {journal_entry['attempts']} times before. Skipping.")
+            continue
+        if journal_entry["state"] == SourceState.EXTRACTED and journal_entry["summary"]:
+            # Ответ уже был получен прошлым запуском, но не успел записаться в videos
+            logger.info(f"Source ({title}) restored from journal.")
+            store_summary(db_manager, title, journal_entry["summary"], prompt_digest=journal_entry["prompt_digest"])
+            continue
+
+        positions.append(source["scrollTop"])
+        yield title
+        # Запрошен следующий заголовок: обработаны все, кроме последних checkpoint_lag - 1
+        while len(positions) >= checkpoint_lag:
+            done_position = positions.popleft()
+        position = positions[0] if positions else done_position
+        if position != saved_position:
+            save_scroll_checkpoint(checkpoint_key, position)
+            saved_position = position
+
+
+def store_summary(db_manager: DatabaseManager, title: str, summary_text: str, prompt_digest: str | None = None) -> None:
+    db_manager.insert_video(
+        title=title,
+        url=None,
+        youtube_id=None,
+        status=ProcessingStatus.SENT_TO_NOTEBOOKLM,
+        summary=summary_text,
+        prompt_digest=prompt_digest,
+    )
+
+
+def process_source(
+    page: Page, db_manager: DatabaseManager, notebook_id: str, title: str, answer_timeout: float, extraction: str
+) -> float:
+    """
+    Проводит один источник через этапы журнала SELECTED → PROMPTED → ANSWERED → EXTRACTED.
 
-    start_time = time.time()
+    STORED выставляется обработчиком записи, когда summary реально закоммичен в videos.
+    При ошибке на любом этапе бросает исключение. Возвращает время ожидания ответа (сек).
+    """
+    # Оставляю включённым только текущий источник одним evaluate
+    with run_metrics.stage("selection", title):
+        if title not in select_sources(page, [title]):
+            raise RuntimeError("Не активна кнопка включить источник")
+    db_manager.journal_advance(notebook_id, title, SourceState.SELECTED)
+
+    with run_metrics.stage("prompt", title):
+        previous_answers = send_prompt(page, PROMPT)
+    db_manager.journal_advance(notebook_id, title, SourceState.PROMPTED)
+
+    # Жду, пока ответ дорисуется и чат-панель перестанет меняться
+    with run_metrics.stage("answer_wait", title):
+        answer_latency = wait_for_answer(page, previous_answers, timeout=answer_timeout)
+        if answer_latency is None:
+            raise TimeoutError(f"Ответ не получен за {answer_timeout} сек.")
+    db_manager.journal_advance(notebook_id, title, SourceState.ANSWERED)
+    logger.info(f"Answer for ({title}) ready in {answer_latency} seconds.")
+
+    with run_metrics.stage("extraction", title):
+        summary_text = read_answer(page, extraction)
+        if not summary_text:
+            raise RuntimeError("Не удалось получить текст ответа")
+    db_manager.journal_advance(notebook_id, title, SourceState.EXTRACTED, summary=summary_text)
+    logger.info(f"Summary text: {summary_text[:100]}...")
+
+    store_summary(db_manager, title, summary_text)
+    return answer_latency
+
+
+def try_source(
+    page: Page,
+    db_manager: DatabaseManager,
+    notebook_id: str,
+    title: str,
+    answer_timeout: float,
+    extraction: str,
+    answer_latencies: dict[str, float],
+    max_attempts: int,
+) -> bool:
+    """
+    Обрабатывает источник и записывает неудачу в журнал вместо того, чтобы прерывать запуск.
 
+    Возвращает False, если источник нужно повторить позже (см. journal_fail).
+    """
     try:
-        db_manager = DatabaseManager()
-        puppeteer_ws = start_browser(profile_number)
-        if not puppeteer_ws:
-            print(f"Failed to launch browser for profile {profile_number}.")
-            return
+        answer_latencies[title] = process_source(page, db_manager, notebook_id, title, answer_timeout, extraction)
+        run_metrics.source_done()
+        logger.success(f"Source ({title}) sent to database.")
+        return True
+    except Exception as e:
+        retryable = db_manager.journal_fail(notebook_id, title, str(e), max_attempts=max_attempts)
+        if retryable:
+            logger.error(f"Ошибка при обработке ({title}): {e}. Повторю позже.")
+        else:
+            logger.error(f"Ошибка при обработке ({title}): {e}. Попытки исчерпаны.")
+        return not retryable
 
-        with sync_playwright() as playwright:
-            browser = playwright.chromium.connect_over_cdp(puppeteer_ws, slow_mo=random.randint(2000, 3000))
-            context = browser.contexts[0] if browser.contexts else browser.new_context()
-
-            context.add_init_script("""
-                Object.defineProperty(window, 'navigator', {
-                    value: new Proxy(navigator, {
-                        has: (target, key) => key === 'webdriver' ? false : key in target,
-                        get: (target, key) =>
-                            key === 'webdriver' ? undefined : typeof target[key] === 'function' ? target[key].bind(target) : target[key]
-                    })
-                });
-            """)
-
-            page = context.new_page()
-            page.context.grant_permissions(["clipboard-read"])
-            base_url = "https://notebooklm.google.com"
-            notebook_id = "/notebook/d71669e3-88d4-41fd-8a4b-98806b35d29f"
-            page.goto(base_url + notebook_id)
-
-            checkbox_id = "mat-mdc-checkbox-0-input"
-            select_all_selector = f'input[type="checkbox"][id="{checkbox_id}"]'
-            click_random(page.locator(select_all_selector))
-            video_source_list = page.locator("div.single-source-container").all()
-
-            for url_index, current_url in enumerate(video_source_list):
-                title = current_url.locator('div[aria-label="Название источника"]').inner_text()
-
-                if db_manager.video_exists_by_title(title):
-                    logger.warning(
-                        f"Source [{url_index + 1}/{len(video_source_list)}] ({title}) already exists in the database. Skipping."
-                    )
-                    continue
 
-                source_type_button = current_url.locator("input")
-                if source_type_button.is_visible():
-                    click_random(page.locator(select_all_selector))
-                    click_random(page.locator(select_all_selector))
-                    click_random(source_type_button)
+def summarise_from_queue(
+    page: Page,
+    db_manager: DatabaseManager,
+    queue: JobQueue,
+    notebook_id: str,
+    answer_timeout: float,
+    extraction: str,
+    answer_latencies: dict[str, float],
+    claim_size: int,
+) -> None:
+    """
+    Берёт задачи NOTEBOOKLM этого ноутбука из общей очереди вместо обхода панели источников.
+
+    Повторы и dead-lettering ведёт очередь (JobQueue.fail), поэтому источник пробуется один
+    раз за аренду, а следующую попытку может сделать любой воркер с этим ноутбуком.
+    Задача выполнена, только когда summary реально закоммичен (обработчик записи, как у
+    mark_stored): до сброса отложенной записи она остаётся в аренде под heartbeat'ом.
+    """
+    # Заголовок -> задача, summary которой ждёт записи в БД
+    awaiting_flush: dict[str, int] = {}
+
+    def complete_stored(rows: list[dict]) -> None:
+        for row in rows:
+            job_id = awaiting_flush.pop(row["title"], None)
+            if job_id is not None:
+                queue.complete(job_id)
+
+    db_manager.add_flush_listener(complete_stored)
+
+    while jobs := queue.claim(JobKind.NOTEBOOKLM, limit=claim_size, scope=notebook_id):
+        for job in jobs:
+            title = job["title"]
+            if db_manager.video_exists_by_title(title):
+                queue.complete(job["id"])
+                continue
+            db_manager.journal_entry(notebook_id, title)
+            logger.info(f"Job {job['id']} ({title}) summarising, attempt {job['attempts']}...")
+            # Без отложенной записи обработчик срабатывает прямо внутри process_source
+            awaiting_flush[title] = job["id"]
+            try:
+                answer_latencies[title] = process_source(
+                    page, db_manager, notebook_id, title, answer_timeout, extraction
+                )
+            except Exception as e:
+                awaiting_flush.pop(title, None)
+                if queue.fail(job["id"], str(e)):
+                    logger.error(f"Ошибка при обработке ({title}): {e}. Повторю позже.")
                 else:
-                    logger.error("Не активна кнопка включить источник, пропускаю")
-                    continue
+                    logger.error(f"Ошибка при обработке ({title}): {e}. Попытки исчерпаны.")
+                continue
+            run_metrics.source_done()
+            logger.success(f"Source ({title}) sent to database.")
 
-                logger.info(f"Source [{url_index + 1}/{len(video_source_list)}] ({title}) summarising...")
+    # Дописываю отложенные строки, чтобы их задачи завершились до освобождения аренды
+    db_manager.flush()
 
-                page.locator("textarea.cdk-textarea-autosize").fill(PROMPT)
 
-                send_prompt_button = page.locator("query-box > div > div > form > div > button")
-                expect(send_prompt_button).to_be_enabled()
-                click_random(send_prompt_button)
+def source_belongs_to_worker(title: str, worker_index: int, worker_count: int) -> bool:
+    """
+    Определяет, относится ли источник к шарду данного воркера.
 
-                # Жду пока кнопка отправки не станет активной чтобы быть уверенным что ответ готов
+    Используется стабильный crc32 от заголовка (а не hash(), который рандомизирован
+    между процессами), поэтому все воркеры независимо приходят к одному и тому же
+    разбиению и ни один заголовок не обрабатывается дважды.
+    """
+    if worker_count <= 1:
+        return True
+    return zlib.crc32(title.encode("utf-8")) % worker_count == worker_index
+
+
+def summarise_sources(
+    profile_number: str,
+    worker_index: int = 0,
+    worker_count: int = 1,
+    answer_timeout: float = 180.0,
+    extraction: str = "dom",
+    keep_browser: bool = False,
+    browser_ttl: float = BROWSER_IDLE_TTL,
+    batch_size: int = 1,
+    max_attempts: int = 3,
+    metrics_port: int = 0,
+    profile_cdp: bool = False,
+    notebook_id: str = NOTEBOOK_ID,
+    from_queue: bool = False,
+    claim_size: int = 5,
+) -> None:
+    """
+    Проходит по источникам ноутбука NotebookLM в профиле AdsPower и сохраняет summary в БД.
 
-                time.sleep(60)
-                loading_dots = page.locator("div.loading-dots")
-                expect(loading_dots).not_to_be_attached(timeout=60_000 * 2)
+    Args:
+        profile_number (str): Номер профиля AdsPower
+        worker_index (int): Номер воркера (шарда) среди worker_count
+        worker_count (int): Общее количество параллельных воркеров
+        answer_timeout (float): Максимальное время ожидания ответа на один источник (сек)
+        extraction (str): Способ получения ответа: 'dom' (с fallback на буфер обмена) или 'clipboard'
+        keep_browser (bool): Оставить браузер запущенным для следующего запуска (см. BrowserPool)
+        browser_ttl (float): Через сколько секунд простоя закрывать оставленный браузер
+        batch_size (int): Сколько источников отправлять в одном промпте (1 — по одному)
+        max_attempts (int): Сколько раз пробовать источник, прежде чем пометить его FAILED в журнале
+        metrics_port (int): Порт для Prometheus-эндпоинта /metrics (0 — не поднимать)
+        profile_cdp (bool): Считать обращения к браузеру по месту вызова и вывести горячие точки (см. cdp_profiler)
+        notebook_id (str): Путь ноутбука вида "/notebook/<uuid>" (см. notebook_shards)
+        from_queue (bool): Брать источники из задач NOTEBOOKLM общей очереди (см. job_queue), а не из панели
+        claim_size (int): Сколько задач брать из очереди за раз
+    """
+    logger.info(
+        f"Starting NotebookLM automation for profile {profile_number} (worker {worker_index + 1}/{worker_count})..."
+    )
 
-                element = page.locator("div.chat-panel-content")
-                element.evaluate("element => element.scrollTop = element.scrollHeight")
+    start_time = time.time()
+    answer_latencies: dict[str, float] = {}
+    db_manager = None
+    queue = None
 
-                copy_button_list = page.locator("button.xap-copy-to-clipboard").all()
+    run_metrics.reset()
+    if metrics_port:
+        run_metrics.serve_prometheus(metrics_port)
+    if profile_cdp:
+        cdp_profiler.reset()
+        cdp_profiler.enable()
 
-                for element in copy_button_list:
-                    is_in_view = element.evaluate(CHECK_VIEPORT_ELEMENT_JS)
-                    if is_in_view:
-                        copy_button = element
-                        break
-                else:
-                    logger.error(f"Не нашёл кнопку копирования в видимой области. Пропускаю ({title})")
-                    continue
-
-                click_random(copy_button)
-
-                text_from_buffer = read_clipboard_content(page)
-                if source_type_button.is_visible():
-                    click_random(source_type_button)  # Выключаю источник после копирования
-                logger.info(f"Text from clipboard: {text_from_buffer[:100]}...")
-
-                db_manager.insert_video(
-                    title=title,
-                    url=None,
-                    youtube_id=None,
-                    status=ProcessingStatus.SENT_TO_NOTEBOOKLM,
-                    summary=text_from_buffer,
+    try:
+        db_manager = DatabaseManager()
+        db_manager.create_tables()
+        # Повторно обрабатываются источники без summary от текущей редакции PROMPT (поштучно или пачкой)
+        db_manager.use_prompt(PROMPT, batch_prompt_template(PROMPT))
+        db_manager.load_summarised_titles()
+        db_manager.enable_write_behind()
+
+        def mark_stored(rows: list[dict]) -> None:
+            for row in rows:
+                db_manager.journal_advance(notebook_id, row["title"], SourceState.STORED)
+
+        db_manager.add_flush_listener(mark_stored)
+
+        with sync_playwright() as playwright:
+            pool = BrowserPool(playwright, idle_ttl=browser_ttl)
+            page = pool.acquire_page(
+                profile_number, NOTEBOOKLM_URL + notebook_id, ready_selector="div.single-source-container"
+            )
+            if page is None:
+                print(f"Failed to launch browser for profile {profile_number}.")
+                return
+
+            select_sources(page, [])  # выключаю все источники одним шагом
+
+            if from_queue:
+                queue = JobQueue(db_manager)
+                queue.start_heartbeat()
+                summarise_from_queue(
+                    page, db_manager, queue, notebook_id, answer_timeout, extraction, answer_latencies, claim_size
+                )
+
+            # Источники приходят потоком по мере прокрутки панели: обработка начинается сразу
+            pending_titles: Iterable[str] = (
+                []
+                if from_queue
+                else iter_pending_titles(page, db_manager, notebook_id, worker_index, worker_count, max(batch_size, 1))
+            )
+
+            if batch_size > 1:
+                # Источники без валидной секции в батч-ответе обрабатываются ниже по одному
+                pending_titles = summarise_in_batches(
+                    page,
+                    db_manager,
+                    notebook_id,
+                    pending_titles,
+                    batch_size,
+                    answer_timeout,
+                    extraction,
+                    answer_latencies,
                 )
-                logger.success(f"Source [{url_index + 1}/{len(video_source_list)}] ({title}) sent to database.")
+
+            # Ошибка на одном источнике не прерывает запуск: источник откладывается и повторяется с backoff
+            retry_titles: list[str] = []
+            for url_index, title in enumerate(pending_titles):
+                logger.info(f"Source [{url_index + 1}] ({title}) summarising...")
+                if not try_source(
+                    page, db_manager, notebook_id, title, answer_timeout, extraction, answer_latencies, max_attempts
+                ):
+                    retry_titles.append(title)
+
+            while retry_titles:
+                next_attempt_at = min(
+                    db_manager.journal_entry(notebook_id, title)["next_attempt_at"] for title in retry_titles
+                )
+                delay = (next_attempt_at - datetime.now()).total_seconds()
+                if delay > 0:
+                    logger.info(f"Retrying {len(retry_titles)} failed sources in {round(delay)} seconds...")
+                    time.sleep(delay)
+                retry_titles = [
+                    title
+                    for title in retry_titles
+                    if not try_source(
+                        page, db_manager, notebook_id, title, answer_timeout, extraction, answer_latencies, max_attempts
+                    )
+                ]
+
+            logger.info(f"Journal: {db_manager.journal_counts(notebook_id)}")
+
             # Calculate and display execution time
             end_time = time.time()
             total_seconds = round(end_time - start_time)
@@ -252,16 +608,143 @@ def main(profile_number: str) -> None:
             else:
                 logger.info(f"Time elapsed: {total_seconds} seconds.")
 
+            if answer_latencies:
+                latencies = sorted(answer_latencies.values())
+                logger.info(
+                    f"Answer latency over {len(latencies)} sources: "
+                    f"min {latencies[0]}s, median {latencies[len(latencies) // 2]}s, max {latencies[-1]}s."
+                )
+
             logger.success("Notebook title updated successfully!")
 
-            browser.close()
-            time.sleep(random.uniform(T * 0.85, T * 1.15))
+            pool.close_all(stop_browsers=not keep_browser)
+            if not keep_browser:
+                time.sleep(random.uniform(T * 0.85, T * 1.15))
 
     except Exception as e:
         print(f"error for profile {profile_number}: {e}")
 
     finally:
-        close_browser(profile_number)
+        # Сначала запись: обработчик записи завершает задачи очереди, которые ещё в аренде
+        if db_manager is not None:
+            db_manager.close()
+        if queue is not None:
+            queue.close()
+        if not keep_browser:
+            close_browser(profile_number)
+
+        report_prefix = REPORTS_DIR / f"run_{profile_number}_{datetime.now():%Y%m%d_%H%M%S}"
+        run_metrics.log_summary()
+        run_metrics.write_report(report_prefix)
+        if profile_cdp:
+            cdp_profiler.disable()
+            cdp_profiler.log_report(sources=run_metrics.sources_done)
+            report_prefix.with_suffix(".cdp.txt").write_text(
+                cdp_profiler.report(limit=200, sources=run_metrics.sources_done), encoding="utf-8"
+            )
+
+
+@click.command()
+@click.option(
+    "--profile_number",
+    default="1",
+    help="Profile number for the browser instance",
+)
+@click.option(
+    "--answer_timeout",
+    default=180.0,
+    help="Max seconds to wait for NotebookLM to finish one answer",
+)
+@click.option(
+    "--extraction",
+    type=click.Choice(["dom", "clipboard"]),
+    default="dom",
+    help="How to read the answer: straight from the DOM or via the copy button and clipboard",
+)
+@click.option(
+    "--keep_browser",
+    is_flag=True,
+    help="Leave the AdsPower browser running so the next run reuses it",
+)
+@click.option(
+    "--browser_ttl",
+    default=BROWSER_IDLE_TTL,
+    help="Seconds a kept browser may stay idle before it is closed",
+)
+@click.option(
+    "--batch_size",
+    default=1,
+    help="Sources per prompt; answers are split back per source and failures retried singly",
+)
+@click.option(
+    "--max_attempts",
+    default=3,
+    help="Attempts per source before it is marked failed in the run journal",
+)
+@click.option(
+    "--metrics_port",
+    default=0,
+    help="Serve per-stage latency histograms for Prometheus on this port (0 disables)",
+)
+@click.option(
+    "--profile_cdp",
+    is_flag=True,
+    help="Count browser round-trips and sleeps per call site and print a hot-spot table at the end",
+)
+@click.option(
+    "--notebook_id",
+    default=NOTEBOOK_ID,
+    help='Notebook to summarise, "/notebook/<uuid>"',
+)
+@click.option(
+    "--from_queue",
+    is_flag=True,
+    help="Take this notebook's sources from notebooklm jobs in the shared job queue instead of the source panel",
+)
+@click.option(
+    "--claim_size",
+    default=5,
+    help="Jobs taken from the queue at a time with --from_queue",
+)
+def main(
+    profile_number: str,
+    answer_timeout: float,
+    extraction: str,
+    keep_browser: bool,
+    browser_ttl: float,
+    batch_size: int,
+    max_attempts: int,
+    metrics_port: int,
+    profile_cdp: bool,
+    notebook_id: str,
+    from_queue: bool,
+    claim_size: int,
+) -> None:
+    """
+    Automate adding multiple sources to Google NotebookLM.
+
+    This script reads URLs from a CSV file and automatically adds them
+    as sources to a new NotebookLM notebook using browser automation.
+
+    Args:
+        source_type (str): Type of sources to add ('website' or 'youtube')
+        notebook_name (str): Name for the new notebook
+    """
+    logger.info("Starting NotebookLM automation script...")
+    summarise_sources(
+        profile_number,
+        answer_timeout=answer_timeout,
+        extraction=extraction,
+        keep_browser=keep_browser,
+        browser_ttl=browser_ttl,
+        batch_size=batch_size,
+        max_attempts=max_attempts,
+        metrics_port=metrics_port,
+        profile_cdp=profile_cdp,
+        notebook_id=notebook_id,
+        from_queue=from_queue,
+        claim_size=claim_size,
+    )
 
 
 if __name__ == "__main__":
@@ -3,7 +3,8 @@ import os
 import random
 import time
 
-from adspower_api_utils import close_browser, start_browser
+from adspower_api_utils import close_browser
+from browser_pool import BrowserPool
 from loguru import logger
 from patchright.sync_api import Locator, sync_playwright
 
@@ -12,6 +13,8 @@ from patchright.sync_api import Locator, sync_playwright
 DISPOSABLE = False  # use disposable profiles
 disp_N = 10  # number of disposable profiles
 T = 15  # seconds delay
+KEEP_BROWSERS = False  # leave browsers running for the next run (see BrowserPool)
+CHAT_URL = "https://chat.deepseek.com/a/chat/s/ec2724d8-0cc5-40c0-ad5a-0325f3675ecc"
 ###########################################################################################
 
 
@@ -41,28 +44,13 @@ def click_random(locator: Locator, manual_radius: float | None = None) -> None:
 
 def activity(profile_number: str) -> None:
     try:
-        puppeteer_ws = start_browser(profile_number)
-        if not puppeteer_ws:
-            print(f"Failed to launch browser for profile {profile_number}.")
-            return
-
         with sync_playwright() as playwright:
-            browser = playwright.chromium.connect_over_cdp(puppeteer_ws, slow_mo=random.randint(2000, 3000))
-            context = browser.contexts[0] if browser.contexts else browser.new_context()
-
-            context.add_init_script("""
-                            Object.defineProperty(window, 'navigator', {
-                                value: new Proxy(navigator, {
-                                    has: (target, key) => key === 'webdriver' ? false : key in target,
-                                    get: (target, key) =>
-                                        key === 'webdriver' ? undefined : typeof target[key] === 'function' ? target[key].bind(target) : target[key]
-                                })
-                            });
-                        """)
-
-            page = context.new_page()
+            pool = BrowserPool(playwright)
             ###########################################################################################
-            page.goto("https://chat.deepseek.com/a/chat/s/ec2724d8-0cc5-40c0-ad5a-0325f3675ecc")
+            page = pool.acquire_page(profile_number, CHAT_URL)
+            if page is None:
+                print(f"Failed to launch browser for profile {profile_number}.")
+                return
             page.wait_for_load_state("load")
             # textarea
             page.fill(
@@ -85,14 +73,16 @@ def activity(profile_number: str) -> None:
 
             input("Press Enter to continue...")
             ###########################################################################################
-            browser.close()
-            time.sleep(random.uniform(T * 0.85, T * 1.15))
+            pool.close_all(stop_browsers=not KEEP_BROWSERS)
+            if not KEEP_BROWSERS:
+                time.sleep(random.uniform(T * 0.85, T * 1.15))
 
     except Exception as e:
         print(f"error for profile {profile_number}: {e}")
 
     finally:
-        close_browser(profile_number)
+        if not KEEP_BROWSERS:
+            close_browser(profile_number)
 
 
 if __name__ == "__main__":
@@ -0,0 +1,236 @@
+import asyncio
+import random
+import time
+from collections import deque
+
+import click
+from adspower_api_utils import AsyncAdsPowerClient, click_random_async
+from browser_pool import STEALTH_INIT_JS
+from constants import PROMPT
+from database_async import AsyncDatabaseManager
+from loguru import logger
+from main import NOTEBOOK_ID, NOTEBOOKLM_URL
+from models import ProcessingStatus
+from notebooklm_page import (
+    PROMPT_TEXTAREA_SELECTOR,
+    SEND_PROMPT_BUTTON_SELECTOR,
+    SOURCE_TITLE_SELECTOR,
+    async_count_answers,
+    async_extract_last_answer,
+    async_iter_sources,
+    async_select_sources,
+    async_wait_for_answer,
+    save_scroll_checkpoint,
+)
+from patchright.async_api import BrowserContext, Page, async_playwright
+from prompts import batch_prompt_template
+
+
+async def open_notebook_tab(context: BrowserContext, url: str) -> Page:
+    page = await context.new_page()
+    await page.goto(url)
+    await page.locator(SOURCE_TITLE_SELECTOR).first.wait_for(state="visible", timeout=60_000)
+    return page
+
+
+class ScrollProgress:
+    """
+    Чекпоинт обхода источников для нескольких вкладок.
+
+    Заголовки обрабатываются вкладками не по порядку, поэтому чекпоинт сдвигается до позиции
+    прокрутки первого ещё не обработанного заголовка (как checkpoint_lag в main.iter_pending_titles).
+    После полного обхода async_iter_sources сам удаляет чекпоинт, и он больше не пишется.
+    Всё выполняется в одном цикле событий, поэтому запись файла идёт синхронно и по порядку.
+    """
+
+    def __init__(self, checkpoint_key: str):
+        self.checkpoint_key = checkpoint_key
+        self.pending: deque[tuple[str, float]] = deque()
+        self.done: set[str] = set()
+        self.traversal_finished = False
+        self.saved_position: float | None = None
+
+    def add(self, title: str, scroll_top: float) -> None:
+        self.pending.append((title, scroll_top))
+
+    def mark_done(self, title: str) -> None:
+        self.done.add(title)
+        while self.pending and self.pending[0][0] in self.done:
+            self.done.discard(self.pending.popleft()[0])
+        if self.traversal_finished or not self.pending:
+            return
+        position = self.pending[0][1]
+        if position != self.saved_position:
+            save_scroll_checkpoint(self.checkpoint_key, position)
+            self.saved_position = position
+
+
+async def enqueue_sources(
+    page: Page, queue: asyncio.Queue, db_manager: AsyncDatabaseManager, progress: ScrollProgress, tabs: int
+) -> None:
+    """
+    Обходит виртуализированный список источников и ставит в очередь новые заголовки по мере отрисовки.
+
+    В конце кладёт в очередь по None на вкладку — сигнал, что источников больше не будет.
+    """
+    total = queued = 0
+    try:
+        async for source in async_iter_sources(page, checkpoint_key=progress.checkpoint_key):
+            total += 1
+            title = source["title"]
+            if not source["enabled"] or await db_manager.titles_exist([title]):
+                continue
+            progress.add(title, source["scrollTop"])
+            queue.put_nowait(title)
+            queued += 1
+        progress.traversal_finished = True
+        logger.info(f"Sources to summarise: {queued} of {total}, tabs: {tabs}")
+    finally:
+        for _ in range(tabs):
+            queue.put_nowait(None)
+
+
+async def summarise_in_tab(
+    tab_index: int,
+    page: Page,
+    queue: asyncio.Queue,
+    db_manager: AsyncDatabaseManager,
+    answer_timeout: float,
+    progress: ScrollProgress,
+) -> int:
+    """
+    Берёт источники из общей очереди и обрабатывает их по одному в своей вкладке.
+
+    У каждой вкладки свой набор включённых источников и свой чат, ответ читается из DOM
+    вкладки, поэтому вкладки не мешают друг другу. Возвращает число сохранённых summary.
+    """
+    saved = 0
+    while True:
+        title = await queue.get()
+        if title is None:
+            queue.task_done()
+            return saved
+
+        try:
+            selected = await async_select_sources(page, [title])
+            if title not in selected:
+                logger.error(f"[tab {tab_index}] Не удалось включить источник, пропускаю ({title})")
+                continue
+
+            logger.info(f"[tab {tab_index}] ({title}) summarising...")
+            await page.locator(PROMPT_TEXTAREA_SELECTOR).fill(PROMPT)
+
+            previous_answers = await async_count_answers(page)
+            await click_random_async(page.locator(SEND_PROMPT_BUTTON_SELECTOR))
+
+            answer_latency = await async_wait_for_answer(page, previous_answers, timeout=answer_timeout)
+            if answer_latency is None:
+                logger.error(f"[tab {tab_index}] Ответ не получен за {answer_timeout} сек. Пропускаю ({title})")
+                continue
+
+            summary_text = await async_extract_last_answer(page)
+            if not summary_text:
+                logger.error(f"[tab {tab_index}] Не удалось получить текст ответа. Пропускаю ({title})")
+                continue
+
+            # Запись идёт в потоке aiosqlite: остальные вкладки в это время ждут свои ответы
+            stored = await db_manager.insert_video(
+                title=title,
+                url=None,
+                youtube_id=None,
+                status=ProcessingStatus.SENT_TO_NOTEBOOKLM,
+                summary=summary_text,
+            )
+            if not stored:
+                continue
+            saved += 1
+            logger.success(f"[tab {tab_index}] ({title}) sent to database in {answer_latency} seconds.")
+        except Exception as e:
+            logger.error(f"[tab {tab_index}] Ошибка при обработке ({title}): {e}")
+        finally:
+            progress.mark_done(title)
+            queue.task_done()
+
+
+async def summarise_sources_multitab(
+    profile_number: str, tabs: int = 3, answer_timeout: float = 180.0, notebook_id: str = NOTEBOOK_ID
+) -> None:
+    """
+    Обрабатывает источники ноутбука в tabs вкладках одного браузера AdsPower одновременно.
+
+    Args:
+        profile_number (str): Номер профиля AdsPower
+        tabs (int): Количество вкладок с ноутбуком
+        answer_timeout (float): Максимальное время ожидания ответа на один источник (сек)
+        notebook_id (str): Путь ноутбука вида "/notebook/<uuid>"
+    """
+    start_time = time.time()
+
+    db_manager = AsyncDatabaseManager()
+    await db_manager.create_tables()
+    await db_manager.use_prompt(PROMPT, batch_prompt_template(PROMPT))
+    await db_manager.load_summarised_titles()
+
+    async with AsyncAdsPowerClient() as client:
+        puppeteer_ws = await client.active_ws(profile_number) or await client.start_browser(profile_number)
+        if not puppeteer_ws:
+            print(f"Failed to launch browser for profile {profile_number}.")
+            return
+
+        try:
+            async with async_playwright() as playwright:
+                browser = await playwright.chromium.connect_over_cdp(puppeteer_ws, slow_mo=random.randint(2000, 3000))
+                context = browser.contexts[0] if browser.contexts else await browser.new_context()
+                await context.add_init_script(STEALTH_INIT_JS)
+
+                notebook_url = NOTEBOOKLM_URL + notebook_id
+                pages = await asyncio.gather(*(open_notebook_tab(context, notebook_url) for _ in range(tabs)))
+
+                # Источники ставятся в очередь по мере обхода списка в первой вкладке, остальные вкладки
+                # разбирают их параллельно. Первая подключается после обхода: включение источника
+                # прокручивает тот же список
+                queue: asyncio.Queue[str | None] = asyncio.Queue()
+                progress = ScrollProgress(f"{notebook_id}#multitab")
+
+                async def enqueue_then_summarise() -> int:
+                    await enqueue_sources(pages[0], queue, db_manager, progress, tabs)
+                    return await summarise_in_tab(0, pages[0], queue, db_manager, answer_timeout, progress)
+
+                saved = await asyncio.gather(
+                    enqueue_then_summarise(),
+                    *(
+                        summarise_in_tab(tab_index, page, queue, db_manager, answer_timeout, progress)
+                        for tab_index, page in enumerate(pages[1:], start=1)
+                    ),
+                )
+
+                total_seconds = round(time.time() - start_time)
+                logger.success(f"Saved {sum(saved)} summaries in {total_seconds} seconds.")
+                await browser.close()
+        finally:
+            await db_manager.close()
+            await client.close_browser(profile_number)
+
+
+@click.command()
+@click.option(
+    "--profile_number",
+    default="1",
+    help="Profile number for the browser instance",
+)
+@click.option("--tabs", default=3, help="Number of notebook tabs processed concurrently")
+@click.option(
+    "--answer_timeout",
+    default=180.0,
+    help="Max seconds to wait for NotebookLM to finish one answer",
+)
+@click.option("--notebook_id", default=NOTEBOOK_ID, help='Notebook to summarise, "/notebook/<uuid>"')
+def main(profile_number: str, tabs: int, answer_timeout: float, notebook_id: str) -> None:
+    """
+    Summarise NotebookLM sources in several tabs of one AdsPower profile concurrently.
+    """
+    asyncio.run(summarise_sources_multitab(profile_number, tabs, answer_timeout, notebook_id))
+
+
+if __name__ == "__main__":
+    main()
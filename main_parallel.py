@@ -0,0 +1,104 @@
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+import click
+from adspower_api_utils import load_profiles
+from database import DatabaseManager
+from loguru import logger
+from main import summarise_sources
+from notebook_shards import pending_shards, process_shards
+from notebooklm_page import MAX_NOTEBOOK_SOURCES
+
+
+def run_parallel(profiles: list[str]) -> None:
+    """
+    Запускает по одному процессу на профиль AdsPower.
+
+    Каждый процесс сам поднимает и закрывает свой браузер (start_browser/close_browser)
+    и обрабатывает только свой шард источников (см. main.source_belongs_to_worker).
+    """
+    worker_count = len(profiles)
+    # spawn вместо fork: playwright держит потоки и event loop, которые нельзя копировать fork'ом
+    mp_context = multiprocessing.get_context("spawn")
+
+    with ProcessPoolExecutor(max_workers=worker_count, mp_context=mp_context) as executor:
+        futures = {
+            executor.submit(summarise_sources, profile_number, worker_index, worker_count): profile_number
+            for worker_index, profile_number in enumerate(profiles)
+        }
+        for future in as_completed(futures):
+            profile_number = futures[future]
+            try:
+                future.result()
+                logger.success(f"Worker for profile {profile_number} finished.")
+            except Exception as e:
+                logger.error(f"Worker for profile {profile_number} failed: {e}")
+
+
+def run_sharded(profiles: list[str], shards: list[int]) -> None:
+    """
+    Раздаёт шарды ноутбуков профилям по кругу, по одному процессу на профиль.
+
+    Каждый шард — отдельный ноутбук (см. notebook_shards), поэтому профили не делят
+    источники одного ноутбука, а каждый обрабатывает свои ноутбуки целиком.
+    """
+    mp_context = multiprocessing.get_context("spawn")
+    assignments = {profile: shards[index :: len(profiles)] for index, profile in enumerate(profiles)}
+
+    with ProcessPoolExecutor(max_workers=len(profiles), mp_context=mp_context) as executor:
+        futures = {
+            executor.submit(process_shards, profile_number, profile_shards): profile_number
+            for profile_number, profile_shards in assignments.items()
+            if profile_shards
+        }
+        for future in as_completed(futures):
+            profile_number = futures[future]
+            try:
+                future.result()
+                logger.success(f"Worker for profile {profile_number} finished shards {assignments[profile_number]}.")
+            except Exception as e:
+                logger.error(f"Worker for profile {profile_number} failed: {e}")
+
+
+@click.command()
+@click.option(
+    "--profiles_file",
+    default="profiles.txt",
+    help="File with AdsPower profile numbers, one per line",
+)
+@click.option(
+    "--sharded",
+    is_flag=True,
+    help="Assign DOWNLOADED videos to notebooks of at most --shard_size sources and give each profile whole notebooks",
+)
+@click.option(
+    "--shard_size",
+    default=MAX_NOTEBOOK_SOURCES,
+    help="Maximum sources per notebook with --sharded",
+)
+def main(profiles_file: str, sharded: bool, shard_size: int) -> None:
+    """
+    Summarise NotebookLM sources with every AdsPower profile from profiles_file in parallel.
+    """
+    profiles = load_profiles(profiles_file)
+    if not profiles:
+        logger.error(f"No profiles found in {profiles_file}.")
+        return
+
+    # Схема и перенос старых summary — один раз до старта воркеров, а не наперегонки в каждом
+    db_manager = DatabaseManager()
+    db_manager.create_tables()
+
+    if sharded:
+        db_manager.assign_shards(shard_size)
+        shards = pending_shards(db_manager)
+        logger.info(f"Starting {len(profiles)} workers over {len(shards)} shards: {shards}")
+        run_sharded(profiles, shards)
+        return
+
+    logger.info(f"Starting {len(profiles)} workers: {', '.join(profiles)}")
+    run_parallel(profiles)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,200 @@
+import csv
+import json
+import math
+import threading
+import time
+from contextlib import contextmanager
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+
+from loguru import logger
+
+
+# Этапы обработки, по которым собирается статистика (порядок — порядок в отчёте)
+STAGES = (
+    "browser_start",  # запуск браузера профиля в AdsPower (или поиск уже запущенного)
+    "cdp_connect",  # connect_over_cdp к браузеру
+    "page_load",  # открытие ноутбука до появления списка источников
+    "selection",  # включение нужных источников
+    "prompt",  # ввод и отправка промпта
+    "answer_wait",  # ожидание, пока ответ дорисуется
+    "extraction",  # получение текста ответа из DOM или буфера обмена
+    "db_write",  # коммит в SQLite (пакет write-behind или одиночная вставка)
+    "source_insert",  # одно окно "Добавить источник" при загрузке источников (ingest_sources)
+    "source_confirm",  # ожидание, пока вставленные источники появятся в ноутбуке
+)
+# Верхние границы корзин гистограммы, сек
+HISTOGRAM_BUCKETS = (0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0, 120.0, 300.0, math.inf)
+PERCENTILES = (50, 90, 95, 99)
+REPORTS_DIR = Path("reports")
+
+
+def percentile(sorted_values: list[float], pct: float) -> float:
+    """Перцентиль по методу ближайшего ранга; sorted_values должен быть отсортирован"""
+    if not sorted_values:
+        return 0.0
+    rank = max(math.ceil(pct / 100 * len(sorted_values)), 1)
+    return sorted_values[rank - 1]
+
+
+class RunMetrics:
+    """
+    Длительности этапов за один запуск процесса.
+
+    Каждый замер — (этап, источник, секунды, успех). Этапы замеряются контекстным
+    менеджером stage, завершённые источники отмечаются source_done, по ним считается
+    пропускная способность. Потокобезопасен: db_write пишется из потока write-behind.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.started_at = time.time()
+        self.samples: list[tuple[str, str | None, float, bool]] = []
+        self.sources_done = 0
+
+    def reset(self) -> None:
+        with self._lock:
+            self.started_at = time.time()
+            self.samples = []
+            self.sources_done = 0
+
+    def record(self, stage: str, seconds: float, source: str | None = None, ok: bool = True) -> None:
+        with self._lock:
+            self.samples.append((stage, source, seconds, ok))
+
+    @contextmanager
+    def stage(self, stage: str, source: str | None = None):
+        """Замеряет блок как этап stage; исключение внутри блока помечает замер неуспешным"""
+        started = time.perf_counter()
+        ok = True
+        try:
+            yield
+        except BaseException:
+            ok = False
+            raise
+        finally:
+            self.record(stage, time.perf_counter() - started, source, ok)
+
+    def source_done(self, count: int = 1) -> None:
+        with self._lock:
+            self.sources_done += count
+
+    def _stage_values(self) -> dict[str, list[tuple[float, bool]]]:
+        with self._lock:
+            samples = list(self.samples)
+        values: dict[str, list[tuple[float, bool]]] = {}
+        for stage, _, seconds, ok in samples:
+            values.setdefault(stage, []).append((seconds, ok))
+        # Сначала известные этапы в порядке STAGES, потом всё остальное
+        return dict(sorted(values.items(), key=lambda item: (STAGES + (item[0],)).index(item[0])))
+
+    def summary(self) -> dict:
+        """Перцентили, гистограммы по этапам и пропускная способность запуска"""
+        elapsed = time.time() - self.started_at
+        stages = {}
+        for stage, values in self._stage_values().items():
+            durations = sorted(seconds for seconds, _ in values)
+            stages[stage] = {
+                "count": len(durations),
+                "failed": sum(1 for _, ok in values if not ok),
+                "total": round(sum(durations), 3),
+                "mean": round(sum(durations) / len(durations), 3),
+                "min": round(durations[0], 3),
+                "max": round(durations[-1], 3),
+                **{f"p{pct}": round(percentile(durations, pct), 3) for pct in PERCENTILES},
+                "histogram": {
+                    str(bound): sum(1 for seconds in durations if seconds <= bound) for bound in HISTOGRAM_BUCKETS
+                },
+            }
+        return {
+            "started_at": self.started_at,
+            "elapsed": round(elapsed, 1),
+            "sources": self.sources_done,
+            "sources_per_hour": round(self.sources_done / elapsed * 3600, 1) if elapsed > 0 else 0.0,
+            "stages": stages,
+        }
+
+    def log_summary(self) -> None:
+        summary = self.summary()
+        for stage, stats in summary["stages"].items():
+            logger.info(
+                f"[metrics] {stage:<13} n={stats['count']:<4} failed={stats['failed']:<3} "
+                f"p50={stats['p50']}s p95={stats['p95']}s max={stats['max']}s total={stats['total']}s"
+            )
+        logger.info(f"[metrics] {summary['sources']} sources, {summary['sources_per_hour']} sources/hour")
+
+    def write_report(self, path_prefix: Path) -> tuple[Path, Path]:
+        """
+        Пишет отчёт о запуске: {path_prefix}.json со сводкой (summary) и
+        {path_prefix}.csv со всеми замерами. Возвращает пути к обоим файлам.
+        """
+        path_prefix.parent.mkdir(parents=True, exist_ok=True)
+        json_file = path_prefix.with_suffix(".json")
+        csv_file = path_prefix.with_suffix(".csv")
+
+        json_file.write_text(json.dumps(self.summary(), ensure_ascii=False, indent=2), encoding="utf-8")
+        with self._lock:
+            samples = list(self.samples)
+        with open(csv_file, "w", encoding="utf-8", newline="") as f:
+            writer = csv.writer(f)
+            writer.writerow(["stage", "source", "seconds", "ok"])
+            for stage, source, seconds, ok in samples:
+                writer.writerow([stage, source or "", f"{seconds:.4f}", int(ok)])
+
+        logger.info(f"[metrics] Отчёт о запуске: {json_file}, {csv_file}")
+        return json_file, csv_file
+
+    def prometheus_text(self) -> str:
+        """Замеры в текстовом формате Prometheus (гистограмма по этапам и счётчик источников)"""
+        lines = [
+            "# HELP notebooklm_stage_seconds Duration of a processing stage.",
+            "# TYPE notebooklm_stage_seconds histogram",
+        ]
+        for stage, values in self._stage_values().items():
+            durations = [seconds for seconds, _ in values]
+            for bound in HISTOGRAM_BUCKETS:
+                le = "+Inf" if bound == math.inf else str(bound)
+                count = sum(1 for seconds in durations if seconds <= bound)
+                lines.append(f'notebooklm_stage_seconds_bucket{{stage="{stage}",le="{le}"}} {count}')
+            lines.append(f'notebooklm_stage_seconds_sum{{stage="{stage}"}} {sum(durations):.4f}')
+            lines.append(f'notebooklm_stage_seconds_count{{stage="{stage}"}} {len(durations)}')
+        lines += [
+            "# HELP notebooklm_stage_failures_total Stages that ended with an error.",
+            "# TYPE notebooklm_stage_failures_total counter",
+        ]
+        for stage, values in self._stage_values().items():
+            lines.append(f'notebooklm_stage_failures_total{{stage="{stage}"}} {sum(1 for _, ok in values if not ok)}')
+        lines += [
+            "# HELP notebooklm_sources_total Sources summarised in this run.",
+            "# TYPE notebooklm_sources_total counter",
+            f"notebooklm_sources_total {self.sources_done}",
+        ]
+        return "\n".join(lines) + "\n"
+
+    def serve_prometheus(self, port: int, host: str = "127.0.0.1") -> ThreadingHTTPServer:
+        """Запускает в фоновом потоке HTTP-сервер, отдающий prometheus_text на /metrics"""
+        metrics = self
+
+        class MetricsHandler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                if self.path.rstrip("/") != "/metrics":
+                    self.send_error(404)
+                    return
+                body = metrics.prometheus_text().encode("utf-8")
+                self.send_response(200)
+                self.send_header("Content-Type", "text/plain; version=0.0.4; charset=utf-8")
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, *args):
+                pass
+
+        server = ThreadingHTTPServer((host, port), MetricsHandler)
+        threading.Thread(target=server.serve_forever, name="metrics-http", daemon=True).start()
+        logger.info(f"[metrics] Prometheus endpoint: http://{host}:{port}/metrics")
+        return server
+
+
+# Замеры текущего процесса: каждый воркер main_parallel пишет свой отчёт
+run_metrics = RunMetrics()
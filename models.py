@@ -1,7 +1,20 @@
 import enum
+from datetime import datetime
 
-from sqlalchemy import Column, Enum, Integer, String, Text
+from sqlalchemy import (
+    Column,
+    DateTime,
+    Enum,
+    ForeignKey,
+    Index,
+    Integer,
+    LargeBinary,
+    String,
+    Text,
+    UniqueConstraint,
+)
 from sqlalchemy.ext.declarative import declarative_base
+from sqlalchemy.orm import deferred
 
 
 Base = declarative_base()
@@ -16,17 +29,98 @@ class ProcessingStatus(enum.Enum):
     COMPLETED = "completed"  # Обработана везде
 
 
+class SummaryBlob(Base):
+    """Сжатый zlib текст summary; одинаковые тексты хранятся один раз (ключ — sha256 текста)"""
+
+    __tablename__ = "summary_blobs"
+
+    hash = Column(String(64), primary_key=True)
+    data = Column(LargeBinary, nullable=False)
+    size = Column(Integer, nullable=False)  # Размер несжатого текста в байтах
+
+    def __repr__(self) -> str:
+        return f"<SummaryBlob(hash={self.hash[:12]}, size={self.size}, compressed={len(self.data)})>"
+
+
+class Prompt(Base):
+    """Редакция промпта: каждый текст хранится один раз (ключ — sha256 текста)"""
+
+    __tablename__ = "prompts"
+
+    hash = Column(String(64), primary_key=True)
+    text = Column(Text, nullable=False)
+
+    # Когда редакция впервые использована: порядок версий промпта
+    created_at = Column(DateTime, nullable=False, default=datetime.now)
+
+    def __repr__(self) -> str:
+        return f"<Prompt(hash={self.hash[:12]}, created_at={self.created_at})>"
+
+
+class SourceSummary(Base):
+    """
+    Кэш summary: какой текст получен для источника какой редакцией промпта.
+
+    Источник определяется по source_key (см. database.source_key), поэтому одно видео,
+    импортированное под разными заголовками, суммаризируется одной редакцией промпта один раз.
+    """
+
+    __tablename__ = "source_summaries"
+    __table_args__ = (
+        UniqueConstraint("source_key", "prompt_hash", name="uq_source_summaries_source_prompt"),
+        # Все источники с summary от одной редакции промпта — одним проходом по индексу
+        Index("ix_source_summaries_prompt", "prompt_hash", "source_key"),
+    )
+
+    id = Column(Integer, primary_key=True, autoincrement=True)
+
+    source_key = Column(String(600), nullable=False)
+    prompt_hash = Column(String(64), ForeignKey("prompts.hash"), nullable=False)
+    summary_hash = Column(String(64), ForeignKey("summary_blobs.hash"), nullable=False)
+    # Строка videos, в которую записан этот summary
+    video_id = Column(Integer, ForeignKey("videos.id"), nullable=True)
+
+    created_at = Column(DateTime, nullable=False, default=datetime.now)
+
+    def __repr__(self) -> str:
+        return f"<SourceSummary(source_key='{self.source_key[:40]}', prompt={self.prompt_hash[:12]})>"
+
+
+class Notebook(Base):
+    """Шард: ноутбук NotebookLM, в который назначается не больше capacity видео"""
+
+    __tablename__ = "notebooks"
+
+    shard = Column(Integer, primary_key=True, autoincrement=False)
+    # Путь ноутбука вида "/notebook/<uuid>"; None, пока ноутбук не создан в NotebookLM
+    notebook_id = Column(String(100), nullable=True, unique=True)
+    capacity = Column(Integer, nullable=False)
+
+    created_at = Column(DateTime, nullable=False, default=datetime.now)
+
+    def __repr__(self) -> str:
+        return f"<Notebook(shard={self.shard}, notebook_id={self.notebook_id}, capacity={self.capacity})>"
+
+
 class Video(Base):
     """Таблица для хранения информации о видео"""
 
     __tablename__ = "videos"
+    __table_args__ = (
+        # Одна строка на ссылку: повторный или параллельный импорт не создаёт дублей (NULL не сравниваются)
+        Index("uq_videos_url", "url", unique=True),
+    )
 
     id = Column(Integer, primary_key=True, autoincrement=True)
 
     # Основная информация о видео
     title = Column(String(500), nullable=False)
     url = Column(String(500), nullable=True)
-    summary = Column(Text, nullable=True)
+
+    # Текст summary лежит сжатым в summary_blobs, в строке видео только его ключ
+    summary_hash = Column(String(64), ForeignKey("summary_blobs.hash"), nullable=True, index=True)
+    # Старое хранение текста прямо в строке: никогда не загружается, после миграции всегда NULL
+    legacy_summary = deferred(Column("summary", Text, nullable=True))
 
     # Технические поля
     youtube_id = Column(String(20), nullable=True)  # ID видео на YouTube
@@ -36,10 +130,114 @@ class Video(Base):
 
     # Поля для интеграций
     notebooklm_document_id = Column(String(100))  # ID документа в NotebookLM
+    # Шард ноутбука, в который назначено видео (см. Notebook)
+    notebook_shard = Column(Integer, ForeignKey("notebooks.shard"), nullable=True, index=True)
     zotero_item_id = Column(String(100))  # ID элемента в Zotero
 
     def __repr__(self) -> str:
         return (
             f"<Video(id={self.id}, title='{self.title[:30]}...', "
-            f"status={self.status.value}, summary={'yes' if self.summary else 'no'})>"
+            f"status={self.status.value}, summary={'yes' if self.summary_hash else 'no'})>"
         )
+
+
+class SourceState(enum.Enum):
+    """Этапы обработки одного источника ноутбука в журнале запуска"""
+
+    QUEUED = "queued"  # Найден в ноутбуке, ждёт обработки
+    SELECTED = "selected"  # Источник включён
+    PROMPTED = "prompted"  # Промпт отправлен
+    ANSWERED = "answered"  # Ответ дорисован
+    EXTRACTED = "extracted"  # Текст ответа получен и сохранён в журнале
+    STORED = "stored"  # Summary записан в таблицу videos
+    FAILED = "failed"  # Исчерпаны попытки
+
+
+class SourceJournal(Base):
+    """Журнал обработки источников: позволяет продолжить прерванный запуск с последнего этапа"""
+
+    __tablename__ = "source_journal"
+    __table_args__ = (
+        UniqueConstraint("notebook_id", "title", name="uq_source_journal_notebook_title"),
+        Index("ix_source_journal_notebook_state", "notebook_id", "state"),
+    )
+
+    id = Column(Integer, primary_key=True, autoincrement=True)
+
+    notebook_id = Column(String(100), nullable=False)
+    title = Column(String(500), nullable=False)
+    state = Column(Enum(SourceState), nullable=False, default=SourceState.QUEUED)
+
+    # Текст ответа, сохранённый на этапе EXTRACTED: после перезапуска его не нужно запрашивать заново
+    summary = Column(Text, nullable=True)
+    # Редакция промпта, которой получен summary (None — основной промпт): восстановленный ответ
+    # кэшируется под тем же хешем, что и при обычной записи
+    prompt_hash = Column(String(64), nullable=True)
+
+    attempts = Column(Integer, nullable=False, default=0)
+    last_error = Column(Text, nullable=True)
+    next_attempt_at = Column(DateTime, nullable=True)
+
+    created_at = Column(DateTime, nullable=False, default=datetime.now)
+    updated_at = Column(DateTime, nullable=False, default=datetime.now, onupdate=datetime.now)
+
+    def __repr__(self) -> str:
+        return f"<SourceJournal(title='{self.title[:30]}...', state={self.state.value}, attempts={self.attempts})>"
+
+
+class JobKind(enum.Enum):
+    """Этапы конвейера, работа которых раздаётся через очередь jobs"""
+
+    NOTEBOOKLM = "notebooklm"  # Получить summary источника в NotebookLM
+    ZOTERO = "zotero"  # Отправить summary в Zotero
+    PDF = "pdf"  # Отрендерить summary в PDF
+
+
+class JobStatus(enum.Enum):
+    """Состояния задачи в очереди"""
+
+    PENDING = "pending"  # Ждёт воркера (не раньше available_at)
+    LEASED = "leased"  # Взята воркером до lease_expires_at
+    DONE = "done"  # Выполнена
+    DEAD = "dead"  # Исчерпаны попытки, нужен разбор вручную
+
+
+class Job(Base):
+    """
+    Задача очереди: один этап (kind) для одного видео.
+
+    Воркер берёт задачу в аренду до lease_expires_at и продлевает аренду heartbeat'ом;
+    задача с истёкшей арендой возвращается в очередь, как если бы попытка не удалась.
+    """
+
+    __tablename__ = "jobs"
+    __table_args__ = (
+        UniqueConstraint("kind", "video_id", name="uq_jobs_kind_video"),
+        # Выборка следующих задач: равенство по kind, scope, status и диапазон по available_at
+        Index("ix_jobs_claim", "kind", "scope", "status", "available_at"),
+        # Поиск задач с истёкшей арендой
+        Index("ix_jobs_lease", "status", "lease_expires_at"),
+    )
+
+    id = Column(Integer, primary_key=True, autoincrement=True)
+
+    kind = Column(Enum(JobKind), nullable=False)
+    video_id = Column(Integer, ForeignKey("videos.id"), nullable=False)
+    # Подмножество задач этапа, например ноутбук для NOTEBOOKLM; пустая строка — без подмножества
+    scope = Column(String(100), nullable=False, default="")
+
+    status = Column(Enum(JobStatus), nullable=False, default=JobStatus.PENDING)
+    attempts = Column(Integer, nullable=False, default=0)
+    max_attempts = Column(Integer, nullable=False, default=3)
+    available_at = Column(DateTime, nullable=False, default=datetime.now)
+
+    lease_owner = Column(String(100), nullable=True)
+    lease_expires_at = Column(DateTime, nullable=True)
+    heartbeat_at = Column(DateTime, nullable=True)
+    last_error = Column(Text, nullable=True)
+
+    created_at = Column(DateTime, nullable=False, default=datetime.now)
+    updated_at = Column(DateTime, nullable=False, default=datetime.now, onupdate=datetime.now)
+
+    def __repr__(self) -> str:
+        return f"<Job(id={self.id}, kind={self.kind.value}, video_id={self.video_id}, status={self.status.value})>"
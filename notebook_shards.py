@@ -0,0 +1,130 @@
+import click
+from browser_pool import BROWSER_IDLE_TTL, BrowserPool
+from database import DatabaseManager
+from ingest_sources import ingest_into_page, load_downloaded_sources
+from loguru import logger
+from main import NOTEBOOKLM_URL, summarise_sources
+from notebooklm_page import MAX_NOTEBOOK_SOURCES, URLS_PER_DIALOG, create_notebook
+from patchright.sync_api import sync_playwright
+
+
+def prepare_shard(
+    profile_number: str,
+    shard: int,
+    urls_per_dialog: int = URLS_PER_DIALOG["website"],
+    confirm_timeout: float = 300.0,
+    browser_ttl: float = BROWSER_IDLE_TTL,
+) -> str | None:
+    """
+    Готовит ноутбук шарда: создаёт его в NotebookLM, если ноутбука ещё нет, и загружает
+    в него назначенные шарду видео (см. ingest_sources.ingest_into_page).
+
+    Браузер профиля остаётся запущенным: следом его подхватывает summarise_sources.
+    Возвращает путь ноутбука или None, если браузер не запустился.
+    """
+    db_manager = DatabaseManager()
+    db_manager.create_tables()
+    notebook_id = db_manager.shard_notebook(shard)
+    sources = load_downloaded_sources(db_manager, shard=shard)
+    if notebook_id is not None and not sources:
+        return notebook_id
+
+    with sync_playwright() as playwright:
+        pool = BrowserPool(playwright, idle_ttl=browser_ttl)
+        if notebook_id is None:
+            pooled = pool.get(profile_number)
+            if pooled is None:
+                logger.error(f"Failed to launch browser for profile {profile_number}.")
+                return None
+            # Отдельная вкладка: acquire_page отдал бы любую открытую вкладку NotebookLM, в том числе ноутбук
+            page = pooled.context.new_page()
+            page.goto(NOTEBOOKLM_URL)
+            notebook_id = create_notebook(page)
+            db_manager.set_shard_notebook(shard, notebook_id)
+        else:
+            page = pool.acquire_page(profile_number, NOTEBOOKLM_URL + notebook_id)
+            if page is None:
+                logger.error(f"Failed to launch browser for profile {profile_number}.")
+                return None
+
+        if sources:
+            logger.info(f"Шард {shard}: загружаю {len(sources)} видео в {notebook_id}")
+            ingest_into_page(page, db_manager, sources, notebook_id, urls_per_dialog, confirm_timeout)
+        pool.close_all(stop_browsers=False)
+    return notebook_id
+
+
+def process_shards(profile_number: str, shards: list[int], options: dict | None = None) -> None:
+    """
+    Обрабатывает шарды по очереди в одном профиле AdsPower: подготовка ноутбука и суммаризация.
+
+    Вызывается в отдельном процессе на профиль (см. main_parallel.run_sharded), поэтому разные
+    шарды обрабатываются параллельно разными профилями. options передаются в summarise_sources.
+    """
+    options = dict(options or {})
+    keep_browser = options.pop("keep_browser", False)
+    for position, shard in enumerate(shards):
+        notebook_id = prepare_shard(profile_number, shard)
+        if notebook_id is None:
+            logger.error(f"Шард {shard} пропущен: ноутбук не подготовлен")
+            continue
+        logger.info(f"Шард {shard} ({position + 1}/{len(shards)}): {notebook_id}")
+        # Между шардами браузер не закрываю: следующий шард подключится к нему же
+        is_last = position == len(shards) - 1
+        summarise_sources(profile_number, notebook_id=notebook_id, keep_browser=keep_browser or not is_last, **options)
+
+
+def pending_shards(db_manager: DatabaseManager) -> list[int]:
+    """Шарды, в которых ещё есть видео без summary, попытки по которым не исчерпаны"""
+    return [status["shard"] for status in db_manager.shard_status() if status["finished"] < status["assigned"]]
+
+
+@click.group()
+def cli() -> None:
+    """Split the video backlog into notebooks of at most N sources."""
+
+
+@cli.command("assign")
+@click.option("--shard_size", default=MAX_NOTEBOOK_SOURCES, help="Maximum sources per notebook")
+@click.option("--limit", default=None, type=int, help="Assign at most this many videos")
+def assign_command(shard_size: int, limit: int | None) -> None:
+    """Assign DOWNLOADED videos to shards, topping up shards that still have room."""
+    db_manager = DatabaseManager()
+    db_manager.create_tables()
+    for shard, count in db_manager.assign_shards(shard_size, limit).items():
+        click.echo(f"shard {shard}: +{count}")
+
+
+@cli.command("status")
+def status_command() -> None:
+    """Show every shard with its notebook and progress."""
+    db_manager = DatabaseManager()
+    db_manager.create_tables()
+    click.echo(f"{'shard':>5} {'assigned':>8} {'ingested':>8} {'stored':>6} {'dead':>5}  notebook")
+    for status in db_manager.shard_status():
+        click.echo(
+            f"{status['shard']:>5} {status['assigned']:>8} {status['ingested']:>8} {status['stored']:>6} "
+            f"{status['dead']:>5}  {status['notebook_id'] or '-'}"
+        )
+
+
+@cli.command("run")
+@click.option("--profile_number", default="1", help="Profile number for the browser instance")
+@click.option(
+    "--shard", "shards", multiple=True, type=int, help="Shard to process; repeat for several (default: all pending)"
+)
+@click.option("--batch_size", default=1, help="Sources per prompt")
+@click.option("--answer_timeout", default=180.0, help="Max seconds to wait for NotebookLM to finish one answer")
+def run_command(profile_number: str, shards: tuple[int, ...], batch_size: int, answer_timeout: float) -> None:
+    """Prepare and summarise shards one after another in a single AdsPower profile."""
+    db_manager = DatabaseManager()
+    db_manager.create_tables()
+    selected = list(shards) or pending_shards(db_manager)
+    if not selected:
+        logger.info("Нет шардов с необработанными видео")
+        return
+    process_shards(profile_number, selected, {"batch_size": batch_size, "answer_timeout": answer_timeout})
+
+
+if __name__ == "__main__":
+    cli()
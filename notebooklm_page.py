@@ -0,0 +1,593 @@
+import re
+from collections.abc import AsyncIterator, Iterator
+from pathlib import Path
+
+from adspower_api_utils import click_random
+from json_state import locked_json_state, read_json_state
+from loguru import logger
+from patchright.async_api import Page as AsyncPage
+from patchright.sync_api import Page, expect
+
+
+SOURCE_CONTAINER_SELECTOR = "div.single-source-container"
+SOURCE_TITLE_SELECTOR = 'div[aria-label="Название источника"]'
+# Чекбокс "Выбрать все источники" над списком
+SELECT_ALL_CHECKBOX_SELECTOR = 'input[type="checkbox"][id="mat-mdc-checkbox-0-input"]'
+PROMPT_TEXTAREA_SELECTOR = "textarea.cdk-textarea-autosize"
+SEND_PROMPT_BUTTON_SELECTOR = "query-box > div > div > form > div > button"
+CHAT_PANEL_SELECTOR = "div.chat-panel-content"
+LOADING_DOTS_SELECTOR = "div.loading-dots"
+COPY_BUTTON_SELECTOR = "button.xap-copy-to-clipboard"
+ANSWER_SELECTOR = "div.to-user-container .message-text-content"
+# Карточка сообщения, в которой лежит кнопка копирования: запасной способ найти ответ
+ANSWER_CARD_SELECTOR = "mat-card, chat-message, div.to-user-container"
+
+# Ждёт внутри страницы (без CDP round-trip'ов на каждую проверку), пока:
+#   1. появится новый ответ (кнопок копирования стало больше, чем до отправки промпта),
+#   2. пропадут div.loading-dots,
+#   3. чат-панель не менялась stableMs миллисекунд (ответ дорисован).
+# MutationObserver фиксирует время последнего изменения DOM, setInterval проверяет условия.
+WAIT_FOR_ANSWER_JS = """
+    ({ panelSelector, dotsSelector, copySelector, previousAnswers, stableMs, timeoutMs }) => new Promise((resolve) => {
+        const started = performance.now();
+        let lastMutation = started;
+        const panel = document.querySelector(panelSelector) || document.body;
+        const observer = new MutationObserver(() => { lastMutation = performance.now(); });
+        observer.observe(panel, { childList: true, subtree: true, characterData: true });
+
+        const finish = (done) => {
+            observer.disconnect();
+            clearInterval(timer);
+            resolve({ done, elapsedMs: performance.now() - started });
+        };
+        const timer = setInterval(() => {
+            const now = performance.now();
+            if (now - started >= timeoutMs) {
+                finish(false);
+                return;
+            }
+            const hasNewAnswer = document.querySelectorAll(copySelector).length > previousAnswers;
+            const isLoading = document.querySelector(dotsSelector) !== null;
+            if (hasNewAnswer && !isLoading && now - lastMutation >= stableMs) {
+                finish(true);
+            }
+        }, 250);
+    })
+"""
+
+
+def count_answers(page: Page) -> int:
+    """Количество уже отрисованных ответов в чате (по кнопкам копирования)."""
+    return page.locator(COPY_BUTTON_SELECTOR).count()
+
+
+def _wait_for_answer_args(previous_answers: int, timeout: float, stable_ms: int) -> dict:
+    return {
+        "panelSelector": CHAT_PANEL_SELECTOR,
+        "dotsSelector": LOADING_DOTS_SELECTOR,
+        "copySelector": COPY_BUTTON_SELECTOR,
+        "previousAnswers": previous_answers,
+        "stableMs": stable_ms,
+        "timeoutMs": int(timeout * 1000),
+    }
+
+
+def _answer_latency(result: dict, timeout: float) -> float | None:
+    if not result["done"]:
+        logger.error(f"Ответ не готов за {timeout} сек.")
+        return None
+    return round(result["elapsedMs"] / 1000, 2)
+
+
+def wait_for_answer(
+    page: Page,
+    previous_answers: int,
+    timeout: float = 180.0,
+    stable_ms: int = 3000,
+) -> float | None:
+    """
+    Ждёт, пока ответ NotebookLM полностью отрисуется и перестанет меняться.
+
+    :param page: Playwright Page
+    :param previous_answers: число ответов в чате до отправки промпта (см. count_answers)
+    :param timeout: максимальное время ожидания (сек)
+    :param stable_ms: сколько миллисекунд чат-панель должна не меняться
+    :return: время ожидания ответа в секундах или None, если ответ не готов за timeout
+    """
+    result = page.evaluate(WAIT_FOR_ANSWER_JS, _wait_for_answer_args(previous_answers, timeout, stable_ms))
+    return _answer_latency(result, timeout)
+
+
+async def async_count_answers(page: AsyncPage) -> int:
+    return await page.locator(COPY_BUTTON_SELECTOR).count()
+
+
+async def async_wait_for_answer(
+    page: AsyncPage,
+    previous_answers: int,
+    timeout: float = 180.0,
+    stable_ms: int = 3000,
+) -> float | None:
+    """Асинхронный вариант wait_for_answer"""
+    result = await page.evaluate(WAIT_FOR_ANSWER_JS, _wait_for_answer_args(previous_answers, timeout, stable_ms))
+    return _answer_latency(result, timeout)
+
+
+# Находит последний ответ в чате и за один evaluate превращает его DOM в Markdown.
+# Кнопки (цитаты, копирование) и иконки пропускаются.
+EXTRACT_LAST_ANSWER_JS = r"""
+    ({ answerSelector, copySelector, cardSelector }) => {
+        const answers = document.querySelectorAll(answerSelector);
+        let root = answers.length ? answers[answers.length - 1] : null;
+        if (!root) {
+            const buttons = document.querySelectorAll(copySelector);
+            const lastButton = buttons.length ? buttons[buttons.length - 1] : null;
+            root = lastButton ? lastButton.closest(cardSelector) : null;
+        }
+        if (!root) return null;
+
+        const SKIP = new Set(['BUTTON', 'MAT-ICON', 'SCRIPT', 'STYLE', 'SVG', 'TEMPLATE']);
+        const renderChildren = (node, depth) =>
+            Array.from(node.childNodes).map((child) => render(child, depth)).join('');
+        const wrap = (node, depth, mark) => {
+            const text = renderChildren(node, depth).trim();
+            return text ? `${mark}${text}${mark}` : '';
+        };
+        const renderList = (node, depth) => {
+            const items = Array.from(node.children).filter((child) => child.tagName === 'LI');
+            const lines = items.map((li, i) => {
+                const marker = node.tagName === 'OL' ? `${i + 1}.` : '-';
+                return `${'  '.repeat(depth)}${marker} ${renderChildren(li, depth + 1).trim()}`;
+            });
+            return `\n${lines.join('\n')}\n`;
+        };
+        const renderTable = (node) => {
+            const rows = Array.from(node.querySelectorAll('tr')).map((tr) =>
+                Array.from(tr.children).map((cell) => renderChildren(cell, 0).trim().replace(/\|/g, '\\|'))
+            );
+            if (!rows.length) return '';
+            const line = (cells) => `| ${cells.join(' | ')} |`;
+            const separator = line(rows[0].map(() => '---'));
+            return `\n\n${[line(rows[0]), separator, ...rows.slice(1).map(line)].join('\n')}\n\n`;
+        };
+
+        const render = (node, depth) => {
+            if (node.nodeType === Node.TEXT_NODE) return node.textContent.replace(/\s+/g, ' ');
+            if (node.nodeType !== Node.ELEMENT_NODE || SKIP.has(node.tagName)) return '';
+            const tag = node.tagName;
+            if (/^H[1-6]$/.test(tag)) {
+                return `\n\n${'#'.repeat(Number(tag[1]))} ${renderChildren(node, depth).trim()}\n\n`;
+            }
+            switch (tag) {
+                case 'P': return `\n\n${renderChildren(node, depth).trim()}\n\n`;
+                case 'BR': return '\n';
+                case 'HR': return '\n\n---\n\n';
+                case 'STRONG': case 'B': return wrap(node, depth, '**');
+                case 'EM': case 'I': return wrap(node, depth, '*');
+                case 'CODE': return node.closest('pre') ? node.textContent : `\`${node.textContent}\``;
+                case 'PRE': return `\n\n\`\`\`\n${node.textContent.replace(/\n$/, '')}\n\`\`\`\n\n`;
+                case 'A': return `[${renderChildren(node, depth).trim()}](${node.href})`;
+                case 'UL': case 'OL': return renderList(node, depth);
+                case 'TABLE': return renderTable(node);
+                case 'DIV': case 'SECTION': case 'BLOCKQUOTE': return `\n${renderChildren(node, depth)}\n`;
+                default: return renderChildren(node, depth);
+            }
+        };
+
+        return render(root, 0)
+            .replace(/[ \t]+\n/g, '\n')
+            .replace(/\n{3,}/g, '\n\n')
+            .trim();
+    }
+"""
+
+
+def extract_last_answer(page: Page) -> str:
+    """
+    Достаёт последний ответ из чата напрямую из DOM и конвертирует его в Markdown.
+
+    Один evaluate вместо прокрутки, поиска кнопки копирования и чтения буфера обмена:
+    не нужны разрешение clipboard-read и фокус на вкладке.
+    :return: Markdown ответа или пустая строка, если ответ не найден
+    """
+    markdown_text = page.evaluate(EXTRACT_LAST_ANSWER_JS, _extract_answer_args())
+    return markdown_text or ""
+
+
+async def async_extract_last_answer(page: AsyncPage) -> str:
+    """Асинхронный вариант extract_last_answer"""
+    markdown_text = await page.evaluate(EXTRACT_LAST_ANSWER_JS, _extract_answer_args())
+    return markdown_text or ""
+
+
+def _extract_answer_args() -> dict:
+    return {
+        "answerSelector": ANSWER_SELECTOR,
+        "copySelector": COPY_BUTTON_SELECTOR,
+        "cardSelector": ANSWER_CARD_SELECTOR,
+    }
+
+
+# Один шаг обхода виртуализированного списка источников: прокручивает панель источников
+# до scrollTop и ждёт не фиксированную паузу, а пока IntersectionObserver не сообщит,
+# что отрисованные после прокрутки контейнеры попали в область видимости и новые
+# перестали появляться (settleMs). Возвращает отрисованные источники и позицию прокрутки.
+SCROLL_SOURCES_STEP_JS = """
+    async ({ containerSelector, titleSelector, scrollTop, settleMs, timeoutMs }) => {
+        const first = document.querySelector(containerSelector);
+        if (!first) return { sources: [], scrollTop: 0, nextScrollTop: 0, atEnd: true };
+
+        const isScrollable = (element) =>
+            element.scrollHeight > element.clientHeight && /(auto|scroll)/.test(getComputedStyle(element).overflowY);
+        let panel = first.parentElement;
+        while (panel && panel !== document.body && !isScrollable(panel)) panel = panel.parentElement;
+        const root = panel && panel !== document.body ? panel : null;
+        const scroller = root || document.scrollingElement;
+
+        if (scrollTop !== null) scroller.scrollTop = scrollTop;
+
+        await new Promise((resolve) => {
+            let settleTimer = null;
+            const observed = new WeakSet();
+            const finish = () => {
+                intersection.disconnect();
+                mutation.disconnect();
+                clearTimeout(settleTimer);
+                clearTimeout(hardTimer);
+                resolve();
+            };
+            const intersection = new IntersectionObserver((entries) => {
+                if (entries.some((entry) => entry.isIntersecting)) {
+                    clearTimeout(settleTimer);
+                    settleTimer = setTimeout(finish, settleMs);
+                }
+            }, { root });
+            const observeAll = () => {
+                for (const element of document.querySelectorAll(containerSelector)) {
+                    if (!observed.has(element)) {
+                        observed.add(element);
+                        intersection.observe(element);
+                    }
+                }
+            };
+            const mutation = new MutationObserver(observeAll);
+            mutation.observe(scroller, { childList: true, subtree: true });
+            const hardTimer = setTimeout(finish, timeoutMs);
+            observeAll();
+        });
+
+        const isVisible = (element) =>
+            element.getClientRects().length > 0 && getComputedStyle(element).visibility !== 'hidden';
+        const sources = Array.from(document.querySelectorAll(containerSelector)).map((container) => {
+            const titleElement = container.querySelector(titleSelector);
+            const input = container.querySelector('input[type="checkbox"]');
+            return {
+                title: titleElement ? titleElement.innerText.trim() : '',
+                checked: Boolean(input && input.checked),
+                visible: Boolean(input && isVisible(input)),
+                enabled: Boolean(input && !input.disabled),
+            };
+        });
+        return {
+            sources,
+            scrollTop: scroller.scrollTop,
+            nextScrollTop: scroller.scrollTop + Math.max(scroller.clientHeight * 0.8, 1),
+            atEnd: scroller.scrollTop + scroller.clientHeight >= scroller.scrollHeight - 2,
+        };
+    }
+"""
+
+SOURCE_SCROLL_CHECKPOINT_FILE = Path("source_scroll_checkpoint.json")
+
+
+def save_scroll_checkpoint(
+    checkpoint_key: str, scroll_top: float | None, checkpoint_file: Path = SOURCE_SCROLL_CHECKPOINT_FILE
+) -> None:
+    """
+    Запоминает позицию обхода iter_sources для checkpoint_key (None — удаляет чекпоинт).
+
+    Файл общий для параллельных воркеров, поэтому пишется под блокировкой (см. json_state).
+    """
+    with locked_json_state(checkpoint_file) as checkpoints:
+        if scroll_top is None:
+            checkpoints.pop(checkpoint_key, None)
+        else:
+            checkpoints[checkpoint_key] = scroll_top
+
+
+def _scroll_step_args(scroll_top: float | None, settle_ms: int, step_timeout: float) -> dict:
+    return {
+        "containerSelector": SOURCE_CONTAINER_SELECTOR,
+        "titleSelector": SOURCE_TITLE_SELECTOR,
+        "scrollTop": scroll_top,
+        "settleMs": settle_ms,
+        "timeoutMs": int(step_timeout * 1000),
+    }
+
+
+def _checkpoint_start(checkpoint_key: str | None, checkpoint_file: Path) -> float | None:
+    scroll_top = read_json_state(checkpoint_file).get(checkpoint_key) if checkpoint_key else None
+    if scroll_top is not None:
+        logger.info(f"Продолжаю обход источников с позиции {scroll_top}px")
+    return scroll_top
+
+
+def iter_sources(
+    page: Page,
+    checkpoint_key: str | None = None,
+    checkpoint_file: Path = SOURCE_SCROLL_CHECKPOINT_FILE,
+    settle_ms: int = 150,
+    step_timeout: float = 5.0,
+    max_steps: int = 1000,
+) -> Iterator[dict]:
+    """
+    Постепенно обходит панель источников и отдаёт источники потоком, по мере отрисовки.
+
+    Подходит для виртуализированных списков, где в DOM одновременно лежит только часть
+    из 300 контейнеров: каждый шаг прокручивает панель и ждёт IntersectionObserver
+    (см. SCROLL_SOURCES_STEP_JS), а не фиксированную паузу. Источники дедуплицируются
+    по заголовку. Если задан checkpoint_key, обход начинается с сохранённой для него позиции,
+    а после полного обхода чекпоинт удаляется. Сохраняет позицию потребитель — когда закончил
+    с отданными источниками (save_scroll_checkpoint со scrollTop источника): сам обход не знает,
+    обработан ли уже отданный источник.
+
+    Элементы — словари с ключами index (порядковый номер в обходе), title, checked, visible, enabled
+    и scrollTop (позиция прокрутки, на которой источник отрисован).
+    """
+    seen_titles: set[str] = set()
+    scroll_top = _checkpoint_start(checkpoint_key, checkpoint_file)
+
+    for _ in range(max_steps):
+        step = page.evaluate(SCROLL_SOURCES_STEP_JS, _scroll_step_args(scroll_top, settle_ms, step_timeout))
+        for source in step["sources"]:
+            if source["title"] and source["title"] not in seen_titles:
+                seen_titles.add(source["title"])
+                yield {"index": len(seen_titles) - 1, **source, "scrollTop": step["scrollTop"]}
+
+        if step["atEnd"]:
+            break
+        scroll_top = step["nextScrollTop"]
+    else:
+        logger.warning(f"Обход источников остановлен после {max_steps} шагов")
+        return
+
+    if checkpoint_key:
+        save_scroll_checkpoint(checkpoint_key, None, checkpoint_file)
+    logger.info(f"Обход источников завершён: {len(seen_titles)} уникальных заголовков")
+
+
+async def async_iter_sources(
+    page: AsyncPage,
+    checkpoint_key: str | None = None,
+    checkpoint_file: Path = SOURCE_SCROLL_CHECKPOINT_FILE,
+    settle_ms: int = 150,
+    step_timeout: float = 5.0,
+    max_steps: int = 1000,
+) -> AsyncIterator[dict]:
+    """Асинхронный вариант iter_sources: тот же обход, дедупликация и чекпоинт"""
+    seen_titles: set[str] = set()
+    scroll_top = _checkpoint_start(checkpoint_key, checkpoint_file)
+
+    for _ in range(max_steps):
+        step = await page.evaluate(SCROLL_SOURCES_STEP_JS, _scroll_step_args(scroll_top, settle_ms, step_timeout))
+        for source in step["sources"]:
+            if source["title"] and source["title"] not in seen_titles:
+                seen_titles.add(source["title"])
+                yield {"index": len(seen_titles) - 1, **source, "scrollTop": step["scrollTop"]}
+
+        if step["atEnd"]:
+            break
+        scroll_top = step["nextScrollTop"]
+    else:
+        logger.warning(f"Обход источников остановлен после {max_steps} шагов")
+        return
+
+    if checkpoint_key:
+        save_scroll_checkpoint(checkpoint_key, None, checkpoint_file)
+    logger.info(f"Обход источников завершён: {len(seen_titles)} уникальных заголовков")
+
+
+# Включает ровно те источники, заголовки которых переданы, и выключает остальные — одним evaluate.
+# Список виртуализирован, поэтому сначала всё выключается чекбоксом "выбрать все" (частично
+# включённый сначала включает все, второй клик выключает), иначе источники за пределами
+# отрисованного окна остались бы включёнными. Между кликами страница успевает применить
+# изменение (settle). Отрисованные контейнеры выключаются и напрямую — на случай, если
+# чекбокса "выбрать все" нет. Заголовки сравниваются как в normalize_title (пробелы и регистр);
+# если нужный источник не отрисован, панель прокручивается сверху шагами, пока он не появится,
+# а найденный контейнер перед кликом прокручивается в область видимости.
+# Возвращает те из переданных заголовков, которые удалось включить.
+SELECT_SOURCES_JS = """
+    async ({ containerSelector, titleSelector, selectAllSelector, titles, settleMs, maxSteps }) => {
+        const settle = (ms) => new Promise((resolve) => setTimeout(resolve, ms));
+        const normalize = (title) => title.split(/\\s+/).filter(Boolean).join(' ').toLowerCase();
+        const selectAll = document.querySelector(selectAllSelector);
+        if (selectAll && !selectAll.closest(containerSelector)) {
+            if (selectAll.indeterminate) {
+                selectAll.click();
+                await settle(50);
+            }
+            if (selectAll.checked) {
+                selectAll.click();
+                await settle(50);
+            }
+        }
+
+        const wanted = new Map(titles.map((title) => [normalize(title), title]));
+        const selected = new Map();
+        const selectRendered = () => {
+            for (const container of document.querySelectorAll(containerSelector)) {
+                const titleElement = container.querySelector(titleSelector);
+                const input = container.querySelector('input[type="checkbox"]');
+                if (!titleElement || !input || input.disabled) continue;
+                const key = normalize(titleElement.innerText);
+                const shouldBeChecked = wanted.has(key);
+                if (shouldBeChecked) container.scrollIntoView({ block: 'nearest' });
+                if (input.checked !== shouldBeChecked) input.click();
+                if (shouldBeChecked && input.checked) selected.set(key, wanted.get(key));
+            }
+        };
+        selectRendered();
+
+        const first = document.querySelector(containerSelector);
+        if (selected.size < wanted.size && first) {
+            const isScrollable = (element) =>
+                element.scrollHeight > element.clientHeight && /(auto|scroll)/.test(getComputedStyle(element).overflowY);
+            let panel = first.parentElement;
+            while (panel && panel !== document.body && !isScrollable(panel)) panel = panel.parentElement;
+            const scroller = panel && panel !== document.body ? panel : document.scrollingElement;
+
+            scroller.scrollTop = 0;
+            for (let step = 0; step < maxSteps; step++) {
+                await settle(settleMs);
+                selectRendered();
+                if (selected.size === wanted.size) break;
+                if (scroller.scrollTop + scroller.clientHeight >= scroller.scrollHeight - 2) break;
+                scroller.scrollTop += Math.max(scroller.clientHeight * 0.8, 1);
+            }
+        }
+        return Array.from(selected.values());
+    }
+"""
+
+
+def _select_sources_args(titles: list[str], settle_ms: int, max_steps: int) -> dict:
+    return {
+        "containerSelector": SOURCE_CONTAINER_SELECTOR,
+        "titleSelector": SOURCE_TITLE_SELECTOR,
+        "selectAllSelector": SELECT_ALL_CHECKBOX_SELECTOR,
+        "titles": titles,
+        "settleMs": settle_ms,
+        "maxSteps": max_steps,
+    }
+
+
+def select_sources(page: Page, titles: list[str], settle_ms: int = 150, max_steps: int = 1000) -> list[str]:
+    """
+    Оставляет включёнными только источники titles, возвращает реально включённые заголовки.
+
+    Неотрисованные источники ищутся прокруткой панели (шаг ждёт settle_ms, не больше max_steps шагов).
+    """
+    return page.evaluate(SELECT_SOURCES_JS, _select_sources_args(titles, settle_ms, max_steps))
+
+
+async def async_select_sources(
+    page: AsyncPage, titles: list[str], settle_ms: int = 150, max_steps: int = 1000
+) -> list[str]:
+    """Асинхронный вариант select_sources"""
+    return await page.evaluate(SELECT_SOURCES_JS, _select_sources_args(titles, settle_ms, max_steps))
+
+
+# ----------------------------
+# Добавление источников
+# ----------------------------
+ADD_SOURCE_BUTTON_SELECTOR = 'button[aria-label="Добавить источник"], button[aria-label="Add source"]'
+SOURCE_DIALOG_SELECTOR = "mat-dialog-container"
+SOURCE_TYPE_CHIP_SELECTOR = "mat-chip, mat-chip-option"
+SOURCE_TYPE_LABELS = {"website": re.compile(r"Веб-сайт|Website"), "youtube": re.compile(r"YouTube")}
+SOURCE_URL_INPUT_SELECTOR = (
+    'textarea[formcontrolname="urls"], textarea[formcontrolname="newUrl"], input[formcontrolname="newUrl"]'
+)
+INSERT_SOURCE_BUTTON_NAME = re.compile(r"^\s*(Вставить|Insert)\s*$")
+# Индикатор загрузки у источника, который NotebookLM ещё обрабатывает
+SOURCE_LOADING_SELECTOR = "mat-spinner, mat-progress-spinner, .mat-mdc-progress-spinner"
+# Сколько ссылок принимает одно окно вставки: во вкладку "Веб-сайт" можно вставить
+# несколько ссылок через перевод строки, во вкладку "YouTube" — только одну
+URLS_PER_DIALOG = {"website": 20, "youtube": 1}
+MAX_NOTEBOOK_SOURCES = 300
+
+
+def add_sources(page: Page, source_type: str, urls: list[str], timeout: float = 60.0) -> None:
+    """
+    Добавляет ссылки одним окном "Добавить источник": выбор типа, вставка ссылок через
+    перевод строки, "Вставить". Возвращается, когда окно закрылось; появление самих
+    источников не ждёт (см. wait_for_sources).
+
+    :param source_type: 'website' или 'youtube'
+    :param urls: ссылки, не больше URLS_PER_DIALOG[source_type]
+    :param timeout: сколько ждать закрытия окна после "Вставить" (сек)
+    """
+    dialog = page.locator(SOURCE_DIALOG_SELECTOR)
+    # В новом пустом ноутбуке окно добавления открыто сразу
+    if not dialog.is_visible():
+        click_random(page.locator(ADD_SOURCE_BUTTON_SELECTOR).first)
+
+    click_random(dialog.locator(SOURCE_TYPE_CHIP_SELECTOR).filter(has_text=SOURCE_TYPE_LABELS[source_type]).first)
+    dialog.locator(SOURCE_URL_INPUT_SELECTOR).first.fill("\n".join(urls))
+
+    insert_button = dialog.get_by_role("button", name=INSERT_SOURCE_BUTTON_NAME)
+    expect(insert_button).to_be_enabled()
+    click_random(insert_button)
+    dialog.wait_for(state="hidden", timeout=timeout * 1000)
+
+
+# Ждёт внутри страницы, пока источников станет не меньше expectedCount, у всех появятся
+# заголовки и пропадут индикаторы загрузки, а список stableMs миллисекунд не будет меняться.
+# Возвращает итоговый снимок источников: подтверждение всех вставок одним evaluate.
+WAIT_FOR_SOURCES_JS = """
+    ({ containerSelector, titleSelector, loadingSelector, expectedCount, stableMs, timeoutMs }) => new Promise((resolve) => {
+        const started = performance.now();
+        let lastMutation = started;
+        const observer = new MutationObserver(() => { lastMutation = performance.now(); });
+        observer.observe(document.body, { childList: true, subtree: true, characterData: true });
+
+        const snapshot = () => Array.from(document.querySelectorAll(containerSelector)).map((container, index) => {
+            const titleElement = container.querySelector(titleSelector);
+            return {
+                index,
+                title: titleElement ? titleElement.innerText.trim() : '',
+                loading: container.querySelector(loadingSelector) !== null,
+            };
+        });
+        const timer = setInterval(() => {
+            const now = performance.now();
+            const sources = snapshot();
+            const ready = sources.length >= expectedCount && sources.every((source) => source.title && !source.loading);
+            if ((ready && now - lastMutation >= stableMs) || now - started >= timeoutMs) {
+                observer.disconnect();
+                clearInterval(timer);
+                resolve({ done: ready, sources, elapsedMs: performance.now() - started });
+            }
+        }, 250);
+    })
+"""
+
+
+def wait_for_sources(page: Page, expected_count: int, timeout: float = 300.0, stable_ms: int = 3000) -> dict:
+    """
+    Ждёт, пока в ноутбуке окажется не меньше expected_count обработанных источников.
+
+    :return: словарь done (дождались ли), sources (снимок: index, title, loading) и elapsedMs
+    """
+    return page.evaluate(
+        WAIT_FOR_SOURCES_JS,
+        {
+            "containerSelector": SOURCE_CONTAINER_SELECTOR,
+            "titleSelector": SOURCE_TITLE_SELECTOR,
+            "loadingSelector": SOURCE_LOADING_SELECTOR,
+            "expectedCount": expected_count,
+            "stableMs": stable_ms,
+            "timeoutMs": int(timeout * 1000),
+        },
+    )
+
+
+# ----------------------------
+# Создание ноутбука
+# ----------------------------
+CREATE_NOTEBOOK_BUTTON_NAME = re.compile(r"Создать|Create new")
+NOTEBOOK_PATH_RE = re.compile(r"/notebook/[0-9a-f-]{36}")
+
+
+def create_notebook(page: Page, timeout: float = 60.0) -> str:
+    """
+    Создаёт пустой ноутбук кнопкой на главной странице NotebookLM (page должна быть открыта на ней).
+
+    Окно добавления источников, которое NotebookLM открывает в новом ноутбуке, остаётся открытым:
+    add_sources продолжит с него.
+    :return: путь нового ноутбука вида "/notebook/<uuid>"
+    """
+    click_random(page.get_by_role("button", name=CREATE_NOTEBOOK_BUTTON_NAME).first)
+    page.wait_for_url(NOTEBOOK_PATH_RE, timeout=timeout * 1000)
+    notebook_id = NOTEBOOK_PATH_RE.search(page.url).group(0)
+    logger.info(f"Создан ноутбук {notebook_id}")
+    return notebook_id
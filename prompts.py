@@ -0,0 +1,61 @@
+import re
+
+from constants import BATCH_PROMPT_SUFFIX, PROMPT
+
+
+SECTION_MARKER = "<<<SOURCE {number}>>>"
+# Markdown-обрамление вокруг разделителя (**, ##) съедается вместе с ним
+SECTION_MARKER_RE = re.compile(r"[*#_ \t]*<<<\s*SOURCE\s+(\d+)\s*>>>[*_]*", re.IGNORECASE)
+MIN_SECTION_LENGTH = 100  # короче этого секция считается обрезанной или пустой
+
+
+def build_batch_prompt(titles: list[str], prompt: str = PROMPT) -> str:
+    """
+    Собирает промпт для нескольких источников сразу: просит отдельную секцию на каждый
+    источник, начинающуюся с разделителя SECTION_MARKER с номером источника.
+    """
+    sources = "\n".join(f"{number}. {title}" for number, title in enumerate(titles, start=1))
+    return prompt + BATCH_PROMPT_SUFFIX.format(
+        sources=sources,
+        marker_example=SECTION_MARKER.format(number=1),
+    )
+
+
+def batch_prompt_template(prompt: str = PROMPT) -> str:
+    """
+    Батч-промпт без списка источников — редакция, под которой кэшируются ответы на пачки.
+    Заголовки пачки — вход, а не инструкция, поэтому от них редакция не зависит.
+    """
+    return prompt + BATCH_PROMPT_SUFFIX
+
+
+def split_batch_answer(
+    answer: str,
+    titles: list[str],
+    min_length: int = MIN_SECTION_LENGTH,
+) -> tuple[dict[str, str], list[str]]:
+    """
+    Делит ответ на батч-промпт на секции по разделителям и сопоставляет их заголовкам.
+
+    Секции ищутся по номеру источника, поэтому порядок секций в ответе не важен.
+    Если номер встречается несколько раз, берётся самая длинная секция.
+    Возвращает (summary по заголовкам, заголовки без валидной секции).
+    """
+    matches = list(SECTION_MARKER_RE.finditer(answer))
+    sections: dict[int, str] = {}
+    for index, match in enumerate(matches):
+        end = matches[index + 1].start() if index + 1 < len(matches) else len(answer)
+        number = int(match.group(1))
+        text = answer[match.end() : end].strip()
+        if len(text) > len(sections.get(number, "")):
+            sections[number] = text
+
+    summaries: dict[str, str] = {}
+    missing: list[str] = []
+    for number, title in enumerate(titles, start=1):
+        text = sections.get(number, "")
+        if len(text) >= min_length:
+            summaries[title] = text
+        else:
+            missing.append(title)
+    return summaries, missing
@@ -1,11 +1,18 @@
 import os
 import shutil
+import tempfile
+import threading
+from collections.abc import Callable
+from concurrent.futures import ThreadPoolExecutor, as_completed
 
+import click
 from pyzotero import zotero
+from sqlalchemy import select
 
 import constants
 from database import db_manager
-from models import Video
+from job_queue import JobQueue
+from models import JobKind, ProcessingStatus, Video
 
 # ----------------------------
 # Настройки Zotero WebDAV
@@ -16,14 +23,24 @@ LIBRARY_TYPE = "user"  # или 'group', если группа
 ATTACHMENTS_DIR = constants.PROJECT_FOLDER / "temp_zotero_attachments"
 ZOTERO_COLLECTION_NAME = "YouTube Summaries"  # имя коллекции
 ZOTERO_STARAGE_PATH = "/mnt/Backup/Zotero/storage/{item_id}"
+ZOTERO_WRITE_BATCH_SIZE = 50  # максимум объектов в одном запросе на запись к Zotero API
 
 # Создаём клиент
 zot = zotero.Zotero(ZOTERO_USER_ID, LIBRARY_TYPE, ZOTERO_API_KEY)
 
+# Для параллельной загрузки вложений у каждого потока свой клиент
+_thread_local = threading.local()
+
 # Создаём временную папку для summary
 os.makedirs(ATTACHMENTS_DIR, exist_ok=True)
 
 
+def get_thread_client() -> zotero.Zotero:
+    if not hasattr(_thread_local, "zot"):
+        _thread_local.zot = zotero.Zotero(ZOTERO_USER_ID, LIBRARY_TYPE, ZOTERO_API_KEY)
+    return _thread_local.zot
+
+
 # ----------------------------
 # Функция: получить или создать коллекцию
 # ----------------------------
@@ -42,42 +59,177 @@ def get_or_create_collection(name):
     return new_key
 
 
-# Получаем или создаём коллекцию
-collection_key = get_or_create_collection(ZOTERO_COLLECTION_NAME)
-
 # ----------------------------
-# Берём все видео с summary
+# Берём только видео с summary, которые ещё не отправлены в Zotero
 # ----------------------------
-with db_manager.session_scope() as session:
-    videos = session.query(Video).filter(Video.summary.isnot(None)).all()
-
-    for video in videos:
-        print(f"📌 Обрабатываем: {video.title}")
-
-        # Создаём файл с summary
-        filename = f"{video.youtube_id or video.id}_summary.txt"
-        filepath = os.path.join(ATTACHMENTS_DIR, filename)
+def load_pending_videos(video_ids: list[int] | None = None) -> list[dict]:
+    """
+    Только метаданные: сами тексты читаются по одному при загрузке вложения (upload_attachment).
+    Список нужен целиком (счётчики, пачки для create_parent_items), поэтому строки не стримятся.
+
+    Если заданы video_ids — только эти видео (задачи, взятые из очереди).
+    """
+    with db_manager.session_scope() as session:
+        stmt = (
+            select(Video.id, Video.title, Video.url, Video.youtube_id, Video.zotero_item_id)
+            .where(
+                Video.summary_hash.isnot(None),
+                Video.status.notin_([ProcessingStatus.SENT_TO_ZOTERO, ProcessingStatus.COMPLETED]),
+            )
+            .order_by(Video.id)
+        )
+        if video_ids is not None:
+            stmt = stmt.where(Video.id.in_(video_ids))
+        return [dict(row._mapping) for row in session.execute(stmt)]
+
+
+def create_parent_items(videos: list[dict], collection_key: str, batch_size: int = ZOTERO_WRITE_BATCH_SIZE) -> None:
+    """
+    Создаёт родительские элементы пачками и сразу сохраняет их ключи в Video.zotero_item_id,
+    чтобы прерванный запуск не создавал дубликаты.
+    """
+    for start in range(0, len(videos), batch_size):
+        batch = videos[start : start + batch_size]
+
+        items = []
+        for video in batch:
+            item = zot.item_template("document")  # тип документа можно изменить
+            item["title"] = video["title"]
+            item["tags"] = [{"tag": "YouTube Summary"}]
+            item["url"] = video["url"]
+            item["collections"] = [collection_key]
+            items.append(item)
+
+        created_items = zot.create_items(items)
+
+        with db_manager.session_scope() as session:
+            for index, video in enumerate(batch):
+                created_key = created_items["success"].get(str(index))
+                if created_key is None:
+                    print(f"❌ Не удалось создать элемент в Zotero: {video['title']}")
+                    continue
+                video["zotero_item_id"] = created_key
+                session.query(Video).filter_by(id=video["id"]).update({"zotero_item_id": created_key})
+
+        print(f"🆕 Создано элементов в Zotero: {len(created_items['success'])}/{len(batch)}")
+
+
+def upload_attachment(video: dict) -> None:
+    """Загружает summary как вложение через WebDAV и помечает видео как отправленное в Zotero"""
+    # Своя временная папка на каждую загрузку: параллельные потоки не перезаписывают файлы друг друга,
+    # даже если у разных строк совпадает youtube_id
+    filename = f"{video['youtube_id'] or video['id']}_summary.txt"
+    with tempfile.TemporaryDirectory(dir=ATTACHMENTS_DIR, prefix=f"{video['id']}_") as temp_dir:
+        filepath = os.path.join(temp_dir, filename)
 
         with open(filepath, "w", encoding="utf-8") as f:
-            f.write(video.summary)
-
-        # Создаём элемент в Zotero
-        item = zot.item_template("document")  # тип документа можно изменить
-        item["title"] = video.title
-        item["tags"] = [{"tag": "YouTube Summary"}]
-        item["url"] = video.url
-        item["collections"] = [collection_key]
-
-        created_item = zot.create_items([item])
+            f.write(db_manager.get_summary(video["id"]))
 
         # Загружаем attachment через WebDAV
-        created_key = created_item["success"]["0"]
-
-        res = zot.attachment_simple([filepath], parentid=created_key)
-        dir_name = res["unchanged"][0]["key"]
+        res = get_thread_client().attachment_simple([filepath], parentid=video["zotero_item_id"])
+        dir_name = (res.get("success") or res["unchanged"])[0]["key"]
         dir_new = ZOTERO_STARAGE_PATH.format(item_id=dir_name)
         os.makedirs(dir_new, exist_ok=True)
-        shutil.move(filepath, dir_new)
-        print(f"✅ Summary сохранён в Zotero: {video.title}")
-
-print("🎉 Все summary загружены!")
+        shutil.move(filepath, os.path.join(dir_new, filename))
+
+    with db_manager.session_scope() as session:
+        session.query(Video).filter_by(id=video["id"]).update({"status": ProcessingStatus.SENT_TO_ZOTERO})
+
+
+def upload_attachments(
+    videos: list[dict],
+    workers: int,
+    on_result: Callable[[dict, Exception | None], None] | None = None,
+) -> int:
+    """
+    Параллельно загружает вложения ограниченным пулом потоков, возвращает число успешных.
+
+    on_result вызывается для каждого видео с исключением загрузки или None при успехе.
+    """
+    uploaded = 0
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        futures = {executor.submit(upload_attachment, video): video for video in videos}
+        for future in as_completed(futures):
+            video = futures[future]
+            error = future.exception()
+            if error is None:
+                uploaded += 1
+                print(f"✅ Summary сохранён в Zotero: {video['title']}")
+            else:
+                print(f"❌ Ошибка загрузки summary для {video['title']}: {error}")
+            if on_result is not None:
+                on_result(video, error)
+    return uploaded
+
+
+def send_from_queue(collection_key: str, batch_size: int, workers: int) -> int:
+    """
+    Берёт задачи ZOTERO из общей очереди пачками по batch_size, пока очередь не опустеет.
+
+    Несколько копий скрипта (в том числе на разных машинах) могут работать одновременно:
+    каждая задача арендуется одним воркером (см. job_queue.JobQueue).
+    Возвращает число загруженных summary.
+    """
+    queue = JobQueue(db_manager)
+    queue.start_heartbeat()
+    uploaded = 0
+    try:
+        while jobs := queue.claim(JobKind.ZOTERO, limit=batch_size):
+            job_ids = {job["video_id"]: job["id"] for job in jobs}
+            videos = load_pending_videos(list(job_ids))
+
+            # Видео, которое уже отправлено другим способом, задачу просто закрывает
+            for video_id in set(job_ids) - {video["id"] for video in videos}:
+                queue.complete(job_ids[video_id])
+
+            create_parent_items([video for video in videos if not video["zotero_item_id"]], collection_key, batch_size)
+            for video in videos:
+                if not video["zotero_item_id"]:
+                    queue.fail(job_ids[video["id"]], "Не удалось создать элемент в Zotero")
+
+            def finish(video: dict, error: Exception | None, job_ids: dict[int, int] = job_ids) -> None:
+                if error is None:
+                    queue.complete(job_ids[video["id"]])
+                else:
+                    queue.fail(job_ids[video["id"]], str(error))
+
+            uploaded += upload_attachments([video for video in videos if video["zotero_item_id"]], workers, finish)
+    finally:
+        queue.close()
+    return uploaded
+
+
+@click.command()
+@click.option("--batch_size", default=ZOTERO_WRITE_BATCH_SIZE, help="Items per Zotero write request (max 50)")
+@click.option("--workers", default=4, help="Concurrent attachment uploads")
+@click.option(
+    "--from_queue", is_flag=True, help="Take zotero jobs from the shared job queue (safe to run several copies)"
+)
+def main(batch_size: int, workers: int, from_queue: bool) -> None:
+    """
+    Send summaries that are not in Zotero yet; an interrupted run resumes where it stopped.
+    """
+    if from_queue:
+        collection_key = get_or_create_collection(ZOTERO_COLLECTION_NAME)
+        uploaded = send_from_queue(collection_key, min(batch_size, ZOTERO_WRITE_BATCH_SIZE), workers)
+        print(f"🎉 Загружено summary из очереди: {uploaded}")
+        return
+
+    videos = load_pending_videos()
+    if not videos:
+        print("🎉 Все summary уже в Zotero!")
+        return
+
+    # Получаем или создаём коллекцию
+    collection_key = get_or_create_collection(ZOTERO_COLLECTION_NAME)
+
+    without_parent = [video for video in videos if not video["zotero_item_id"]]
+    print(f"📌 К отправке: {len(videos)}, из них без элемента в Zotero: {len(without_parent)}")
+    create_parent_items(without_parent, collection_key, min(batch_size, ZOTERO_WRITE_BATCH_SIZE))
+
+    uploaded = upload_attachments([video for video in videos if video["zotero_item_id"]], workers)
+    print(f"🎉 Загружено summary: {uploaded}/{len(videos)}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,52 @@
+import click
+from constants import PROMPT
+from database import DatabaseManager
+from loguru import logger
+from prompts import batch_prompt_template
+
+
+def open_cache() -> DatabaseManager:
+    """DatabaseManager с текущей редакцией constants.PROMPT и её батч-вариантом (как в main.summarise_sources)"""
+    db_manager = DatabaseManager()
+    db_manager.create_tables()
+    db_manager.use_prompt(PROMPT, batch_prompt_template(PROMPT))
+    return db_manager
+
+
+@click.group()
+def cli() -> None:
+    """Summary cache keyed by source and prompt version."""
+
+
+@cli.command("versions")
+def versions_command() -> None:
+    """List prompt versions, oldest first, with the number of sources each one summarised."""
+    db_manager = open_cache()
+    for version in db_manager.prompt_versions():
+        marker = "*" if version["current"] else " "
+        click.echo(f"{marker} {version['hash'][:12]}  {version['created_at']:%Y-%m-%d %H:%M}  {version['sources']:>6}")
+
+
+@cli.command("stale")
+@click.option("--limit", default=None, type=int, help="Show at most this many sources")
+def stale_command(limit: int | None) -> None:
+    """List sources whose summary is missing or was produced by an older prompt version."""
+    db_manager = open_cache()
+    sources = db_manager.stale_sources(limit=limit)
+    for source in sources:
+        state = "stale" if source["stale"] else "missing"
+        click.echo(f"[{source['video_id']}] {state:<7} {source['source_key'][:80]}  {source['title'][:60]}")
+    stale = sum(1 for source in sources if source["stale"])
+    click.echo(f"{len(sources)} sources: {stale} stale, {len(sources) - stale} missing")
+
+
+@cli.command("adopt")
+def adopt_command() -> None:
+    """Record summaries made before the cache existed as answers of the current prompt version."""
+    db_manager = open_cache()
+    adopted = db_manager.adopt_summaries()
+    logger.success(f"Записано в кэш: {adopted} источников")
+
+
+if __name__ == "__main__":
+    cli()
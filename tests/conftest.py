@@ -0,0 +1,24 @@
+import sys
+from pathlib import Path
+
+import pytest
+
+
+# Модули проекта лежат в корне репозитория, а не в пакете
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from database import DatabaseManager  # noqa: E402
+
+
+@pytest.fixture
+def db_url(tmp_path) -> str:
+    return f"sqlite:///{tmp_path / 'videos.db'}"
+
+
+@pytest.fixture
+def db_manager(db_url) -> DatabaseManager:
+    db_manager = DatabaseManager(db_url)
+    db_manager.create_tables()
+    yield db_manager
+    db_manager.close()
+    db_manager.engine.dispose()
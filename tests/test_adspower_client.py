@@ -0,0 +1,126 @@
+import asyncio
+import json
+import threading
+
+import httpx
+import requests
+import requests.adapters
+from adspower_api_utils import AdsPowerClient, AsyncAdsPowerClient
+
+
+START_OK = {"code": 0, "msg": "success", "data": {"ws": {"puppeteer": "ws://127.0.0.1/devtools/browser/1"}}}
+TOO_MANY = {"code": -1, "msg": "Too many request per second, please check"}
+
+
+def _response(request: requests.PreparedRequest, status_code: int, payload: dict | str) -> requests.Response:
+    response = requests.Response()
+    response.status_code = status_code
+    response._content = (payload if isinstance(payload, str) else json.dumps(payload)).encode("utf-8")
+    response.request = request
+    response.url = request.url
+    return response
+
+
+class ScriptedAdapter(requests.adapters.HTTPAdapter):
+    """Отдаёт заранее заданные ответы по очереди; исключение в сценарии выбрасывается вместо ответа"""
+
+    def __init__(self, *script):
+        super().__init__()
+        self.script = list(script)
+        self.requests: list[str] = []
+        self._lock = threading.Lock()
+
+    def send(self, request, **kwargs):
+        with self._lock:
+            self.requests.append(request.url)
+            step = self.script.pop(0) if len(self.script) > 1 else self.script[0]
+        if isinstance(step, Exception):
+            raise step
+        status_code, payload = step
+        return _response(request, status_code, payload)
+
+
+def scripted_client(*script, retries: int = 3) -> tuple[AdsPowerClient, ScriptedAdapter]:
+    client = AdsPowerClient("http://adspower.test", retries=retries, backoff=0)
+    adapter = ScriptedAdapter(*script)
+    client.session.mount("http://", adapter)
+    return client, adapter
+
+
+def test_transient_errors_are_retried():
+    client, adapter = scripted_client(
+        requests.exceptions.ConnectionError("refused"),
+        (500, "Internal Server Error"),
+        (200, TOO_MANY),
+        (200, START_OK),
+    )
+
+    assert client.start_browser("1") == START_OK["data"]["ws"]["puppeteer"]
+    assert len(adapter.requests) == len(["connection error", "500", "rate limit", "success"])
+
+
+def test_retries_give_up_after_the_limit():
+    client, adapter = scripted_client((503, "Service Unavailable"), retries=2)
+
+    assert client.start_browser("1") is None
+    assert len(adapter.requests) == client.retries + 1
+
+
+def test_permanent_errors_are_not_retried():
+    client, adapter = scripted_client((404, "Not Found"))
+    assert client.check_browser_status("1") is False
+    assert len(adapter.requests) == 1
+
+    client, adapter = scripted_client((200, {"code": -1, "msg": "Profile does not exist"}))
+    assert client.start_browser("1") is None
+    assert len(adapter.requests) == 1
+
+
+def test_session_keeps_a_pool_of_pool_size_connections():
+    client = AdsPowerClient("http://adspower.test", pool_size=7)
+
+    adapter = client.session.get_adapter("http://adspower.test/api/v1/browser/start")
+    assert adapter._pool_maxsize == client.pool_size
+    assert client.session.get_adapter("https://adspower.test") is adapter
+
+
+def test_stop_many_reports_each_profile():
+    client = AdsPowerClient("http://adspower.test", retries=0, backoff=0)
+    running = {"1", "3"}
+
+    class StopAdapter(requests.adapters.HTTPAdapter):
+        def send(self, request, **kwargs):
+            profile_number = request.url.rsplit("serial_number=", 1)[1]
+            payload = {"code": 0, "msg": "success"} if profile_number in running else {"code": -1, "msg": "not open"}
+            return _response(request, 200, payload)
+
+    client.session.mount("http://", StopAdapter())
+
+    assert client.stop_many(["1", "2", "3"], max_workers=3) == {"1": True, "2": False, "3": True}
+
+
+def test_async_client_retries_transient_and_not_permanent_errors():
+    calls: list[str] = []
+
+    def handler(request: httpx.Request) -> httpx.Response:
+        calls.append(request.url.params["serial_number"])
+        if request.url.params["serial_number"] == "missing":
+            return httpx.Response(404, text="Not Found")
+        if len(calls) == 1:
+            raise httpx.ConnectError("refused", request=request)
+        if len(calls) == len(["connect error", "rate limit"]):
+            return httpx.Response(200, json=TOO_MANY)
+        return httpx.Response(200, json=START_OK)
+
+    async def scenario() -> tuple[str | None, bool]:
+        client = AsyncAdsPowerClient("http://adspower.test", retries=3, backoff=0)
+        await client.client.aclose()
+        client.client = httpx.AsyncClient(base_url="http://adspower.test", transport=httpx.MockTransport(handler))
+        async with client:
+            return await client.start_browser("1"), await client.check_browser_status("missing")
+
+    puppeteer_ws, missing_active = asyncio.run(scenario())
+
+    assert puppeteer_ws == START_OK["data"]["ws"]["puppeteer"]
+    assert missing_active is False
+    assert calls == ["1", "1", "1", "missing"]
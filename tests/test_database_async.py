@@ -0,0 +1,35 @@
+import asyncio
+
+from database import prompt_hash
+from database_async import AsyncDatabaseManager
+from models import ProcessingStatus
+
+
+PROMPT = "Summarise the source."
+BATCH_PROMPT = PROMPT + " Answer for every source in its own section."
+
+
+def test_summary_of_a_prompt_variant_counts_as_done(tmp_path):
+    async def scenario() -> set[str]:
+        db_manager = AsyncDatabaseManager(f"sqlite+aiosqlite:///{tmp_path / 'videos.db'}")
+        try:
+            await db_manager.create_tables()
+            await db_manager.use_prompt(PROMPT, BATCH_PROMPT)
+            await db_manager.insert_video(
+                title="Batched Source",
+                url=None,
+                youtube_id=None,
+                status=ProcessingStatus.SENT_TO_NOTEBOOKLM,
+                summary="text",
+                prompt_digest=prompt_hash(BATCH_PROMPT),
+            )
+
+            # Новый запуск: индекс кэша загружается из БД
+            await db_manager.use_prompt(PROMPT, BATCH_PROMPT)
+            await db_manager.load_summarised_titles()
+            return await db_manager.titles_exist(["batched  source", "Other Source"])
+        finally:
+            await db_manager.close()
+            await db_manager.engine.dispose()
+
+    assert asyncio.run(scenario()) == {"batched  source"}
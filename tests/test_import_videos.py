@@ -0,0 +1,20 @@
+import import_videos
+from models import Video
+from sqlalchemy import func, select
+
+
+def test_stale_in_memory_sets_do_not_duplicate_urls(db_manager, monkeypatch, tmp_path):
+    monkeypatch.setattr(import_videos, "db_manager", db_manager)
+    videos_file = tmp_path / "videos.txt"
+    videos_file.write_text(
+        "".join(f"Video {number}\\thttps://www.youtube.com/watch?v={number:011d}\n" for number in range(3)),
+        encoding="utf-8",
+    )
+    assert import_videos.import_videos_from_file(videos_file)["added"] == len(range(3))
+
+    # Второй импорт, загрузивший множества раньше, чем первый записал свои строки
+    rows = [{"title": "late", "url": "https://www.youtube.com/watch?v=00000000001", "youtube_id": None}]
+    assert import_videos._insert_chunk(rows) == 0
+
+    with db_manager.session_scope() as session:
+        assert session.execute(select(func.count(Video.id))).scalar() == len(range(3))
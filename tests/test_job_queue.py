@@ -0,0 +1,91 @@
+import threading
+from datetime import datetime, timedelta
+
+from database import DatabaseManager
+from job_queue import JobQueue
+from models import Job, JobKind, JobStatus, ProcessingStatus, Video
+from sqlalchemy import update
+
+
+def add_videos(db_manager, count: int) -> list[int]:
+    with db_manager.session_scope() as session:
+        videos = [
+            Video(title=f"video {index}", url=f"https://youtu.be/{index}", status=ProcessingStatus.DOWNLOADED)
+            for index in range(count)
+        ]
+        session.add_all(videos)
+        session.flush()
+        return [video.id for video in videos]
+
+
+def expire_leases(db_manager) -> None:
+    with db_manager.session_scope() as session:
+        session.execute(update(Job).values(lease_expires_at=datetime.now() - timedelta(seconds=1)))
+
+
+def test_concurrent_workers_never_claim_the_same_job(db_manager, db_url):
+    video_ids = add_videos(db_manager, 60)
+    JobQueue(db_manager).enqueue(JobKind.NOTEBOOKLM, video_ids, scope="/notebook/1")
+
+    claimed: dict[str, list[int]] = {}
+    start = threading.Barrier(4)
+
+    def work(worker_id: str) -> None:
+        # У каждого воркера своё подключение, как у отдельного процесса
+        worker_db = DatabaseManager(db_url)
+        queue = JobQueue(worker_db, worker_id=worker_id)
+        claimed[worker_id] = []
+        start.wait()
+        while jobs := queue.claim(JobKind.NOTEBOOKLM, limit=3, scope="/notebook/1"):
+            for job in jobs:
+                claimed[worker_id].append(job["id"])
+                queue.complete(job["id"])
+        worker_db.close()
+        worker_db.engine.dispose()
+
+    workers = [threading.Thread(target=work, args=(f"worker-{index}",)) for index in range(4)]
+    for worker in workers:
+        worker.start()
+    for worker in workers:
+        worker.join()
+
+    all_claimed = [job_id for job_ids in claimed.values() for job_id in job_ids]
+    assert len(all_claimed) == len(set(all_claimed)) == len(video_ids)
+    assert JobQueue(db_manager).counts() == {("notebooklm", "done"): len(video_ids)}
+
+
+def test_expired_lease_is_reclaimed_by_another_worker(db_manager):
+    [video_id] = add_videos(db_manager, 1)
+    crashed = JobQueue(db_manager, worker_id="crashed")
+    crashed.enqueue(JobKind.ZOTERO, [video_id])
+    [job] = crashed.claim(JobKind.ZOTERO)
+
+    survivor = JobQueue(db_manager, worker_id="survivor")
+    assert survivor.claim(JobKind.ZOTERO) == []
+
+    expire_leases(db_manager)
+    [reclaimed] = survivor.claim(JobKind.ZOTERO)
+    assert reclaimed["id"] == job["id"]
+    assert reclaimed["attempts"] == job["attempts"] + 1
+
+    # Воркер, потерявший аренду, не перезаписывает результат
+    assert crashed.complete(job["id"]) is False
+    assert survivor.complete(job["id"]) is True
+
+
+def test_job_is_dead_lettered_after_max_attempts(db_manager):
+    failing, expiring = add_videos(db_manager, 2)
+    queue = JobQueue(db_manager)
+    queue.enqueue(JobKind.PDF, [failing, expiring], max_attempts=2)
+
+    for expected_retry in (True, False):
+        jobs = {job["video_id"]: job["id"] for job in queue.claim(JobKind.PDF, limit=2)}
+        assert queue.fail(jobs[failing], "render error", backoff=0) is expected_retry
+        # Вторая задача не завершается (воркер упал): вернётся только по истечении аренды
+        expire_leases(db_manager)
+
+    assert queue.claim(JobKind.PDF, limit=2) == []
+    assert queue.counts() == {("pdf", "dead"): 2}
+    with db_manager.session_scope() as session:
+        errors = dict(session.query(Job.video_id, Job.last_error).where(Job.status == JobStatus.DEAD))
+    assert errors == {failing: "render error", expiring: "lease expired"}
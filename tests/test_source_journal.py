@@ -0,0 +1,32 @@
+from database import prompt_hash
+from models import ProcessingStatus, SourceState, SourceSummary
+from sqlalchemy import select
+
+
+PROMPT = "Summarise the source."
+BATCH_PROMPT = PROMPT + " Answer for every source in its own section."
+
+
+def test_restored_summary_is_cached_under_its_prompt(db_manager):
+    db_manager.use_prompt(PROMPT, BATCH_PROMPT)
+    db_manager.journal_entry("/notebook/1", "batched")
+    db_manager.journal_advance(
+        "/notebook/1", "batched", SourceState.EXTRACTED, summary="text", prompt_digest=prompt_hash(BATCH_PROMPT)
+    )
+
+    entry = db_manager.journal_entry("/notebook/1", "batched")
+    assert entry["prompt_digest"] == prompt_hash(BATCH_PROMPT)
+
+    db_manager.insert_video(
+        title="batched",
+        url=None,
+        youtube_id=None,
+        status=ProcessingStatus.SENT_TO_NOTEBOOKLM,
+        summary=entry["summary"],
+        prompt_digest=entry["prompt_digest"],
+    )
+    with db_manager.session_scope() as session:
+        assert list(session.execute(select(SourceSummary.prompt_hash)).scalars()) == [prompt_hash(BATCH_PROMPT)]
+
+    db_manager.journal_advance("/notebook/1", "batched", SourceState.STORED)
+    assert db_manager.journal_entry("/notebook/1", "batched")["prompt_digest"] is None
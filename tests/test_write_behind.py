@@ -0,0 +1,71 @@
+import pytest
+from models import ProcessingStatus, Video
+from sqlalchemy import func, select
+
+
+def video(title: str | None, summary: str | None = "summary") -> dict:
+    return {
+        "title": title,
+        "url": None,
+        "youtube_id": None,
+        "status": ProcessingStatus.SENT_TO_NOTEBOOKLM,
+        "summary": summary,
+    }
+
+
+def stored_titles(db_manager) -> list[str]:
+    with db_manager.session_scope() as session:
+        return list(session.execute(select(Video.title).order_by(Video.id)).scalars())
+
+
+def test_rows_wait_for_batch_and_notify_listeners(db_manager):
+    flushed: list[str] = []
+    db_manager.add_flush_listener(lambda rows: flushed.extend(row["title"] for row in rows))
+    db_manager.enable_write_behind(batch_size=3, flush_interval=3600)
+
+    db_manager.insert_video(**video("first"))
+    db_manager.insert_video(**video("second"))
+    assert stored_titles(db_manager) == []
+    assert flushed == []
+
+    db_manager.insert_video(**video("third"))
+    assert stored_titles(db_manager) == ["first", "second", "third"]
+    assert flushed == ["first", "second", "third"]
+
+
+def test_close_writes_the_rest_of_the_buffer(db_manager):
+    db_manager.enable_write_behind(batch_size=100, flush_interval=3600)
+    db_manager.insert_video(**video("pending"))
+
+    db_manager.close()
+
+    assert stored_titles(db_manager) == ["pending"]
+
+
+def test_integrity_error_falls_back_to_row_by_row(db_manager):
+    flushed: list[str] = []
+    db_manager.add_flush_listener(lambda rows: flushed.extend(row["title"] for row in rows))
+    db_manager.enable_write_behind(batch_size=100, flush_interval=3600)
+    for title in ("before", None, "after"):  # title NOT NULL: вторая строка ломает пакет
+        db_manager.insert_video(**video(title))
+
+    assert db_manager.flush() == len(["before", "after"])
+    assert stored_titles(db_manager) == ["before", "after"]
+    assert flushed == ["before", "after"]
+
+
+def test_interrupted_flush_keeps_the_batch(db_manager, monkeypatch):
+    db_manager.enable_write_behind(batch_size=100, flush_interval=3600)
+    db_manager.insert_video(**video("survivor"))
+
+    def interrupted(session, kwargs):
+        raise KeyboardInterrupt
+
+    with monkeypatch.context() as patch:
+        patch.setattr(db_manager, "_build_video", interrupted)
+        with pytest.raises(KeyboardInterrupt):
+            db_manager.flush()
+
+    assert db_manager.flush() == 1
+    with db_manager.session_scope() as session:
+        assert session.execute(select(func.count(Video.id))).scalar() == 1